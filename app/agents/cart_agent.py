@@ -1,9 +1,14 @@
-from agents import Agent, Runner
-from typing import Any, Dict, List
+from agents import Agent
+from typing import Any, AsyncIterator, Dict, List
 
-from ..core.config import settings
+from ..client.auth_context import auth_context
+from .profiles import agent_profile
+from .runner import run_agent
 from ..core.hooks import CustomAgentHooks
+from ..core.turn_state import turn_scope
 from ..prompts.cart_agent import CART_AGENT_PROMPT
+from .source_documents import CART_TOOLS, PRODUCT_TOOLS, extract_source_documents
+from .streaming import stream_run
 from ..tools.cart_tools import (
     add_to_cart,
     clear_cart,
@@ -17,22 +22,28 @@ from ..tools.product_tools import (
     get_product_info,
     rag_product_search,
 )
-import json
 from ..memory.memory_manager import MemoryManager
 
 class CartAgentWrapper:
     """
     Agent xử lý các yêu cầu về giỏ hàng và thanh toán
     """
+    # Tool được lấy kết quả làm source_documents (xem extract_source_documents)
+    SOURCE_TOOLS = PRODUCT_TOOLS | CART_TOOLS
+
     def __init__(self):
         # Tạo hooks cho cart agent
         self.hooks = CustomAgentHooks("Cart")
         
+        # Model và giới hạn sinh văn bản riêng của agent (CART_MODEL, CART_MAX_TOKENS, ...)
+        self.profile = agent_profile("cart")
+        
         # Tạo agent sử dụng OpenAI Agents SDK
         self.agent = Agent(
             name="Cart Assistant",
             instructions=CART_AGENT_PROMPT,
-            model=settings.CHAT_MODEL,
+            model=self.profile.model,
+            model_settings=self.profile.model_settings(),
             tools=[
                 rag_product_search,
                 get_product_info,
@@ -49,7 +60,7 @@ class CartAgentWrapper:
     
     def _extract_products_from_result(self, result: Any) -> List[Dict[str, Any]]:
         """
-        Trích xuất thông tin sản phẩm từ kết quả của tool
+        Trích xuất thông tin sản phẩm (kể cả các dòng trong giỏ hàng) từ kết quả của tool
         
         Args:
             result: Kết quả từ tool
@@ -57,80 +68,7 @@ class CartAgentWrapper:
         Returns:
             List[Dict]: Danh sách thông tin sản phẩm
         """
-        source_documents = []
-        try:
-            # Kiểm tra xem trong kết quả có chứa thông tin sản phẩm không
-            if hasattr(result, 'tool_results') and result.tool_results:
-                for tool_result in result.tool_results:
-                    # Chỉ xử lý kết quả từ các tool liên quan đến sản phẩm
-                    if tool_result.tool_name in ['get_product_info', 'get_product_by_id', 'check_product_availability', 'rag_product_search']:
-                        # Parse kết quả JSON từ tool
-                        if isinstance(tool_result.output, str):
-                            try:
-                                products = json.loads(tool_result.output)
-                            except:
-                                continue
-                        else:
-                            products = tool_result.output
-                            
-                        # Xử lý trường hợp kết quả là một list hoặc dict
-                        if isinstance(products, dict):
-                            products = [products]
-                        elif not isinstance(products, list):
-                            continue
-                            
-                        # Thêm từng sản phẩm vào source_documents
-                        for product in products:
-                            if isinstance(product, dict):
-                                # Lấy URL hình ảnh
-                                image_url = product.get("image_url", "")
-                                # Tạo thẻ img HTML nếu có URL hình ảnh
-                                image_html = f'<img src="{image_url}" alt="{product.get("name", "Sản phẩm bánh")}" />' if image_url else ""
-                                
-                                source_documents.append({
-                                    "id": product.get("id", ""),
-                                    "name": product.get("name", ""),
-                                    "price": product.get("price", 0),
-                                    "description": product.get("description", ""),
-                                    "image_url": image_url,
-                                    "image_html": image_html,  # Thêm trường mới chứa thẻ HTML
-                                    "category": product.get("category", ""),
-                                    "status": product.get("status", ""),
-                                    "quantity": product.get("quantity", 0),
-                                    "available": product.get("available", None),
-                                    "relevance_score": product.get("relevance_score", 0)
-                                })
-                    
-                    # Thêm nội dung từ add_to_cart và get_cart
-                    if tool_result.tool_name in ['add_to_cart', 'get_cart', 'update_cart']:
-                        try:
-                            cart_data = json.loads(tool_result.output) if isinstance(tool_result.output, str) else tool_result.output
-                            
-                            if isinstance(cart_data, dict) and "items" in cart_data:
-                                for item in cart_data["items"]:
-                                    if isinstance(item, dict) and "product" in item:
-                                        product = item["product"]
-                                        # Lấy URL hình ảnh
-                                        image_url = product.get("image_url", "")
-                                        # Tạo thẻ img HTML nếu có URL hình ảnh
-                                        image_html = f'<img src="{image_url}" alt="{product.get("name", "Sản phẩm bánh")}" />' if image_url else ""
-                                        
-                                        source_documents.append({
-                                            "id": product.get("id", ""),
-                                            "name": product.get("name", ""),
-                                            "price": product.get("price", 0),
-                                            "quantity_in_cart": item.get("quantity", 0),
-                                            "image_url": image_url,
-                                            "image_html": image_html,  # Thêm trường mới chứa thẻ HTML
-                                            "in_cart": True
-                                        })
-                        except Exception as e:
-                            print(f"Error extracting cart items: {str(e)}")
-                            
-        except Exception as e:
-            print(f"Error extracting products: {str(e)}")
-            
-        return source_documents
+        return extract_source_documents(result, self.SOURCE_TOOLS)
     
     async def process(self, message: str, thread_id: str = None, user_id: str = None, auth_token: str = None):
         """
@@ -142,22 +80,22 @@ class CartAgentWrapper:
             user_id: ID người dùng
             auth_token: Token xác thực JWT
         """
-        # Cập nhật token cho Spring Boot client
-        from ..client.spring_client import spring_boot_client
-        spring_boot_client.update_auth_token(auth_token)
-        
-        # Sử dụng Runner từ OpenAI Agents SDK để xử lý tin nhắn
-        result = await Runner.run(self.agent, message)
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token):
+            # Sử dụng Runner từ OpenAI Agents SDK để xử lý tin nhắn
+            # (turn_scope: các tool trong lượt dùng chung giỏ hàng đã biết)
+            with turn_scope():
+                result = await run_agent(self.agent, message, self.profile)
         
-        # Trích xuất thông tin sản phẩm từ kết quả của tool
-        source_documents = self._extract_products_from_result(result)
+            # Trích xuất thông tin sản phẩm từ kết quả của tool
+            source_documents = self._extract_products_from_result(result)
         
-        # Cấu trúc kết quả để tương thích với API hiện tại
-        return {
-            "message": result.final_output,
-            "thread_id": thread_id,
-            "source_documents": source_documents
-        }
+            # Cấu trúc kết quả để tương thích với API hiện tại
+            return {
+                "message": result.final_output,
+                "thread_id": thread_id,
+                "source_documents": source_documents
+            }
         
     async def process_with_history(
         self, 
@@ -180,25 +118,47 @@ class CartAgentWrapper:
         Returns:
             Dict: Kết quả từ agent
         """
-        # Cập nhật token cho Spring Boot client
-        from ..client.spring_client import spring_boot_client
-        spring_boot_client.update_auth_token(auth_token)
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token):
+            # Kết hợp lịch sử hội thoại với tin nhắn hiện tại
+            combined_message = MemoryManager.build_input(message, conversation_history)
         
-        # Kết hợp lịch sử hội thoại với tin nhắn hiện tại
-        combined_message = MemoryManager.build_prompt(message, conversation_history)
+            # Sử dụng Runner từ OpenAI Agents SDK để xử lý tin nhắn đã kết hợp
+            with turn_scope():
+                result = await run_agent(self.agent, combined_message, self.profile)
         
-        # Sử dụng Runner từ OpenAI Agents SDK để xử lý tin nhắn đã kết hợp
-        result = await Runner.run(self.agent, combined_message)
+            # Trích xuất thông tin sản phẩm từ kết quả của tool
+            source_documents = self._extract_products_from_result(result)
         
-        # Trích xuất thông tin sản phẩm từ kết quả của tool
-        source_documents = self._extract_products_from_result(result)
-        
-        # Cấu trúc kết quả để tương thích với API hiện tại
-        return {
-            "message": result.final_output,
-            "thread_id": thread_id,
-            "source_documents": source_documents
-        }
+            # Cấu trúc kết quả để tương thích với API hiện tại
+            return {
+                "message": result.final_output,
+                "thread_id": thread_id,
+                "source_documents": source_documents
+            }
 
-# Singleton instance
-cart_agent = CartAgentWrapper() 
+    async def stream(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, Any]] = None,
+        thread_id: str = None,
+        user_id: str = None,
+        auth_token: str = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Xử lý tin nhắn ở chế độ streaming (dùng cho /chat/stream), sinh các sự kiện của stream_run
+        
+        Args:
+            message: Tin nhắn người dùng
+            conversation_history: Lịch sử trò chuyện (nếu có)
+            thread_id: ID cuộc trò chuyện
+            user_id: ID người dùng
+            auth_token: Token xác thực JWT
+        """
+        prompt = MemoryManager.build_input(message, conversation_history)
+        
+        # Gắn token xác thực vào context của request hiện tại
+        # (turn_scope: các tool trong lượt dùng chung giỏ hàng đã biết)
+        with auth_context(auth_token), turn_scope():
+            async for event in stream_run(self.agent, prompt, self._extract_products_from_result, self.profile):
+                yield event
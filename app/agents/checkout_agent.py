@@ -1,10 +1,15 @@
-from agents import Agent, Runner
-from typing import Any, Dict, List
+from agents import Agent
+from typing import Any, AsyncIterator, Dict, List
 
+from ..client.auth_context import auth_context
 from ..client.spring_client import spring_boot_client
-from ..core.config import settings
+from .profiles import agent_profile
+from .runner import run_agent
 from ..core.hooks import CustomAgentHooks
+from ..core.turn_state import turn_scope
 from ..prompts.checkout_agent import CHECKOUT_AGENT_PROMPT
+from .source_documents import CART_TOOLS, ORDER_TOOLS, PRODUCT_TOOLS, extract_source_documents
+from .streaming import stream_run
 from ..tools.cart_tools import (
     create_order,
     get_cart,
@@ -24,15 +29,23 @@ class CheckoutAgentWrapper:
     """
     Agent xử lý quá trình thanh toán và tạo đơn hàng
     """
+    # Tool được lấy kết quả làm source_documents khi trả lời qua handoff của Triage
+    # (process/stream của agent chỉ trả về đơn hàng, xem _extract_order_documents)
+    SOURCE_TOOLS = PRODUCT_TOOLS | CART_TOOLS | ORDER_TOOLS
+
     def __init__(self):
         # Tạo hooks cho checkout agent
         self.hooks = CustomAgentHooks("Checkout")
         
+        # Model và giới hạn sinh văn bản riêng của agent (CHECKOUT_MODEL, CHECKOUT_MAX_TOKENS, ...)
+        self.profile = agent_profile("checkout")
+        
         # Tạo agent sử dụng OpenAI Agents SDK
         self.agent = Agent(
             name="Checkout Assistant",
             instructions=CHECKOUT_AGENT_PROMPT,
-            model=settings.CHAT_MODEL,
+            model=self.profile.model,
+            model_settings=self.profile.model_settings(),
             tools=[
                 get_cart,           # Lấy thông tin giỏ hàng
                 get_product_by_id,  # Lấy thông tin sản phẩm
@@ -58,45 +71,43 @@ class CheckoutAgentWrapper:
         """
         # Cập nhật token cho Spring Boot client
         print(f"Auth token received: {auth_token[:20]}...") if auth_token else print("Auth token is None")
-        spring_boot_client.update_auth_token(auth_token)
-        
-        # Kiểm tra giỏ hàng trước khi xử lý
-        cart = spring_boot_client.get_cart()
-        print(f"Checkout Agent - Get Cart Result: {cart}")
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token):
+            # Kiểm tra giỏ hàng trước khi xử lý
+            cart = await spring_boot_client.get_cart()
+            print(f"Checkout Agent - Get Cart Result: {cart}")
         
-        if not cart:
-            print("Checkout Agent - Cart is None")
-            return {
-                "message": "Giỏ hàng của bạn đang trống. Vui lòng thêm sản phẩm vào giỏ hàng trước khi thanh toán.",
-                "source_documents": [],
-                "thread_id": thread_id
-            }
+            if not cart:
+                print("Checkout Agent - Cart is None")
+                return {
+                    "message": "Giỏ hàng của bạn đang trống. Vui lòng thêm sản phẩm vào giỏ hàng trước khi thanh toán.",
+                    "source_documents": [],
+                    "thread_id": thread_id
+                }
             
-        if not cart.get("items"):
-            print(f"Checkout Agent - Cart items is empty or not found. Cart structure: {cart}")
-            return {
-                "message": "Giỏ hàng của bạn đang trống. Vui lòng thêm sản phẩm vào giỏ hàng trước khi thanh toán.",
-                "source_documents": [],
-                "thread_id": thread_id
-            }
+            if not cart.get("items"):
+                print(f"Checkout Agent - Cart items is empty or not found. Cart structure: {cart}")
+                return {
+                    "message": "Giỏ hàng của bạn đang trống. Vui lòng thêm sản phẩm vào giỏ hàng trước khi thanh toán.",
+                    "source_documents": [],
+                    "thread_id": thread_id
+                }
             
-        # Sử dụng Runner để xử lý tin nhắn
-        print(f"Checkout Agent - Processing message with cart: {cart}")
-        result = await Runner.run(self.agent, message)
+            # Sử dụng Runner để xử lý tin nhắn
+            # Giỏ hàng đã lấy được đưa vào ngữ cảnh và trạng thái của lượt,
+            # agent không cần gọi lại get_cart
+            print(f"Checkout Agent - Processing message with cart: {cart}")
+            with turn_scope(cart=cart):
+                result = await run_agent(self.agent, self._with_cart_context(message, cart), self.profile)
         
-        # Nếu có order_id trong kết quả, thêm thông tin đơn hàng vào source_documents
-        source_documents = []
-        if hasattr(result, 'tool_results'):
-            for tool_result in result.tool_results:
-                if tool_result.tool_name in ['create_order', 'get_order_info', 'get_payment_info']:
-                    if isinstance(tool_result.output, dict):
-                        source_documents.append(tool_result.output)
+            # Nếu có order_id trong kết quả, thêm thông tin đơn hàng vào source_documents
+            source_documents = self._extract_order_documents(result)
         
-        return {
-            "message": result.final_output,
-            "source_documents": source_documents,
-            "thread_id": thread_id
-        }
+            return {
+                "message": result.final_output,
+                "source_documents": source_documents,
+                "thread_id": thread_id
+            }
         
     async def process_with_history(
         self, 
@@ -121,159 +132,99 @@ class CheckoutAgentWrapper:
         """
         # Cập nhật token cho Spring Boot client
         print(f"Auth token received in process_with_history: {auth_token[:20]}...") if auth_token else print("Auth token is None in process_with_history")
-        spring_boot_client.update_auth_token(auth_token)
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token):
+            # Kiểm tra giỏ hàng trước khi xử lý
+            cart = await spring_boot_client.get_cart()
+            print(f"Checkout Agent (with history) - Get Cart Result: {cart}")
         
-        # Kiểm tra giỏ hàng trước khi xử lý
-        cart = spring_boot_client.get_cart()
-        print(f"Checkout Agent (with history) - Get Cart Result: {cart}")
-        
-        if not cart:
-            print("Checkout Agent (with history) - Cart is None")
-            return {
-                "message": "Giỏ hàng của bạn đang trống. Vui lòng thêm sản phẩm vào giỏ hàng trước khi thanh toán.",
-                "source_documents": [],
-                "thread_id": thread_id
-            }
+            if not cart:
+                print("Checkout Agent (with history) - Cart is None")
+                return {
+                    "message": "Giỏ hàng của bạn đang trống. Vui lòng thêm sản phẩm vào giỏ hàng trước khi thanh toán.",
+                    "source_documents": [],
+                    "thread_id": thread_id
+                }
             
-        if not cart.get("items"):
-            print(f"Checkout Agent (with history) - Cart items is empty or not found. Cart structure: {cart}")
-            return {
-                "message": "Giỏ hàng của bạn đang trống. Vui lòng thêm sản phẩm vào giỏ hàng trước khi thanh toán.",
-                "source_documents": [],
-                "thread_id": thread_id
-            }
+            if not cart.get("items"):
+                print(f"Checkout Agent (with history) - Cart items is empty or not found. Cart structure: {cart}")
+                return {
+                    "message": "Giỏ hàng của bạn đang trống. Vui lòng thêm sản phẩm vào giỏ hàng trước khi thanh toán.",
+                    "source_documents": [],
+                    "thread_id": thread_id
+                }
         
-        # Kết hợp lịch sử hội thoại với tin nhắn hiện tại
-        combined_message = MemoryManager.build_prompt(message, conversation_history)
+            # Lịch sử hội thoại rồi tin nhắn hiện tại (kèm giỏ hàng đã lấy sẵn)
+            agent_input = MemoryManager.build_input(
+                self._with_cart_context(message, cart), conversation_history, raw_message=message
+            )
         
-        # Sử dụng Runner để xử lý tin nhắn đã kết hợp
-        result = await Runner.run(self.agent, combined_message)
+            # Sử dụng Runner để xử lý lịch sử và tin nhắn hiện tại
+            with turn_scope(cart=cart):
+                result = await run_agent(self.agent, agent_input, self.profile)
         
-        # Nếu có order_id trong kết quả, thêm thông tin đơn hàng vào source_documents
-        source_documents = []
-        if hasattr(result, 'tool_results'):
-            for tool_result in result.tool_results:
-                if tool_result.tool_name in ['create_order', 'get_order_info', 'get_payment_info']:
-                    if isinstance(tool_result.output, dict):
-                        source_documents.append(tool_result.output)
+            # Nếu có order_id trong kết quả, thêm thông tin đơn hàng vào source_documents
+            source_documents = self._extract_order_documents(result)
         
-        return {
-            "message": result.final_output,
-            "source_documents": source_documents,
-            "thread_id": thread_id
-        }
+            return {
+                "message": result.final_output,
+                "source_documents": source_documents,
+                "thread_id": thread_id
+            }
+
+    @staticmethod
+    def _extract_order_documents(result: Any) -> List[Dict[str, Any]]:
+        """
+        Thông tin đơn hàng/thanh toán từ kết quả tool, trả về trong source_documents
+        """
+        return extract_source_documents(result, ORDER_TOOLS)
+
+    @staticmethod
+    def _with_cart_context(message: str, cart: Dict[str, Any]) -> str:
+        """
+        Gắn giỏ hàng đã lấy sẵn vào tin nhắn để agent không phải gọi lại tool get_cart
+        """
+        cart_json = json.dumps(cart, ensure_ascii=False)
+        return f"{message}\n\n[Giỏ hàng hiện tại của khách hàng (hệ thống đã lấy sẵn)]: {cart_json}"
 
-    def _extract_products_from_result(self, result: Any) -> List[Dict[str, Any]]:
+    async def stream(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, Any]] = None,
+        thread_id: str = None,
+        user_id: str = None,
+        auth_token: str = None
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
-        Trích xuất thông tin sản phẩm từ kết quả của tool
+        Xử lý tin nhắn ở chế độ streaming (dùng cho /chat/stream), sinh các sự kiện của stream_run
         
         Args:
-            result: Kết quả từ tool
-            
-        Returns:
-            List[Dict]: Danh sách thông tin sản phẩm
+            message: Tin nhắn người dùng
+            conversation_history: Lịch sử trò chuyện (nếu có)
+            thread_id: ID cuộc trò chuyện
+            user_id: ID người dùng
+            auth_token: Token xác thực JWT
         """
-        source_documents = []
-        try:
-            # Kiểm tra xem trong kết quả có chứa thông tin sản phẩm không
-            if hasattr(result, 'tool_results') and result.tool_results:
-                for tool_result in result.tool_results:
-                    # Xử lý kết quả từ get_cart
-                    if tool_result.tool_name == 'get_cart':
-                        # Parse kết quả JSON từ tool
-                        if isinstance(tool_result.output, str):
-                            try:
-                                cart_data = json.loads(tool_result.output)
-                            except:
-                                continue
-                        else:
-                            cart_data = tool_result.output
-                            
-                        # Trích xuất thông tin sản phẩm từ cart
-                        if isinstance(cart_data, dict) and "items" in cart_data:
-                            for item in cart_data["items"]:
-                                if isinstance(item, dict) and "product" in item:
-                                    product = item["product"]
-                                    # Lấy URL hình ảnh
-                                    image_url = product.get("image_url", "")
-                                    # Tạo thẻ img HTML nếu có URL hình ảnh
-                                    image_html = f'<img src="{image_url}" alt="{product.get("name", "Sản phẩm bánh")}" />' if image_url else ""
-                                    
-                                    source_documents.append({
-                                        "id": product.get("id", ""),
-                                        "name": product.get("name", ""),
-                                        "price": product.get("price", 0),
-                                        "quantity_in_cart": item.get("quantity", 0),
-                                        "image_url": image_url,
-                                        "image_html": image_html,  # Thêm trường mới chứa thẻ HTML
-                                        "in_cart": True
-                                    })
-                                    
-                    # Xử lý kết quả từ get_product_by_id hoặc check_product_availability
-                    elif tool_result.tool_name in ['get_product_by_id', 'check_product_availability', 'rag_product_search']:
-                        # Parse kết quả JSON từ tool
-                        if isinstance(tool_result.output, str):
-                            try:
-                                products = json.loads(tool_result.output)
-                            except:
-                                continue
-                        else:
-                            products = tool_result.output
-                            
-                        # Xử lý trường hợp kết quả là một list hoặc dict
-                        if isinstance(products, dict):
-                            products = [products]
-                        elif not isinstance(products, list):
-                            continue
-                            
-                        # Thêm từng sản phẩm vào source_documents
-                        for product in products:
-                            if isinstance(product, dict):
-                                # Lấy URL hình ảnh
-                                image_url = product.get("image_url", "")
-                                # Tạo thẻ img HTML nếu có URL hình ảnh
-                                image_html = f'<img src="{image_url}" alt="{product.get("name", "Sản phẩm bánh")}" />' if image_url else ""
-                                
-                                source_documents.append({
-                                    "id": product.get("id", ""),
-                                    "name": product.get("name", ""),
-                                    "price": product.get("price", 0),
-                                    "description": product.get("description", ""),
-                                    "image_url": image_url,
-                                    "image_html": image_html,  # Thêm trường mới chứa thẻ HTML
-                                    "category": product.get("category", ""),
-                                    "status": product.get("status", ""),
-                                    "quantity": product.get("quantity", 0),
-                                    "available": product.get("available", None),
-                                    "relevance_score": product.get("relevance_score", 0)
-                                })
-                    
-                    # Xử lý kết quả từ create_order
-                    elif tool_result.tool_name == 'create_order':
-                        # Parse kết quả JSON từ tool
-                        if isinstance(tool_result.output, str):
-                            try:
-                                order_data = json.loads(tool_result.output)
-                            except:
-                                continue
-                        else:
-                            order_data = tool_result.output
-                            
-                        # Trích xuất thông tin đơn hàng
-                        if isinstance(order_data, dict):
-                            order_info = {
-                                "order_id": order_data.get("id", ""),
-                                "total_amount": order_data.get("total_amount", 0),
-                                "payment_method": order_data.get("payment_method", ""),
-                                "payment_url": order_data.get("payment_url", ""),
-                                "status": order_data.get("status", ""),
-                                "created_at": order_data.get("created_at", "")
-                            }
-                            source_documents.append(order_info)
-        except Exception as e:
-            print(f"Error extracting products: {str(e)}")
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token):
+            # Kiểm tra giỏ hàng trước khi xử lý
+            cart = await spring_boot_client.get_cart()
+            if not cart or not cart.get("items"):
+                yield {
+                    "event": "final",
+                    "data": {
+                        "message": "Giỏ hàng của bạn đang trống. Vui lòng thêm sản phẩm vào giỏ hàng trước khi thanh toán.",
+                        "source_documents": [],
+                        "agent_name": self.agent.name
+                    }
+                }
+                return
             
-        return source_documents
-
-# Singleton instance
-checkout_agent = CheckoutAgentWrapper() 
+            agent_input = MemoryManager.build_input(
+                self._with_cart_context(message, cart), conversation_history, raw_message=message
+            )
+            
+            # Giỏ hàng đã lấy được đưa vào ngữ cảnh và trạng thái của lượt
+            with turn_scope(cart=cart):
+                async for event in stream_run(self.agent, agent_input, self._extract_order_documents, self.profile):
+                    yield event
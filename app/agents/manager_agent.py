@@ -1,58 +1,68 @@
-from agents import Agent, Runner
-from typing import Any, Dict, List
+from agents import Agent
+from typing import Any, Dict, List, Optional
 
-from ..client.spring_client import spring_boot_client
+from ..client.auth_context import auth_context
 from ..core.config import settings
+from .profiles import agent_profile
+from .runner import run_agent
 from ..core.hooks import CustomAgentHooks
 from ..prompts.manager_agent import MANAGER_AGENT_PROMPT
+from ..routing.centroid_classifier import centroid_classifier
+from ..routing.route_cache import normalize_message, routing_cache
+from ..routing.rule_router import rule_router
 from ..tools.manager_tools import get_assistant_info
-from .cart_agent import cart_agent
-from .checkout_agent import checkout_agent
-from .product_agent import product_agent
-from .shop_agent import shop_agent
 from ..memory.memory_manager import MemoryManager
 
+# Tool (tên, mô tả) của từng agent chuyên biệt khi được Manager gọi như một tool
+SPECIALIST_TOOLS = {
+    "product": (
+        "consult_product_expert",
+        "Chuyển câu hỏi cho chuyên gia sản phẩm khi khách hàng hỏi về thông tin sản phẩm, so sánh sản phẩm, tìm kiếm sản phẩm"
+    ),
+    "cart": (
+        "consult_cart_expert",
+        "Chuyển câu hỏi cho chuyên gia giỏ hàng khi khách hàng muốn thêm sản phẩm vào giỏ hàng, xem giỏ hàng, sửa giỏ hàng"
+    ),
+    "shop": (
+        "consult_shop_expert",
+        "Chuyển câu hỏi cho chuyên gia cửa hàng khi khách hàng hỏi về thông tin cửa hàng, chính sách vận chuyển, đổi trả"
+    ),
+    "checkout": (
+        "consult_checkout_expert",
+        "Chuyển câu hỏi cho chuyên gia thanh toán khi khách hàng muốn thanh toán, tạo đơn hàng, xem thông tin đơn hàng"
+    )
+}
+
 class ManagerAgentWrapper:
     """
     Agent quản lý xử lý phân loại tin nhắn và chuyển tiếp giữa các agent chuyên biệt
     """
-    def __init__(self):
+    def __init__(self, specialists: Dict[str, Any]):
+        """
+        Args:
+            specialists: Map intent (product, cart, shop, checkout) -> wrapper của agent chuyên biệt đang bật
+        """
         # Tạo hooks cho manager agent
         self.hooks = CustomAgentHooks("Manager")
         
-        # Định nghĩa các agent khác như tools
-        self.product_tool = product_agent.agent.as_tool(
-            tool_name="consult_product_expert",
-            tool_description="Chuyển câu hỏi cho chuyên gia sản phẩm khi khách hàng hỏi về thông tin sản phẩm, so sánh sản phẩm, tìm kiếm sản phẩm"
-        )
-        
-        self.cart_tool = cart_agent.agent.as_tool(
-            tool_name="consult_cart_expert",
-            tool_description="Chuyển câu hỏi cho chuyên gia giỏ hàng khi khách hàng muốn thêm sản phẩm vào giỏ hàng, xem giỏ hàng, sửa giỏ hàng"
-        )
+        # Định nghĩa các agent chuyên biệt như tools
+        self.specialist_tools = [
+            specialists[intent].agent.as_tool(tool_name=tool_name, tool_description=tool_description)
+            for intent, (tool_name, tool_description) in SPECIALIST_TOOLS.items()
+            if intent in specialists
+        ]
         
-        self.shop_tool = shop_agent.agent.as_tool(
-            tool_name="consult_shop_expert",
-            tool_description="Chuyển câu hỏi cho chuyên gia cửa hàng khi khách hàng hỏi về thông tin cửa hàng, chính sách vận chuyển, đổi trả"
-        )
-        
-        self.checkout_tool = checkout_agent.agent.as_tool(
-            tool_name="consult_checkout_expert",
-            tool_description="Chuyển câu hỏi cho chuyên gia thanh toán khi khách hàng muốn thanh toán, tạo đơn hàng, xem thông tin đơn hàng"
-        )
+        # Model và giới hạn sinh văn bản riêng của Manager và Analyzer (Analyzer chỉ trả về một từ)
+        self.profile = agent_profile("manager")
+        self.analyzer_profile = agent_profile("analyzer")
         
         # Tạo agent chính sử dụng các agent khác như tools
         self.agent = Agent(
             name="Manager Assistant",
             instructions=MANAGER_AGENT_PROMPT,
-            model=settings.CHAT_MODEL,
-            tools=[
-                get_assistant_info,
-                self.product_tool,
-                self.cart_tool,
-                self.shop_tool,
-                self.checkout_tool
-            ],
+            model=self.profile.model,
+            model_settings=self.profile.model_settings(),
+            tools=[get_assistant_info, *self.specialist_tools],
             hooks=self.hooks
         )
         
@@ -71,15 +81,70 @@ class ManagerAgentWrapper:
             
             Chỉ trả về một trong bốn giá trị: product, cart, shop, checkout. Không thêm bất kỳ thông tin nào khác.
             """,
-            model=settings.CHAT_MODEL,
+            model=self.analyzer_profile.model,
+            model_settings=self.analyzer_profile.model_settings(),
             hooks=CustomAgentHooks("Analyzer")
         )
     
     async def _analyze_message(self, message: str) -> str:
         """
         Phân tích tin nhắn để xác định agent phù hợp
+        
+        Thứ tự: luật từ khóa -> cache quyết định -> centroid embedding (đủ tin cậy) -> agent Analyzer (LLM).
+        Chỉ tin nhắn nhập nhằng ở các tầng trước mới cần gọi LLM.
         """
-        result = await Runner.run(self.analysis_agent, message)
+        intent = await self.route_without_llm(message)
+        if intent is not None:
+            return intent
+        
+        print("[ROUTER] Chuyển cho Analyzer")
+        intent = await self._analyze_with_llm(message)
+        self.remember_route(message, intent)
+        return intent
+    
+    async def route_without_llm(self, message: str) -> Optional[str]:
+        """
+        Xác định agent mà không cần gọi chat LLM (luật từ khóa, cache quyết định, centroid embedding)
+        
+        Returns:
+            product/cart/shop/checkout, hoặc None nếu tin nhắn cần LLM phân loại
+        """
+        if settings.ROUTING_FAST_PATH_ENABLED:
+            intent = rule_router.classify(message)
+            if intent is not None:
+                print(f"[ROUTER] Fast path: '{message[:50]}' -> {intent}")
+                return intent
+        
+        # Các tin nhắn lặp lại (sau khi chuẩn hóa) dùng lại quyết định của centroid/LLM
+        if settings.ROUTING_CACHE_ENABLED:
+            intent = routing_cache.get(normalize_message(message))
+            if intent is not None:
+                print(f"[ROUTER] Cache hit: '{message[:50]}' -> {intent}")
+                return intent
+        
+        if settings.ROUTING_CENTROID_ENABLED:
+            try:
+                prediction = await centroid_classifier.classify(message)
+                print(f"[ROUTER] Centroid: '{message[:50]}' -> {prediction.intent} "
+                      f"(confidence={prediction.confidence}, margin={prediction.margin}, accepted={prediction.accepted})")
+                if prediction.accepted:
+                    self.remember_route(message, prediction.intent)
+                    return prediction.intent
+            except Exception as e:
+                print(f"[ROUTER] Lỗi khi phân loại bằng centroid: {str(e)}")
+        
+        return None
+    
+    def remember_route(self, message: str, intent: str) -> None:
+        """Lưu quyết định routing (của centroid hoặc LLM) vào cache theo tin nhắn đã chuẩn hóa"""
+        if settings.ROUTING_CACHE_ENABLED and intent in ["product", "cart", "shop", "checkout"]:
+            routing_cache.set(normalize_message(message), intent)
+    
+    async def _analyze_with_llm(self, message: str) -> str:
+        """
+        Phân loại tin nhắn bằng agent Analyzer
+        """
+        result = await run_agent(self.analysis_agent, message, self.analyzer_profile)
         analysis_result = result.final_output.strip().lower()
         
         # Nếu kết quả là unknown hoặc không thuộc các loại được định nghĩa,
@@ -99,61 +164,60 @@ class ManagerAgentWrapper:
             user_id: ID người dùng
             auth_token: Token xác thực JWT
         """
-        # Cập nhật token xác thực cho spring_boot_client nếu có
-        spring_boot_client.update_auth_token(auth_token)
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token):
+            # Phân tích tin nhắn
+            analysis_result = await self._analyze_message(message)
         
-        # Phân tích tin nhắn
-        analysis_result = await self._analyze_message(message)
+            # Chuyển tiếp dựa trên kết quả phân tích
+            if analysis_result in ["product", "cart", "shop", "checkout"]:
+                return {
+                    "handoff": True,
+                    "target_agent": analysis_result,
+                    "original_message": message,
+                    "thread_id": thread_id,
+                    "user_id": user_id,
+                    "auth_token": auth_token
+                }
         
-        # Chuyển tiếp dựa trên kết quả phân tích
-        if analysis_result in ["product", "cart", "shop", "checkout"]:
+            # Không nên đạt tới đây vì _analyze_message luôn trả về một trong các giá trị trên
+            # Nhưng để đảm bảo, vẫn sử dụng Manager Agent để xử lý
+            result = await run_agent(self.agent, message, self.profile)
+        
+            # Kiểm tra xem trong kết quả Manager Agent có gọi tool nào không
+            if hasattr(result, 'tool_results') and result.tool_results:
+                for tool_result in result.tool_results:
+                    # Nếu Manager gọi một trong các tool chuyển tiếp,
+                    # trả về kết quả của tool đó thay vì của Manager
+                    if tool_result.tool_name in ['consult_product_expert', 'consult_cart_expert', 
+                                               'consult_shop_expert', 'consult_checkout_expert']:
+                        # Xác định target_agent từ tên tool
+                        target_map = {
+                            'consult_product_expert': 'product',
+                            'consult_cart_expert': 'cart',
+                            'consult_shop_expert': 'shop',
+                            'consult_checkout_expert': 'checkout'
+                        }
+                        target_agent = target_map.get(tool_result.tool_name, 'product')
+                    
+                        return {
+                            "handoff": True,
+                            "target_agent": target_agent,
+                            "original_message": message,
+                            "thread_id": thread_id,
+                            "user_id": user_id,
+                            "auth_token": auth_token
+                        }
+        
+            # Mặc định chuyển tiếp tới Product Agent nếu Manager không thực hiện chuyển tiếp
             return {
                 "handoff": True,
-                "target_agent": analysis_result,
+                "target_agent": "product",
                 "original_message": message,
                 "thread_id": thread_id,
                 "user_id": user_id,
                 "auth_token": auth_token
             }
-        
-        # Không nên đạt tới đây vì _analyze_message luôn trả về một trong các giá trị trên
-        # Nhưng để đảm bảo, vẫn sử dụng Manager Agent để xử lý
-        result = await Runner.run(self.agent, message)
-        
-        # Kiểm tra xem trong kết quả Manager Agent có gọi tool nào không
-        if hasattr(result, 'tool_results') and result.tool_results:
-            for tool_result in result.tool_results:
-                # Nếu Manager gọi một trong các tool chuyển tiếp,
-                # trả về kết quả của tool đó thay vì của Manager
-                if tool_result.tool_name in ['consult_product_expert', 'consult_cart_expert', 
-                                           'consult_shop_expert', 'consult_checkout_expert']:
-                    # Xác định target_agent từ tên tool
-                    target_map = {
-                        'consult_product_expert': 'product',
-                        'consult_cart_expert': 'cart',
-                        'consult_shop_expert': 'shop',
-                        'consult_checkout_expert': 'checkout'
-                    }
-                    target_agent = target_map.get(tool_result.tool_name, 'product')
-                    
-                    return {
-                        "handoff": True,
-                        "target_agent": target_agent,
-                        "original_message": message,
-                        "thread_id": thread_id,
-                        "user_id": user_id,
-                        "auth_token": auth_token
-                    }
-        
-        # Mặc định chuyển tiếp tới Product Agent nếu Manager không thực hiện chuyển tiếp
-        return {
-            "handoff": True,
-            "target_agent": "product",
-            "original_message": message,
-            "thread_id": thread_id,
-            "user_id": user_id,
-            "auth_token": auth_token
-        }
     
     async def process_with_history(
         self, 
@@ -176,68 +240,64 @@ class ManagerAgentWrapper:
         Returns:
             Dict: Kết quả từ agent
         """
-        # Cập nhật token xác thực cho spring_boot_client nếu có
-        spring_boot_client.update_auth_token(auth_token)
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token):
+            # Phân tích tin nhắn mới nhất (không cần lịch sử cho việc phân tích)
+            analysis_result = await self._analyze_message(message)
+        
+            # Chuyển tiếp dựa trên kết quả phân tích
+            if analysis_result in ["product", "cart", "shop", "checkout"]:
+                return {
+                    "handoff": True,
+                    "target_agent": analysis_result,
+                    "original_message": message,
+                    "thread_id": thread_id,
+                    "user_id": user_id,
+                    "auth_token": auth_token,
+                    "conversation_history": conversation_history
+                }
+            
+            # Không nên đạt tới đây vì _analyze_message luôn trả về một trong các giá trị trên
+            # Nhưng để đảm bảo, vẫn sử dụng Manager Agent để xử lý
         
-        # Phân tích tin nhắn mới nhất (không cần lịch sử cho việc phân tích)
-        analysis_result = await self._analyze_message(message)
+            # Kết hợp lịch sử hội thoại với tin nhắn hiện tại
+            combined_message = MemoryManager.build_input(message, conversation_history)
         
-        # Chuyển tiếp dựa trên kết quả phân tích
-        if analysis_result in ["product", "cart", "shop", "checkout"]:
+            result = await run_agent(self.agent, combined_message, self.profile)
+        
+            # Kiểm tra xem trong kết quả Manager Agent có gọi tool nào không
+            if hasattr(result, 'tool_results') and result.tool_results:
+                for tool_result in result.tool_results:
+                    # Nếu Manager gọi một trong các tool chuyển tiếp,
+                    # trả về kết quả của tool đó thay vì của Manager
+                    if tool_result.tool_name in ['consult_product_expert', 'consult_cart_expert', 
+                                               'consult_shop_expert', 'consult_checkout_expert']:
+                        # Xác định target_agent từ tên tool
+                        target_map = {
+                            'consult_product_expert': 'product',
+                            'consult_cart_expert': 'cart',
+                            'consult_shop_expert': 'shop',
+                            'consult_checkout_expert': 'checkout'
+                        }
+                        target_agent = target_map.get(tool_result.tool_name, 'product')
+                    
+                        return {
+                            "handoff": True,
+                            "target_agent": target_agent,
+                            "original_message": message,
+                            "thread_id": thread_id,
+                            "user_id": user_id,
+                            "auth_token": auth_token,
+                            "conversation_history": conversation_history
+                        }
+        
+            # Mặc định chuyển tiếp tới Product Agent nếu Manager không thực hiện chuyển tiếp
             return {
                 "handoff": True,
-                "target_agent": analysis_result,
+                "target_agent": "product",
                 "original_message": message,
                 "thread_id": thread_id,
                 "user_id": user_id,
                 "auth_token": auth_token,
                 "conversation_history": conversation_history
             }
-            
-        # Không nên đạt tới đây vì _analyze_message luôn trả về một trong các giá trị trên
-        # Nhưng để đảm bảo, vẫn sử dụng Manager Agent để xử lý
-        
-        # Kết hợp lịch sử hội thoại với tin nhắn hiện tại
-        combined_message = MemoryManager.build_prompt(message, conversation_history)
-        
-        result = await Runner.run(self.agent, combined_message)
-        
-        # Kiểm tra xem trong kết quả Manager Agent có gọi tool nào không
-        if hasattr(result, 'tool_results') and result.tool_results:
-            for tool_result in result.tool_results:
-                # Nếu Manager gọi một trong các tool chuyển tiếp,
-                # trả về kết quả của tool đó thay vì của Manager
-                if tool_result.tool_name in ['consult_product_expert', 'consult_cart_expert', 
-                                           'consult_shop_expert', 'consult_checkout_expert']:
-                    # Xác định target_agent từ tên tool
-                    target_map = {
-                        'consult_product_expert': 'product',
-                        'consult_cart_expert': 'cart',
-                        'consult_shop_expert': 'shop',
-                        'consult_checkout_expert': 'checkout'
-                    }
-                    target_agent = target_map.get(tool_result.tool_name, 'product')
-                    
-                    return {
-                        "handoff": True,
-                        "target_agent": target_agent,
-                        "original_message": message,
-                        "thread_id": thread_id,
-                        "user_id": user_id,
-                        "auth_token": auth_token,
-                        "conversation_history": conversation_history
-                    }
-        
-        # Mặc định chuyển tiếp tới Product Agent nếu Manager không thực hiện chuyển tiếp
-        return {
-            "handoff": True,
-            "target_agent": "product",
-            "original_message": message,
-            "thread_id": thread_id,
-            "user_id": user_id,
-            "auth_token": auth_token,
-            "conversation_history": conversation_history
-        }
-
-# Singleton instance
-manager_agent = ManagerAgentWrapper() 
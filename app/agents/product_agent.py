@@ -1,14 +1,20 @@
-from agents import Agent, Runner
-from typing import Any, Dict, List
+from agents import Agent
+from typing import Any, AsyncIterator, Dict, List
 
-from ..client.spring_client import spring_boot_client
-from ..core.config import settings
+from ..client.auth_context import auth_context
+from .profiles import agent_profile
+from .runner import run_agent
 from ..core.hooks import CustomAgentHooks
+from ..core.metrics import run_total_tokens
+from ..core.turn_state import turn_scope
 from ..prompts.product_agent import PRODUCT_AGENT_PROMPT
+from .source_documents import PRODUCT_TOOLS, extract_source_documents, has_tool_errors
+from .streaming import stream_run
 from ..tools.product_tools import (
     check_product_availability,
     find_products_by_price_range,
     get_product_by_id,
+    get_products_by_ids,
     rag_product_search,
 )
 import json
@@ -18,83 +24,61 @@ class ProductAgentWrapper:
     """
     Agent chuyên biệt về sản phẩm giúp người dùng tìm kiếm và tra cứu thông tin sản phẩm
     """
+    # Tool được lấy kết quả làm source_documents (xem extract_source_documents)
+    SOURCE_TOOLS = PRODUCT_TOOLS
+
     def __init__(self):
         # Tạo hooks cho product agent
         self.hooks = CustomAgentHooks("Product")
         
+        # Model và giới hạn sinh văn bản riêng của agent (PRODUCT_MODEL, PRODUCT_MAX_TOKENS, ...)
+        self.profile = agent_profile("product")
+        
         # Tạo agent sử dụng OpenAI Agents SDK
         self.agent = Agent(
             name="Product Expert",
             instructions=PRODUCT_AGENT_PROMPT,
-            model=settings.CHAT_MODEL,
+            model=self.profile.model,
+            model_settings=self.profile.model_settings(),
             tools=[
                 rag_product_search,       # Tool tìm kiếm RAG sản phẩm
                 get_product_by_id,        # Tool lấy thông tin sản phẩm theo ID
+                get_products_by_ids,      # Tool lấy nhiều sản phẩm cùng lúc theo danh sách ID
                 check_product_availability, # Tool kiểm tra sản phẩm còn hàng
                 find_products_by_price_range, # Tool tìm kiếm sản phẩm theo khoảng giá trực tiếp từ API
             ],
             hooks=self.hooks
         )
     
-    def _extract_products_from_result(self, result: Any) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _with_prefetched_products(message: str, products: List[Dict[str, Any]]) -> str:
         """
-        Trích xuất thông tin sản phẩm từ kết quả của tool
-        
-        Args:
-            result: Kết quả từ tool
-            
-        Returns:
-            List[Dict]: Danh sách thông tin sản phẩm
+        Gắn kết quả tìm kiếm RAG đã chạy sẵn (trong lúc routing) vào tin nhắn để agent không phải
+        gọi lại rag_product_search cho cùng câu hỏi
         """
-        source_documents = []
-        try:
-            # Kiểm tra xem trong kết quả có chứa thông tin sản phẩm không
-            if hasattr(result, 'tool_results') and result.tool_results:
-                for tool_result in result.tool_results:
-                    # Chỉ xử lý kết quả từ các tool liên quan đến sản phẩm
-                    if tool_result.tool_name in ['get_product_by_id', 'rag_product_search', 'check_product_availability', 'find_products_by_price_range']:
-                        # Parse kết quả JSON từ tool
-                        if isinstance(tool_result.output, str):
-                            try:
-                                products = json.loads(tool_result.output)
-                            except:
-                                continue
-                        else:
-                            products = tool_result.output
-                            
-                        # Xử lý trường hợp kết quả là một list hoặc dict
-                        if isinstance(products, dict):
-                            products = [products]
-                        elif not isinstance(products, list):
-                            continue
-                            
-                        # Thêm từng sản phẩm vào source_documents
-                        for product in products:
-                            if isinstance(product, dict):
-                                # Lấy URL hình ảnh
-                                image_url = product.get("image_url", "")
-                                # Tạo thẻ img HTML nếu có URL hình ảnh
-                                image_html = f'<img src="{image_url}" alt="{product.get("name", "Sản phẩm bánh")}" />' if image_url else ""
-                                
-                                source_documents.append({
-                                    "id": product.get("id", ""),
-                                    "name": product.get("name", ""),
-                                    "price": product.get("price", 0),
-                                    "description": product.get("description", ""),
-                                    "image_url": image_url,
-                                    "image_html": image_html,  # Thêm trường mới chứa thẻ HTML
-                                    "category": product.get("category", ""),
-                                    "status": product.get("status", ""),
-                                    "quantity": product.get("quantity", 0),
-                                    "available": product.get("available", None),
-                                    "relevance_score": product.get("relevance_score", 0)
-                                })
-        except Exception as e:
-            print(f"Error extracting products: {str(e)}")
-            
-        return source_documents
+        if not products:
+            return message
+        products_json = json.dumps(products, ensure_ascii=False)
+        return (
+            f"{message}\n\n"
+            f"[Kết quả tìm kiếm sản phẩm (RAG) cho tin nhắn trên, đã tra cứu sẵn - dùng nếu phù hợp, "
+            f"chỉ gọi rag_product_search khi cần tìm thông tin khác]: {products_json}"
+        )
+    
+    def _source_documents(self, result: Any, prefetched_products: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        source_documents từ kết quả tool, cộng thêm các sản phẩm đã tra cứu sẵn (không trùng ID)
+        """
+        return extract_source_documents(result, self.SOURCE_TOOLS, extra_products=prefetched_products)
     
-    async def process(self, message: str, thread_id: str = None, user_id: str = None, auth_token: str = None):
+    async def process(
+        self,
+        message: str,
+        thread_id: str = None,
+        user_id: str = None,
+        auth_token: str = None,
+        prefetched_products: List[Dict[str, Any]] = None
+    ):
         """
         Xử lý tin nhắn liên quan đến sản phẩm
         
@@ -103,21 +87,26 @@ class ProductAgentWrapper:
             thread_id: ID cuộc trò chuyện
             user_id: ID người dùng
             auth_token: Token xác thực JWT
+            prefetched_products: Kết quả RAG đã tra cứu sẵn trong lúc routing (nếu có)
         """
-        # Cập nhật token xác thực cho spring_boot_client nếu có
-        spring_boot_client.update_auth_token(auth_token)
-        
-        # Sử dụng Runner từ OpenAI Agents SDK để xử lý tin nhắn
-        result = await Runner.run(self.agent, message)
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token):
+            # Sử dụng Runner từ OpenAI Agents SDK để xử lý tin nhắn
+            # (turn_scope: kết quả tool chỉ đọc được dùng lại trong lượt)
+            with turn_scope():
+                result = await run_agent(self.agent, self._with_prefetched_products(message, prefetched_products), self.profile)
         
-        # Trích xuất thông tin sản phẩm từ kết quả của tool
-        source_documents = self._extract_products_from_result(result)
+            # Trích xuất thông tin sản phẩm từ kết quả của tool
+            source_documents = self._source_documents(result, prefetched_products)
         
-        return {
-            "message": result.final_output,
-            "source_documents": source_documents,
-            "thread_id": thread_id
-        }
+            return {
+                "message": result.final_output,
+                "source_documents": source_documents,
+                "thread_id": thread_id,
+                "total_tokens": run_total_tokens(result),
+                # Câu trả lời dựa trên kết quả tool bị lỗi thì không được lưu vào answer cache
+                "tool_errors": has_tool_errors(result)
+            }
         
     async def process_with_history(
         self, 
@@ -125,7 +114,8 @@ class ProductAgentWrapper:
         conversation_history: List[Dict[str, Any]], 
         thread_id: str = None, 
         user_id: str = None, 
-        auth_token: str = None
+        auth_token: str = None,
+        prefetched_products: List[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Xử lý tin nhắn liên quan đến sản phẩm với lịch sử trò chuyện
@@ -136,27 +126,68 @@ class ProductAgentWrapper:
             thread_id: ID cuộc trò chuyện
             user_id: ID người dùng
             auth_token: Token xác thực JWT
+            prefetched_products: Kết quả RAG đã tra cứu sẵn trong lúc routing (nếu có)
             
         Returns:
             Dict: Kết quả từ agent
         """
-        # Cập nhật token xác thực cho spring_boot_client nếu có
-        spring_boot_client.update_auth_token(auth_token)
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token):
+            # Lịch sử hội thoại rồi tin nhắn hiện tại (kèm kết quả tìm kiếm đã tra cứu sẵn)
+            agent_input = MemoryManager.build_input(
+                self._with_prefetched_products(message, prefetched_products), conversation_history, raw_message=message
+            )
         
-        # Kết hợp lịch sử hội thoại với tin nhắn hiện tại
-        combined_message = MemoryManager.build_prompt(message, conversation_history)
+            # Sử dụng Runner với lịch sử và tin nhắn hiện tại
+            with turn_scope():
+                result = await run_agent(self.agent, agent_input, self.profile)
         
-        # Sử dụng Runner với chuỗi tin nhắn đã kết hợp
-        result = await Runner.run(self.agent, combined_message)
+            # Trích xuất thông tin sản phẩm từ kết quả của tool
+            source_documents = self._source_documents(result, prefetched_products)
         
-        # Trích xuất thông tin sản phẩm từ kết quả của tool
-        source_documents = self._extract_products_from_result(result)
-        
-        return {
-            "message": result.final_output,
-            "source_documents": source_documents,
-            "thread_id": thread_id
-        }
+            return {
+                "message": result.final_output,
+                "source_documents": source_documents,
+                "thread_id": thread_id,
+                "total_tokens": run_total_tokens(result),
+                # Câu trả lời dựa trên kết quả tool bị lỗi thì không được lưu vào answer cache
+                "tool_errors": has_tool_errors(result)
+            }
 
-# Singleton instance
-product_agent = ProductAgentWrapper()
+    async def stream(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, Any]] = None,
+        thread_id: str = None,
+        user_id: str = None,
+        auth_token: str = None,
+        prefetched_products: List[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Xử lý tin nhắn ở chế độ streaming (dùng cho /chat/stream), sinh các sự kiện của stream_run
+        
+        Args:
+            message: Tin nhắn người dùng
+            conversation_history: Lịch sử trò chuyện (nếu có)
+            thread_id: ID cuộc trò chuyện
+            user_id: ID người dùng
+            auth_token: Token xác thực JWT
+            prefetched_products: Kết quả RAG đã tra cứu sẵn trong lúc routing (nếu có)
+        """
+        agent_input = MemoryManager.build_input(
+            self._with_prefetched_products(message, prefetched_products), conversation_history, raw_message=message
+        )
+        
+        # Sản phẩm đã tra cứu sẵn được gửi cho client ngay, trước khi agent bắt đầu trả lời
+        if prefetched_products:
+            yield {"event": "sources", "data": {"source_documents": self._source_documents(None, prefetched_products)}}
+        
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token), turn_scope():
+            async for event in stream_run(
+                self.agent,
+                agent_input,
+                lambda result: self._source_documents(result, prefetched_products),
+                self.profile
+            ):
+                yield event
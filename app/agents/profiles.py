@@ -0,0 +1,56 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from agents import ModelSettings
+
+from ..core.config import settings
+
+# Agent có cấu hình riêng ({TÊN}_MODEL, {TÊN}_MAX_TOKENS, {TÊN}_TEMPERATURE, {TÊN}_MAX_TURNS)
+PROFILE_NAMES = ["analyzer", "manager", "triage", "product", "cart", "shop", "checkout", "summarizer"]
+
+
+@dataclass(frozen=True)
+class AgentProfile:
+    """Model và giới hạn sinh văn bản của một agent"""
+    name: str
+    model: str
+    max_tokens: Optional[int]
+    temperature: Optional[float]
+    max_turns: int
+
+    def model_settings(self) -> ModelSettings:
+        """ModelSettings truyền cho Agent (None = giá trị mặc định của model)"""
+        return ModelSettings(max_tokens=self.max_tokens, temperature=self.temperature)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "max_turns": self.max_turns
+        }
+
+
+def _setting(name: str, field: str, default: Any) -> Any:
+    value = getattr(settings, f"{name.upper()}_{field}", None)
+    return default if value is None or value == "" else value
+
+
+@lru_cache(maxsize=None)
+def agent_profile(name: str) -> AgentProfile:
+    """Cấu hình của agent: giá trị riêng của agent, nếu trống thì dùng CHAT_MODEL, MAX_TOKENS, TEMPERATURE, AGENT_MAX_TURNS"""
+    if name not in PROFILE_NAMES:
+        raise ValueError(f"Agent không có cấu hình: {name}")
+    return AgentProfile(
+        name=name,
+        model=_setting(name, "MODEL", settings.CHAT_MODEL),
+        max_tokens=_setting(name, "MAX_TOKENS", settings.MAX_TOKENS),
+        temperature=_setting(name, "TEMPERATURE", settings.TEMPERATURE),
+        max_turns=_setting(name, "MAX_TURNS", settings.AGENT_MAX_TURNS)
+    )
+
+
+def agent_profiles() -> Dict[str, Dict[str, Any]]:
+    """Cấu hình của mọi agent (dùng cho báo cáo /metrics/agents)"""
+    return {name: agent_profile(name).as_dict() for name in PROFILE_NAMES}
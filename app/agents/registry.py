@@ -0,0 +1,111 @@
+import time
+from typing import Any, Callable, Dict, List
+
+from ..core.config import settings
+
+# Các agent chuyên biệt có thể bật qua ENABLED_AGENTS
+SPECIALIST_NAMES = ["product", "cart", "shop", "checkout"]
+# Agent nhận tin nhắn khi intent được chọn không bật
+FALLBACK_SPECIALIST = "product"
+
+
+def _build_product():
+    from .product_agent import ProductAgentWrapper
+    return ProductAgentWrapper()
+
+
+def _build_cart():
+    from .cart_agent import CartAgentWrapper
+    return CartAgentWrapper()
+
+
+def _build_shop():
+    from .shop_agent import ShopAgentWrapper
+    return ShopAgentWrapper()
+
+
+def _build_checkout():
+    from .checkout_agent import CheckoutAgentWrapper
+    return CheckoutAgentWrapper()
+
+
+class AgentRegistry:
+    """
+    Nơi duy nhất khởi tạo các agent wrapper: mỗi wrapper được tạo một lần, ở lần dùng đầu tiên
+    (hoặc khi warmup lúc khởi động), và chỉ các agent chuyên biệt trong `enabled` được tạo.
+
+    Manager và Triage dùng chung đúng các wrapper chuyên biệt này (as_tool/handoff),
+    không tạo thêm bản sao.
+    """
+
+    def __init__(self, enabled: List[str]):
+        unknown = [name for name in enabled if name not in SPECIALIST_NAMES]
+        if unknown:
+            raise ValueError(f"ENABLED_AGENTS có agent không hợp lệ: {', '.join(unknown)}")
+        if not enabled:
+            raise ValueError("ENABLED_AGENTS phải có ít nhất một agent chuyên biệt")
+        self.enabled = [name for name in SPECIALIST_NAMES if name in enabled]
+        self._factories: Dict[str, Callable[[], Any]] = {
+            "product": _build_product,
+            "cart": _build_cart,
+            "shop": _build_shop,
+            "checkout": _build_checkout,
+            "manager": self._build_manager,
+            "triage": self._build_triage
+        }
+        self._instances: Dict[str, Any] = {}
+        self._build_seconds: Dict[str, float] = {}
+
+    def _build_manager(self):
+        from .manager_agent import ManagerAgentWrapper
+        return ManagerAgentWrapper(self.specialists())
+
+    def _build_triage(self):
+        from .triage_agent import TriageAgentWrapper
+        return TriageAgentWrapper(self.specialists())
+
+    def get(self, name: str) -> Any:
+        """Lấy wrapper theo tên (product, cart, shop, checkout, manager, triage), tạo nếu chưa có"""
+        instance = self._instances.get(name)
+        if instance is None:
+            if name in SPECIALIST_NAMES and name not in self.enabled:
+                raise ValueError(f"Agent {name} chưa được bật (ENABLED_AGENTS)")
+            started_at = time.perf_counter()
+            instance = self._instances[name] = self._factories[name]()
+            self._build_seconds[name] = round(time.perf_counter() - started_at, 4)
+            print(f"[AGENTS] Đã khởi tạo agent {name} ({self._build_seconds[name]}s)")
+        return instance
+
+    def specialists(self) -> Dict[str, Any]:
+        """Map intent -> wrapper của các agent chuyên biệt đang bật"""
+        return {name: self.get(name) for name in self.enabled}
+
+    def resolve(self, intent: str) -> str:
+        """
+        Intent sẽ xử lý tin nhắn: chính intent nếu agent đó đang bật, ngược lại FALLBACK_SPECIALIST
+        (hoặc agent đầu tiên đang bật)
+        """
+        if intent in self.enabled:
+            return intent
+        if intent not in SPECIALIST_NAMES:
+            raise ValueError(f"Agent type không hợp lệ: {intent}")
+        fallback = FALLBACK_SPECIALIST if FALLBACK_SPECIALIST in self.enabled else self.enabled[0]
+        print(f"[AGENTS] Agent {intent} chưa được bật, chuyển cho {fallback}")
+        return fallback
+
+    def warmup(self, names: List[str]) -> None:
+        """Khởi tạo trước các agent (gọi trong lifespan) để request đầu tiên không phải chờ"""
+        for name in names:
+            self.get(name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Các agent đang bật, đã khởi tạo và thời gian khởi tạo"""
+        return {
+            "enabled": self.enabled,
+            "built": list(self._instances),
+            "build_seconds": dict(self._build_seconds)
+        }
+
+
+# Singleton instance
+agent_registry = AgentRegistry([name.strip() for name in settings.ENABLED_AGENTS.split(",") if name.strip()])
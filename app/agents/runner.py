@@ -0,0 +1,47 @@
+from contextlib import AsyncExitStack, asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+
+from agents import Agent, RunContextWrapper, Runner, RunResult
+
+from ..core.bulkhead import agent_bulkheads
+from .profiles import AgentProfile
+
+# Chỗ bulkhead của các agent nhận handoff trong lần run hiện tại (trả lại khi lần run kết thúc)
+_handoff_slots: ContextVar[Optional[AsyncExitStack]] = ContextVar("handoff_slots", default=None)
+
+
+@asynccontextmanager
+async def agent_slot(profile: AgentProfile) -> AsyncIterator[None]:
+    """
+    Giữ chỗ bulkhead của agent trong suốt lần run; agent nhận handoff trong lần run
+    (bulkhead_on_handoff) cũng giữ chỗ của mình tới khi khối lệnh kết thúc
+    """
+    async with agent_bulkheads.slot(profile.name), AsyncExitStack() as handoff_slots:
+        reset_token = _handoff_slots.set(handoff_slots)
+        try:
+            yield
+        finally:
+            _handoff_slots.reset(reset_token)
+
+
+def bulkhead_on_handoff(name: str) -> Callable[[RunContextWrapper[Any]], Awaitable[None]]:
+    """
+    on_handoff cho handoff sang agent `name`: agent chuyên biệt chạy bên trong Runner.run của Triage,
+    nên chỗ bulkhead của nó được lấy ở đây (quá tải thì BulkheadRejected dừng lần run)
+    """
+    async def on_handoff(ctx: RunContextWrapper[Any]) -> None:
+        handoff_slots = _handoff_slots.get()
+        if handoff_slots is not None:
+            await handoff_slots.enter_async_context(agent_bulkheads.slot(name))
+
+    return on_handoff
+
+
+async def run_agent(agent: Agent, agent_input: Union[str, List[Dict[str, Any]]], profile: AgentProfile) -> RunResult:
+    """
+    Runner.run với giới hạn của agent: max_turns của profile và bulkhead của agent
+    (chờ chỗ chạy tối đa BULKHEAD_MAX_QUEUE_TIME giây, quá tải thì BulkheadRejected)
+    """
+    async with agent_slot(profile):
+        return await Runner.run(agent, agent_input, max_turns=profile.max_turns)
@@ -1,10 +1,13 @@
-from agents import Agent, Runner
-from typing import Any, Dict, List
+from agents import Agent
+from typing import Any, AsyncIterator, Dict, List
 
-from ..client.spring_client import spring_boot_client
-from ..core.config import settings
+from ..client.auth_context import auth_context
+from .profiles import agent_profile
+from .runner import run_agent
 from ..core.hooks import CustomAgentHooks
+from ..core.turn_state import turn_scope
 from ..prompts.shop_agent import SHOP_AGENT_PROMPT
+from .streaming import stream_run
 from ..tools.shop_tools import (
     get_contact_info,
     get_order_details,
@@ -23,11 +26,15 @@ class ShopAgentWrapper:
         # Tạo hooks cho shop agent
         self.hooks = CustomAgentHooks("Shop")
         
+        # Model và giới hạn sinh văn bản riêng của agent (SHOP_MODEL, SHOP_MAX_TOKENS, ...)
+        self.profile = agent_profile("shop")
+        
         # Tạo agent sử dụng OpenAI Agents SDK
         self.agent = Agent(
             name="Shop Assistant",
             instructions=SHOP_AGENT_PROMPT,
-            model=settings.CHAT_MODEL,
+            model=self.profile.model,
+            model_settings=self.profile.model_settings(),
             tools=[
                 get_shop_info,
                 get_shipping_info,
@@ -49,18 +56,19 @@ class ShopAgentWrapper:
             user_id: ID người dùng
             auth_token: Token xác thực JWT
         """
-        # Cập nhật token cho Spring Boot client nếu cần
-        spring_boot_client.update_auth_token(auth_token)
-        
-        # Sử dụng Runner từ OpenAI Agents SDK để xử lý tin nhắn
-        result = await Runner.run(self.agent, message)
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token):
+            # Sử dụng Runner từ OpenAI Agents SDK để xử lý tin nhắn
+            # (turn_scope: kết quả tool chỉ đọc được dùng lại trong lượt)
+            with turn_scope():
+                result = await run_agent(self.agent, message, self.profile)
         
-        # Cấu trúc kết quả để tương thích với API hiện tại
-        return {
-            "message": result.final_output,
-            "source_documents": [],
-            "thread_id": thread_id
-        }
+            # Cấu trúc kết quả để tương thích với API hiện tại
+            return {
+                "message": result.final_output,
+                "source_documents": [],
+                "thread_id": thread_id
+            }
 
     async def process_with_history(
         self, 
@@ -83,21 +91,43 @@ class ShopAgentWrapper:
         Returns:
             Dict: Kết quả từ agent
         """
-        # Cập nhật token xác thực cho spring_boot_client nếu có
-        spring_boot_client.update_auth_token(auth_token)
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token):
+            # Kết hợp lịch sử hội thoại với tin nhắn hiện tại
+            combined_message = MemoryManager.build_input(message, conversation_history)
         
-        # Kết hợp lịch sử hội thoại với tin nhắn hiện tại
-        combined_message = MemoryManager.build_prompt(message, conversation_history)
+            # Sử dụng Runner với tin nhắn đã kết hợp
+            with turn_scope():
+                result = await run_agent(self.agent, combined_message, self.profile)
         
-        # Sử dụng Runner với tin nhắn đã kết hợp
-        result = await Runner.run(self.agent, combined_message)
-        
-        # Trả về kết quả
-        return {
-            "message": result.final_output,
-            "source_documents": [],
-            "thread_id": thread_id
-        }
+            # Trả về kết quả
+            return {
+                "message": result.final_output,
+                "source_documents": [],
+                "thread_id": thread_id
+            }
 
-# Singleton instance
-shop_agent = ShopAgentWrapper() 
+    async def stream(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, Any]] = None,
+        thread_id: str = None,
+        user_id: str = None,
+        auth_token: str = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Xử lý tin nhắn ở chế độ streaming (dùng cho /chat/stream), sinh các sự kiện của stream_run
+        
+        Args:
+            message: Tin nhắn người dùng
+            conversation_history: Lịch sử trò chuyện (nếu có)
+            thread_id: ID cuộc trò chuyện
+            user_id: ID người dùng
+            auth_token: Token xác thực JWT
+        """
+        prompt = MemoryManager.build_input(message, conversation_history)
+        
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token), turn_scope():
+            async for event in stream_run(self.agent, prompt, lambda result: [], self.profile):
+                yield event
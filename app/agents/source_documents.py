@@ -0,0 +1,165 @@
+from functools import lru_cache
+from html import escape
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+# Tool trả về sản phẩm (dict hoặc list dict sản phẩm)
+PRODUCT_TOOLS = frozenset({
+    "get_product_info",
+    "get_product_by_id",
+    "get_products_by_ids",
+    "rag_product_search",
+    "check_product_availability",
+    "find_products_by_price_range"
+})
+# Tool trả về giỏ hàng {"items", "total", "count"}
+CART_TOOLS = frozenset({"get_cart", "add_to_cart", "update_cart", "remove_from_cart"})
+# Tool trả về đơn hàng/thanh toán
+ORDER_TOOLS = frozenset({"create_order", "get_order_info", "get_payment_info"})
+# Đầu output mà Agents SDK gửi cho model thay cho kết quả khi tool ném exception
+SDK_TOOL_ERROR_PREFIX = "An error occurred while running the tool"
+
+
+@lru_cache(maxsize=4096)
+def product_image_html(image_url: str, name: str) -> str:
+    """Thẻ img của sản phẩm, tạo một lần cho mỗi cặp (URL, tên) và dùng lại giữa các response"""
+    if not image_url:
+        return ""
+    return f'<img src="{escape(image_url)}" alt="{escape(name or "Sản phẩm bánh")}" />'
+
+
+def product_document(product: Dict[str, Any]) -> Dict[str, Any]:
+    """Chuyển một sản phẩm (kết quả tool hoặc RAG) thành source document trả về cho client"""
+    image_url = product.get("image_url", "") or ""
+    return {
+        "id": product.get("id", ""),
+        "name": product.get("name", ""),
+        "price": product.get("price", 0),
+        "description": product.get("description", ""),
+        "image_url": image_url,
+        "image_html": product_image_html(image_url, product.get("name", "")),
+        "category": product.get("category", ""),
+        "status": product.get("status", ""),
+        "quantity": product.get("quantity", 0),
+        "available": product.get("available", None),
+        "relevance_score": product.get("relevance_score", 0)
+    }
+
+
+def cart_item_document(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Chuyển một dòng giỏ hàng thành source document (hỗ trợ cả dạng lồng {"product": {...}})"""
+    nested = item.get("product")
+    if isinstance(nested, dict):
+        product, product_id = nested, nested.get("id")
+    else:
+        product, product_id = item, item.get("product_id")
+    image_url = product.get("image_url") or product.get("image") or ""
+    return {
+        "id": product_id or "",
+        "name": product.get("name", ""),
+        "price": product.get("price", 0),
+        "quantity_in_cart": item.get("quantity", 0),
+        "image_url": image_url,
+        "image_html": product_image_html(image_url, product.get("name", "")),
+        "in_cart": True
+    }
+
+
+def order_document(order: Dict[str, Any]) -> Dict[str, Any]:
+    """Chuyển kết quả tool đơn hàng/thanh toán thành source document"""
+    return {**order, "order_id": order.get("order_id", order.get("id", ""))}
+
+
+def _tool_outputs(result: Any) -> Iterable[tuple]:
+    """
+    Duyệt result.new_items một lần, trả về (tên tool, output) theo thứ tự gọi.
+    Output là giá trị Python mà tool trả về (không cần parse lại JSON).
+    """
+    tool_names: Dict[Any, str] = {}
+    for item in getattr(result, "new_items", None) or []:
+        item_type = getattr(item, "type", None)
+        raw_item = getattr(item, "raw_item", None)
+        call_id = raw_item.get("call_id") if isinstance(raw_item, dict) else getattr(raw_item, "call_id", None)
+        if item_type == "tool_call_item":
+            tool_names[call_id] = getattr(raw_item, "name", None)
+        elif item_type == "tool_call_output_item":
+            yield tool_names.get(call_id), item.output
+
+
+def _is_error_output(output: Any) -> bool:
+    """Output báo lỗi: dict có "error", list chứa dict như vậy, hoặc thông báo lỗi của SDK khi tool ném exception"""
+    if isinstance(output, dict):
+        return bool(output.get("error"))
+    if isinstance(output, list):
+        return any(isinstance(item, dict) and item.get("error") for item in output)
+    return isinstance(output, str) and output.startswith(SDK_TOOL_ERROR_PREFIX)
+
+
+def has_tool_errors(result: Any) -> bool:
+    """Có tool nào trong lần run báo lỗi (lỗi tạm thời, circuit breaker đang mở, không tìm thấy ID...)"""
+    try:
+        return any(_is_error_output(output) for _, output in _tool_outputs(result))
+    except Exception as e:
+        print(f"Error checking tool outputs: {str(e)}")
+        return True
+
+
+def extract_source_documents(
+    result: Any,
+    tools: FrozenSet[str],
+    extra_products: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Trích xuất source_documents từ kết quả một lần run (dùng chung cho mọi agent)
+
+    Args:
+        result: RunResult/RunResultStreaming của Agents SDK
+        tools: Tên các tool được lấy kết quả (PRODUCT_TOOLS, CART_TOOLS, ORDER_TOOLS hoặc hợp của chúng)
+        extra_products: Sản phẩm bổ sung ngoài kết quả tool (ví dụ kết quả RAG đã tra cứu sẵn)
+
+    Returns:
+        List[Dict]: Sản phẩm không trùng ID (dòng giỏ hàng bổ sung thông tin cho sản phẩm cùng ID),
+        sau đó là đơn hàng không trùng order_id
+    """
+    documents: Dict[str, Dict[str, Any]] = {}
+    orders: Dict[str, Dict[str, Any]] = {}
+    # (loại, ID) đã xử lý: sản phẩm trùng chỉ được chuyển đổi một lần
+    seen = set()
+
+    def add(kind: str, source: Dict[str, Any], build) -> None:
+        key = str(source.get("product_id" if kind == "cart" and "product_id" in source else "id"))
+        if (kind, key) in seen:
+            return
+        seen.add((kind, key))
+        document = build(source)
+        existing = documents.get(str(document.get("id")))
+        if existing is None:
+            documents[str(document.get("id"))] = document
+        else:
+            # Cùng sản phẩm từ tool khác (ví dụ vừa tìm kiếm vừa có trong giỏ hàng): bổ sung trường còn thiếu
+            existing.update({field: value for field, value in document.items() if field not in existing})
+
+    try:
+        for tool_name, output in _tool_outputs(result):
+            if tool_name not in tools or output is None:
+                continue
+            if tool_name in PRODUCT_TOOLS:
+                for product in (output if isinstance(output, list) else [output]):
+                    if isinstance(product, dict) and product.get("found", True):
+                        add("product", product, product_document)
+            elif tool_name in CART_TOOLS:
+                if isinstance(output, dict):
+                    for item in output.get("items") or []:
+                        if isinstance(item, dict):
+                            add("cart", item, cart_item_document)
+            elif tool_name in ORDER_TOOLS:
+                if isinstance(output, dict) and not output.get("error"):
+                    document = order_document(output)
+                    orders[str(document["order_id"])] = document
+    except Exception as e:
+        print(f"Error extracting source documents: {str(e)}")
+
+    for product in extra_products or []:
+        if isinstance(product, dict):
+            add("product", product, product_document)
+
+    return list(documents.values()) + list(orders.values())
@@ -0,0 +1,87 @@
+from agents import Agent, Runner
+from openai.types.responses import ResponseTextDeltaEvent
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
+
+from ..core.metrics import run_total_tokens
+from .profiles import AgentProfile
+from .runner import agent_slot
+from .source_documents import has_tool_errors
+
+
+def _call_id(raw_item: Any) -> Optional[str]:
+    """call_id của tool call/tool output (raw_item có thể là dict hoặc object của SDK)"""
+    if isinstance(raw_item, dict):
+        return raw_item.get("call_id")
+    return getattr(raw_item, "call_id", None)
+
+
+async def stream_run(
+    agent: Agent,
+    agent_input: Union[str, List[Dict[str, Any]]],
+    extract_sources: Callable[[Any], List[Dict[str, Any]]],
+    profile: AgentProfile
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Chạy agent bằng Runner.run_streamed và chuyển sự kiện của Agents SDK thành sự kiện cho client.
+
+    Sinh lần lượt các dict {"event", "data"}:
+        - agent: agent đang xử lý (thay đổi khi có handoff)
+        - tool_call / tool_output: tiến độ gọi tool
+        - sources: source_documents mới ngay khi tool trả về
+        - delta: từng đoạn văn bản của câu trả lời
+        - final: câu trả lời hoàn chỉnh, source_documents và số token đã dùng (luôn là sự kiện cuối)
+
+    Phải được gọi bên trong auth_context/turn_scope của request: run_streamed tạo task nền
+    và task này sao chép context tại thời điểm gọi.
+
+    Args:
+        agent: Agent cần chạy
+        agent_input: Tin nhắn hoặc danh sách input item (lịch sử rồi tin nhắn mới) gửi cho agent
+        extract_sources: Hàm trích xuất source_documents từ kết quả run
+        profile: Cấu hình của agent (max_turns, bulkhead giữ chỗ trong suốt lần stream)
+    """
+    async with agent_slot(profile):
+        result = Runner.run_streamed(agent, agent_input, max_turns=profile.max_turns)
+        tool_names: Dict[str, str] = {}
+        source_documents: List[Dict[str, Any]] = []
+
+        try:
+            async for event in result.stream_events():
+                if event.type == "raw_response_event":
+                    if isinstance(event.data, ResponseTextDeltaEvent) and event.data.delta:
+                        yield {"event": "delta", "data": {"text": event.data.delta}}
+
+                elif event.type == "agent_updated_stream_event":
+                    yield {"event": "agent", "data": {"name": event.new_agent.name}}
+
+                elif event.type == "run_item_stream_event":
+                    if event.name == "tool_called":
+                        raw_item = event.item.raw_item
+                        tool_name = getattr(raw_item, "name", None)
+                        tool_names[_call_id(raw_item)] = tool_name
+                        yield {"event": "tool_call", "data": {"tool": tool_name}}
+
+                    elif event.name == "tool_output":
+                        tool_name = tool_names.get(_call_id(event.item.raw_item))
+                        yield {"event": "tool_output", "data": {"tool": tool_name}}
+
+                        # Gửi source_documents ngay khi tool trả về, không chờ câu trả lời hoàn chỉnh
+                        found = extract_sources(result)
+                        if found and found != source_documents:
+                            source_documents = found
+                            yield {"event": "sources", "data": {"source_documents": source_documents}}
+        finally:
+            # Client ngắt kết nối giữa chừng (generator bị đóng): dừng lần run của SDK
+            if not result.is_complete:
+                result.cancel()
+
+    yield {
+        "event": "final",
+        "data": {
+            "message": result.final_output,
+            "source_documents": extract_sources(result),
+            "agent_name": result.last_agent.name,
+            "total_tokens": run_total_tokens(result),
+            "tool_errors": has_tool_errors(result)
+        }
+    }
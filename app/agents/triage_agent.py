@@ -0,0 +1,113 @@
+from agents import Agent, handoff
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from ..client.auth_context import auth_context
+from .profiles import agent_profile
+from .runner import bulkhead_on_handoff, run_agent
+from ..core.hooks import CustomAgentHooks
+from ..core.turn_state import turn_scope
+from ..prompts.triage_agent import TRIAGE_AGENT_PROMPT
+from ..memory.memory_manager import MemoryManager
+from .source_documents import extract_source_documents
+from .streaming import stream_run
+
+# Mô tả công cụ handoff cho từng chuyên gia
+HANDOFF_DESCRIPTIONS = {
+    "product": "Chuyển cho chuyên gia sản phẩm: tìm kiếm, tư vấn, so sánh bánh, giá, hương vị",
+    "cart": "Chuyển cho chuyên gia giỏ hàng: thêm, xem, sửa, xóa bánh trong giỏ hàng",
+    "shop": "Chuyển cho chuyên gia cửa hàng: địa chỉ, giờ mở cửa, chính sách đổi trả, vận chuyển",
+    "checkout": "Chuyển cho chuyên gia thanh toán: thanh toán, tạo đơn hàng, trạng thái đơn hàng"
+}
+
+class TriageAgentWrapper:
+    """
+    Agent điều phối dùng handoff của Agents SDK: phân loại và chuyển thẳng cho agent chuyên biệt
+    trong cùng một lần Runner.run, thay vì chạy Analyzer rồi chạy agent chuyên biệt ở lần run thứ hai
+    """
+    def __init__(self, specialists: Dict[str, Any]):
+        """
+        Args:
+            specialists: Map intent (product, cart, shop, checkout) -> wrapper của agent chuyên biệt
+        """
+        self.specialists = specialists
+        self.intent_by_agent_name = {wrapper.agent.name: intent for intent, wrapper in specialists.items()}
+
+        # Model và giới hạn sinh văn bản riêng của agent (TRIAGE_MODEL, TRIAGE_MAX_TOKENS, ...)
+        self.profile = agent_profile("triage")
+
+        self.agent = Agent(
+            name="Triage",
+            instructions=TRIAGE_AGENT_PROMPT,
+            model=self.profile.model,
+            model_settings=self.profile.model_settings(),
+            handoffs=[
+                # Agent chuyên biệt lấy chỗ trong bulkhead của chính nó khi nhận handoff
+                handoff(
+                    wrapper.agent,
+                    tool_description_override=HANDOFF_DESCRIPTIONS.get(intent),
+                    on_handoff=bulkhead_on_handoff(intent)
+                )
+                for intent, wrapper in specialists.items()
+            ],
+            hooks=CustomAgentHooks("Triage")
+        )
+
+    async def process(
+        self,
+        message: str,
+        conversation_history: Optional[List[Dict[str, Any]]] = None,
+        thread_id: str = None,
+        user_id: str = None,
+        auth_token: str = None
+    ) -> Dict[str, Any]:
+        """
+        Xử lý tin nhắn trong một lần run: Triage handoff sang agent chuyên biệt, agent đó trả lời
+
+        Returns:
+            Dict: Kết quả từ agent, "agent" là intent của agent đã trả lời ("triage" nếu không handoff)
+        """
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token):
+            prompt = MemoryManager.build_input(message, conversation_history)
+
+            # turn_scope: các tool giỏ hàng trong lượt dùng chung giỏ hàng đã biết
+            with turn_scope():
+                result = await run_agent(self.agent, prompt, self.profile)
+
+            intent = self.intent_by_agent_name.get(result.last_agent.name)
+            source_documents = self._extract_sources(result)
+
+            return {
+                "message": result.final_output,
+                "source_documents": source_documents,
+                "thread_id": thread_id,
+                "agent": intent or "triage"
+            }
+
+    def _extract_sources(self, result: Any) -> List[Dict[str, Any]]:
+        """Trích xuất source_documents theo SOURCE_TOOLS của agent đã trả lời"""
+        wrapper = self.specialists.get(self.intent_by_agent_name.get(result.last_agent.name))
+        tools = getattr(wrapper, "SOURCE_TOOLS", None)
+        return extract_source_documents(result, tools) if tools else []
+
+    async def stream(
+        self,
+        message: str,
+        conversation_history: Optional[List[Dict[str, Any]]] = None,
+        thread_id: str = None,
+        user_id: str = None,
+        auth_token: str = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Xử lý tin nhắn ở chế độ streaming: sự kiện "agent" báo agent chuyên biệt được handoff,
+        sự kiện "final" có thêm "agent" là intent của agent đã trả lời
+        """
+        # Gắn token xác thực vào context của request hiện tại
+        with auth_context(auth_token):
+            prompt = MemoryManager.build_input(message, conversation_history)
+
+            with turn_scope():
+                async for event in stream_run(self.agent, prompt, self._extract_sources, self.profile):
+                    if event["event"] == "final":
+                        event["data"]["agent"] = self.intent_by_agent_name.get(event["data"]["agent_name"]) or "triage"
+                    yield event
@@ -1,33 +1,235 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
-from typing import Optional, Dict, Any, List
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Optional, Dict, Any, List, Tuple
 from sqlmodel import Session
+from contextlib import aclosing
+import asyncio
 import json
 import re
+import time
 
 # from ..core.security import verify_api_key
+from ..core.bulkhead import OVERLOADED_MESSAGE, BulkheadRejected, agent_bulkheads
 from ..core.config import settings
-from ..agents.manager_agent import manager_agent, ManagerAgentWrapper
-from ..agents.product_agent import product_agent, ProductAgentWrapper
-from ..agents.cart_agent import cart_agent, CartAgentWrapper
-from ..agents.shop_agent import shop_agent, ShopAgentWrapper
-from ..agents.checkout_agent import checkout_agent, CheckoutAgentWrapper
+from ..core.metrics import LatencyTracker, agent_latency, agent_token_usage
+from ..agents.profiles import agent_profiles
+from ..agents.registry import agent_registry
 from ..rag.vector_store import vector_store
+from ..rag.answer_cache import CachedAnswer, answer_cache
+from ..rag.embeddings import embedding_provider
+from ..rag.speculative import SpeculativeRetrieval
+from ..tools.memo import memo_stats
 from ..client.spring_client import spring_boot_client
+from ..routing.centroid_classifier import centroid_classifier
+from ..routing.faq import FAQMatch, faq_engine
+from ..routing.route_cache import normalize_message, routing_cache
+from ..routing.rule_router import rule_router
 from ..models.api_models import ChatRequest, ChatResponse, ProductRequest, ProductResponse, ShopRequest, ShopResponse, SyncRequest, AutoSyncRequest, SyncResponse
-from ..db.database import get_session
+from ..db.database import engine, get_session
 from ..db.services import ConversationService
 from ..db.models import Conversation, Message
 from ..memory.memory_manager import MemoryManager
+from ..memory.summarizer import conversation_summarizer
 
 router = APIRouter()
 
-# Khởi tạo các agent
-manager_agent = ManagerAgentWrapper()
-product_agent = ProductAgentWrapper()
-cart_agent = CartAgentWrapper()
-shop_agent = ShopAgentWrapper()
-checkout_agent = CheckoutAgentWrapper()
+# Các agent được khởi tạo một lần, ở lần dùng đầu tiên, qua agent_registry
+# (chế độ routing "handoff" dùng agent "triage": chuyển thẳng cho agent chuyên biệt trong cùng một lần run)
+# Thời gian xử lý /chat theo chế độ routing (so sánh A/B)
+routing_latency = LatencyTracker()
+# Thời gian tới sự kiện đầu tiên, tới token đầu tiên và toàn bộ stream của /chat/stream
+streaming_latency = LatencyTracker()
+
+async def _answer_from_faq(message: str) -> Optional[FAQMatch]:
+    """
+    Câu trả lời FAQ cho tin nhắn (None nếu tắt, luật từ khóa đã chắc chắn tin nhắn thuộc agent
+    khác cửa hàng, hoặc không đủ giống câu hỏi mẫu nào)
+    """
+    if not settings.FAQ_ENABLED:
+        return None
+    if rule_router.peek(message) not in (None, "shop"):
+        return None
+    try:
+        return await faq_engine.answer(message)
+    except Exception as e:
+        print(f"[FAQ] Lỗi khi tra cứu FAQ: {str(e)}")
+        return None
+
+async def _looks_like_product(message: str) -> bool:
+    """
+    Tin nhắn có dấu hiệu thuộc product agent trước khi routing: luật từ khóa, quyết định đã cache
+    hoặc intent gần nhất theo centroid (embedding của tin nhắn được cache nên routing dùng lại)
+    """
+    intent = rule_router.peek(message)
+    if intent is not None:
+        return intent == "product"
+    if settings.ROUTING_CACHE_ENABLED:
+        intent = routing_cache.get(normalize_message(message))
+        if intent is not None:
+            return intent == "product"
+    if settings.ROUTING_CENTROID_ENABLED:
+        try:
+            return (await centroid_classifier.peek(message)).intent == "product"
+        except Exception as e:
+            print(f"[SPECULATIVE] Lỗi khi phân loại bằng centroid: {str(e)}")
+    return False
+
+async def _start_speculative_retrieval(message: str) -> Optional[SpeculativeRetrieval]:
+    """
+    Bắt đầu tìm kiếm sản phẩm song song với routing khi tin nhắn có dấu hiệu là câu hỏi sản phẩm
+    """
+    if not settings.SPECULATIVE_RETRIEVAL_ENABLED:
+        return None
+    if not await _looks_like_product(message):
+        return None
+    return SpeculativeRetrieval(message, settings.SPECULATIVE_RETRIEVAL_LIMIT)
+
+async def _specialist_extras(agent_type: str, speculative: Optional[SpeculativeRetrieval]) -> Dict[str, Any]:
+    """
+    Tham số bổ sung cho agent chuyên biệt: product agent nhận kết quả tìm kiếm đã chạy sẵn,
+    các agent khác thì hủy tìm kiếm
+    """
+    if speculative is None:
+        return {}
+    if agent_type != "product":
+        speculative.discard()
+        return {}
+    return {"prefetched_products": await speculative.result(settings.SPECULATIVE_RETRIEVAL_WAIT)}
+
+async def _run_specialist(agent, request: ChatRequest, thread_id: Optional[str], conversation_history: List[Dict[str, Any]], **extras) -> Dict[str, Any]:
+    """
+    Xử lý tin nhắn với agent chuyên biệt đã chọn (kèm lịch sử trò chuyện nếu có)
+    """
+    if thread_id and conversation_history:
+        # Có lịch sử trò chuyện
+        return await agent.process_with_history(
+            message=request.message,
+            conversation_history=conversation_history,
+            thread_id=thread_id,
+            user_id=request.user_id,
+            auth_token=request.auth_token,
+            **extras
+        )
+    # Không có lịch sử trò chuyện
+    return await agent.process(
+        message=request.message,
+        thread_id=thread_id,
+        user_id=request.user_id,
+        auth_token=request.auth_token,
+        **extras
+    )
+
+def _uses_answer_cache(agent_type: str, message: str) -> bool:
+    """Câu trả lời có thể lấy từ/lưu vào answer cache: câu hỏi sản phẩm không phụ thuộc ngữ cảnh trước"""
+    return settings.ANSWER_CACHE_ENABLED and agent_type == "product" and answer_cache.is_cacheable(message)
+
+def _remember_triage_route(message: str, agent_type: str, conversation_history: Optional[List[Dict[str, Any]]]) -> None:
+    """
+    Lưu quyết định của Triage vào routing cache (dùng chung mọi cuộc trò chuyện, key là tin nhắn) chỉ khi
+    quyết định không phụ thuộc lịch sử: lượt không có lịch sử trước đó và tin nhắn tự đủ nghĩa
+    ("ok", "cái thứ hai" phải được định tuyến theo ngữ cảnh của từng cuộc trò chuyện)
+    """
+    if MemoryManager.prior_history(conversation_history, message) or not answer_cache.is_cacheable(message):
+        return
+    agent_registry.get("manager").remember_route(message, agent_type)
+
+def _should_store_answer(response: Dict[str, Any], message: str, conversation_history: Optional[List[Dict[str, Any]]]) -> bool:
+    """
+    Chỉ lưu câu trả lời đầy đủ cho câu hỏi tự đủ nghĩa: không tool nào báo lỗi (lỗi tạm thời, circuit
+    breaker đang mở...) và lượt không có lịch sử trước đó ("cái thứ hai giá bao nhiêu" phụ thuộc lịch sử)
+    """
+    if response.get("tool_errors"):
+        return False
+    return not MemoryManager.prior_history(conversation_history, message)
+
+async def _cached_answer(message: str, speculative: Optional[SpeculativeRetrieval]) -> Optional[CachedAnswer]:
+    """Câu trả lời đã lưu cho câu hỏi sản phẩm (hủy tìm kiếm song song nếu có), None nếu chưa có"""
+    # Sản phẩm của câu hỏi lấy từ tìm kiếm song song (không có thì chỉ dùng câu hỏi trùng khớp)
+    resolve_product_ids = (
+        (lambda: speculative.product_ids(settings.SPECULATIVE_RETRIEVAL_WAIT)) if speculative is not None else None
+    )
+    try:
+        cached = await answer_cache.lookup(message, resolve_product_ids)
+    except Exception as e:
+        print(f"[ANSWER-CACHE] Lỗi khi tra cứu answer cache: {str(e)}")
+        return None
+    if cached is not None and speculative is not None:
+        speculative.discard()
+    return cached
+
+async def _run_chosen_specialist(agent_type: str, request: ChatRequest, thread_id: Optional[str], conversation_history: List[Dict[str, Any]], speculative: Optional[SpeculativeRetrieval]) -> Dict[str, Any]:
+    """
+    Xử lý tin nhắn với agent chuyên biệt đã chọn; câu hỏi sản phẩm được trả lời từ answer cache
+    nếu đã có câu hỏi đủ giống, ngược lại câu trả lời mới được lưu lại
+    """
+    use_cache = _uses_answer_cache(agent_type, request.message)
+    if use_cache:
+        cached = await _cached_answer(request.message, speculative)
+        if cached is not None:
+            return {
+                "message": cached.answer,
+                "source_documents": cached.source_documents,
+                "thread_id": thread_id,
+                "answer_cache": True
+            }
+    
+    # Phiên bản catalog lúc bắt đầu: câu trả lời không được lưu nếu catalog đồng bộ trong lúc xử lý
+    catalog_version = answer_cache.catalog_version
+    started_at = time.perf_counter()
+    extras = await _specialist_extras(agent_type, speculative)
+    response = await _run_specialist(agent_registry.get(agent_type), request, thread_id, conversation_history, **extras)
+    if use_cache and _should_store_answer(response, request.message, conversation_history if thread_id else None):
+        answer_cache.store_in_background(
+            request.message,
+            response.get("message", ""),
+            response.get("source_documents", []),
+            catalog_version,
+            time.perf_counter() - started_at,
+            response.get("total_tokens", 0)
+        )
+    return response
+
+def _open_conversation(request: ChatRequest, memory_manager: MemoryManager) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """
+    Xác định thread_id (tạo conversation mới nếu cần), lưu tin nhắn của người dùng
+    và trả về lịch sử trò chuyện gần nhất
+    """
+    conversation_service = memory_manager.conversation_service
+    
+    # Xử lý conversation_id/thread_id
+    thread_id = request.thread_id
+    if not thread_id and request.user_id:
+        # Tạo conversation mới nếu chưa có
+        conversation = conversation_service.create_conversation(
+            user_id=request.user_id,
+            title=request.thread_title
+        )
+        thread_id = conversation.id
+        
+    if not thread_id:
+        return thread_id, []
+    
+    # Lưu tin nhắn của người dùng
+    memory_manager.add_message(
+        conversation_id=thread_id,
+        role="user",
+        content=request.message,
+        metadata={"user_id": request.user_id} if request.user_id else None
+    )
+    
+    # Lịch sử vượt ngân sách token: gộp các tin nhắn cũ vào bản tóm tắt trong nền
+    if settings.HISTORY_SUMMARY_ENABLED:
+        memory_manager.subscribe(
+            "history_over_budget",
+            lambda payload: conversation_summarizer.schedule(payload["conversation_id"])
+        )
+    
+    # Lấy lịch sử trò chuyện từ database (bản tóm tắt và các tin nhắn gần nhất trong ngân sách token)
+    return thread_id, memory_manager.get_budgeted_history(
+        thread_id,
+        token_budget=settings.HISTORY_TOKEN_BUDGET,
+        max_messages=settings.HISTORY_MAX_MESSAGES
+    )
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
@@ -37,117 +239,277 @@ async def chat(
     """
     Endpoint xử lý tin nhắn chat từ người dùng
     """
+    speculative = None
+    thread_id = request.thread_id
     try:
-        # Cập nhật token cho spring boot client nếu có
-        if request.auth_token:
-            spring_boot_client.update_auth_token(request.auth_token)
+        # Token xác thực được truyền xuống từng agent và gắn vào context của request
+        # (không thay đổi headers dùng chung của spring_boot_client)
+        memory_manager = MemoryManager(ConversationService(session))
+        thread_id, conversation_history = _open_conversation(request, memory_manager)
             
-        # Khởi tạo conversation service
-        conversation_service = ConversationService(session)
-        memory_manager = MemoryManager(conversation_service)
+        routing_mode = request.routing_mode or settings.ROUTING_MODE
+        started_at = time.perf_counter()
+        
+        # Câu hỏi thường gặp về cửa hàng được trả lời ngay, không cần routing hay LLM
+        faq = await _answer_from_faq(request.message)
+        if faq is not None:
+            routing_latency.record("faq", time.perf_counter() - started_at)
+            if thread_id:
+                memory_manager.add_message(
+                    conversation_id=thread_id,
+                    role="assistant",
+                    content=faq.answer,
+                    metadata={"agent": "faq", "faq_id": faq.entry_id}
+                )
+            return ChatResponse(message=faq.answer, source_documents=[], thread_id=thread_id)
+        
+        # Tìm kiếm sản phẩm chạy song song trong lúc quyết định route
+        speculative = await _start_speculative_retrieval(request.message)
         
-        # Xử lý conversation_id/thread_id
-        thread_id = request.thread_id
-        if not thread_id and request.user_id:
-            # Tạo conversation mới nếu chưa có
-            conversation = conversation_service.create_conversation(
+        if routing_mode == "handoff":
+            # Một lần run: định tuyến không cần LLM nếu được, ngược lại Triage handoff sang agent chuyên biệt
+            agent_type = await agent_registry.get("manager").route_without_llm(request.message)
+            if agent_type is not None:
+                agent_type = agent_registry.resolve(agent_type)
+                response = await _run_chosen_specialist(agent_type, request, thread_id, conversation_history, speculative)
+            else:
+                response = await agent_registry.get("triage").process(
+                    message=request.message,
+                    conversation_history=conversation_history if thread_id else None,
+                    thread_id=thread_id,
+                    user_id=request.user_id,
+                    auth_token=request.auth_token
+                )
+                agent_type = response.get("agent", "triage")
+                _remember_triage_route(request.message, agent_type, conversation_history if thread_id else None)
+            routing_latency.record(routing_mode, time.perf_counter() - started_at)
+        else:
+            # Phân tích yêu cầu bằng Manager Agent
+            manager_response = await agent_registry.get("manager").process(
+                message=request.message,
+                thread_id=thread_id,
                 user_id=request.user_id,
-                title=request.thread_title
+                auth_token=request.auth_token
             )
-            thread_id = conversation.id
             
-        # Lưu tin nhắn của người dùng
+            # Nếu không có chuyển tiếp, lưu và trả về response trực tiếp từ manager
+            if not manager_response.get("handoff", False):
+                if thread_id:
+                    memory_manager.add_message(
+                        conversation_id=thread_id,
+                        role="assistant",
+                        content=manager_response.get("message", ""),
+                        metadata={"agent": "manager"}
+                    )
+                    
+                return ChatResponse(
+                    message=manager_response.get("message", ""),
+                    source_documents=manager_response.get("source_documents", []),
+                    thread_id=thread_id
+                )
+            
+            # Chọn agent phù hợp để xử lý (agent chưa bật được chuyển cho agent mặc định)
+            agent_type = agent_registry.resolve(manager_response.get("target_agent", ""))
+            
+            # Xử lý tin nhắn với agent đã chọn
+            response = await _run_chosen_specialist(agent_type, request, thread_id, conversation_history, speculative)
+            routing_latency.record("two_step", time.perf_counter() - started_at)
+            
+        # Lưu câu trả lời từ agent vào database
         if thread_id:
             memory_manager.add_message(
                 conversation_id=thread_id,
-                role="user",
-                content=request.message,
-                metadata={"user_id": request.user_id} if request.user_id else None
+                role="assistant",
+                content=response.get("message", ""),
+                metadata={"agent": agent_type, "answer_cache": True} if response.get("answer_cache") else {"agent": agent_type}
             )
             
-            # Lấy lịch sử trò chuyện từ database
-            conversation_history = memory_manager.get_recent_history(thread_id, limit=10)
-        else:
-            conversation_history = []
-            
-        # Phân tích yêu cầu bằng Manager Agent
-        manager_response = await manager_agent.process(
-            message=request.message,
-            thread_id=thread_id,
-            user_id=request.user_id,
-            auth_token=request.auth_token
+        return ChatResponse(
+            message=response.get("message", ""),
+            source_documents=response.get("source_documents", []),
+            thread_id=thread_id
         )
         
-        # Kiểm tra nếu manager quyết định chuyển tiếp
-        if manager_response.get("handoff", False):
-            agent_type = manager_response.get("target_agent", "")
+    except BulkheadRejected:
+        # Agent quá tải: từ chối ngay với câu trả lời thân thiện, client có thể thử lại sau Retry-After giây
+        return JSONResponse(
+            status_code=503,
+            content={"message": OVERLOADED_MESSAGE, "source_documents": [], "thread_id": thread_id},
+            headers={"Retry-After": str(max(int(settings.BULKHEAD_MAX_QUEUE_TIME), 1))}
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Lỗi khi xử lý tin nhắn: {str(e)}"
+        )
+    finally:
+        # Hủy tìm kiếm chưa dùng đến (Triage, Manager tự trả lời hoặc lỗi)
+        if speculative is not None:
+            speculative.discard()
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Định dạng một sự kiện Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    session: Session = Depends(get_session)
+) -> StreamingResponse:
+    """
+    Endpoint chat dạng Server-Sent Events: gửi quyết định routing, tiến độ gọi tool, source_documents
+    ngay khi tool trả về và từng đoạn văn bản của câu trả lời.
+
+    Các sự kiện: thread, route, agent, tool_call, tool_output, sources, delta, done (message,
+    source_documents, thread_id, agent) hoặc error.
+    """
+    memory_manager = MemoryManager(ConversationService(session))
+    thread_id, conversation_history = _open_conversation(request, memory_manager)
+    
+    async def events():
+        routing_mode = request.routing_mode or settings.ROUTING_MODE
+        started_at = time.perf_counter()
+        first_token_at = None
+        speculative = None
+        agent_stream = None
+        try:
+            yield _sse("thread", {"thread_id": thread_id})
             
-            # Chọn agent phù hợp để xử lý
-            if agent_type == "product":
-                agent = product_agent
-            elif agent_type == "cart":
-                agent = cart_agent
-            elif agent_type == "shop":
-                agent = shop_agent
-            elif agent_type == "checkout":
-                agent = checkout_agent
+            final = None
+            history = conversation_history if thread_id else None
+            # Câu hỏi thường gặp về cửa hàng được trả lời ngay, không cần routing hay LLM
+            faq = await _answer_from_faq(request.message)
+            if faq is None:
+                # Tìm kiếm sản phẩm chạy song song trong lúc quyết định route
+                speculative = await _start_speculative_retrieval(request.message)
+            
+            if faq is not None:
+                agent_type = "faq"
+                final = {"message": faq.answer, "source_documents": []}
+            elif routing_mode == "handoff":
+                agent_type = await agent_registry.get("manager").route_without_llm(request.message)
+                if agent_type is not None:
+                    agent_type = agent_registry.resolve(agent_type)
+                else:
+                    agent_type = "triage"
+                    agent_stream = agent_registry.get("triage").stream(
+                        message=request.message,
+                        conversation_history=history,
+                        thread_id=thread_id,
+                        user_id=request.user_id,
+                        auth_token=request.auth_token
+                    )
             else:
-                raise ValueError(f"Agent type không hợp lệ: {agent_type}")
-                
-            # Xử lý tin nhắn với agent đã chọn
-            if thread_id and conversation_history:
-                # Có lịch sử trò chuyện
-                response = await agent.process_with_history(
+                manager_response = await agent_registry.get("manager").process(
                     message=request.message,
-                    conversation_history=conversation_history,
                     thread_id=thread_id,
                     user_id=request.user_id,
                     auth_token=request.auth_token
                 )
-            else:
-                # Không có lịch sử trò chuyện
-                response = await agent.process(
+                if manager_response.get("handoff", False):
+                    agent_type = agent_registry.resolve(manager_response.get("target_agent", ""))
+                else:
+                    # Manager tự trả lời, không cần agent chuyên biệt
+                    agent_type = "manager"
+                    final = manager_response
+            
+            yield _sse("route", {"agent": agent_type, "mode": routing_mode})
+            streaming_latency.record("first_event", time.perf_counter() - started_at)
+            
+            use_answer_cache = _uses_answer_cache(agent_type, request.message)
+            catalog_version = answer_cache.catalog_version
+            if use_answer_cache:
+                cached = await _cached_answer(request.message, speculative)
+                if cached is not None:
+                    final = {"message": cached.answer, "source_documents": cached.source_documents, "answer_cache": True}
+            
+            if agent_type in agent_registry.enabled and final is None:
+                extras = await _specialist_extras(agent_type, speculative)
+                agent_stream = agent_registry.get(agent_type).stream(
                     message=request.message,
+                    conversation_history=history,
                     thread_id=thread_id,
                     user_id=request.user_id,
-                    auth_token=request.auth_token
-                )
-                
-            # Lưu câu trả lời từ agent vào database
-            if thread_id:
-                memory_manager.add_message(
-                    conversation_id=thread_id,
-                    role="assistant",
-                    content=response.get("message", ""),
-                    metadata={"agent": agent_type}
+                    auth_token=request.auth_token,
+                    **extras
                 )
+            
+            if agent_stream is not None:
+                # aclosing: client ngắt kết nối thì stream của agent được đóng ngay trong request này
+                # (trả chỗ bulkhead, dừng lần run, reset auth/turn context) thay vì chờ GC
+                async with aclosing(agent_stream) as stream:
+                    async for event in stream:
+                        if event["event"] == "final":
+                            final = event["data"]
+                            continue
+                        if event["event"] == "delta" and first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            streaming_latency.record("first_token", first_token_at - started_at)
+                        yield _sse(event["event"], event["data"])
                 
-            return ChatResponse(
-                message=response.get("message", ""),
-                source_documents=response.get("source_documents", []),
-                thread_id=thread_id
-            )
-        else:
-            # Nếu không có chuyển tiếp, lưu và trả về response trực tiếp từ manager
+                if agent_type == "triage":
+                    agent_type = final.get("agent", "triage")
+                    _remember_triage_route(request.message, agent_type, history)
+                elif use_answer_cache and _should_store_answer(final, request.message, history):
+                    answer_cache.store_in_background(
+                        request.message,
+                        final.get("message", ""),
+                        final.get("source_documents", []),
+                        catalog_version,
+                        time.perf_counter() - started_at,
+                        final.get("total_tokens", 0)
+                    )
+            
+            message = (final or {}).get("message", "") or ""
+            source_documents = (final or {}).get("source_documents", [])
+            
+            # Lưu câu trả lời vào database bằng session riêng: session của dependency
+            # có thể đã đóng khi response đang được stream
             if thread_id:
-                memory_manager.add_message(
-                    conversation_id=thread_id,
-                    role="assistant",
-                    content=manager_response.get("message", ""),
-                    metadata={"agent": "manager"}
-                )
-                
-            return ChatResponse(
-                message=manager_response.get("message", ""),
-                source_documents=manager_response.get("source_documents", []),
-                thread_id=thread_id
-            )
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Lỗi khi xử lý tin nhắn: {str(e)}"
-        )
+                with Session(engine) as stream_session:
+                    MemoryManager(ConversationService(stream_session)).add_message(
+                        conversation_id=thread_id,
+                        role="assistant",
+                        content=message,
+                        metadata={"agent": agent_type, "answer_cache": True} if (final or {}).get("answer_cache") else {"agent": agent_type}
+                    )
+            
+            streaming_latency.record("total", time.perf_counter() - started_at)
+            yield _sse("done", {
+                "message": message,
+                "source_documents": source_documents,
+                "thread_id": thread_id,
+                "agent": agent_type
+            })
+        except BulkheadRejected:
+            yield _sse("error", {"detail": OVERLOADED_MESSAGE, "overloaded": True})
+        except Exception as e:
+            print(f"[STREAM] Lỗi khi stream tin nhắn: {str(e)}")
+            yield _sse("error", {"detail": f"Lỗi khi xử lý tin nhắn: {str(e)}"})
+        finally:
+            # Stream của agent chưa được đóng (lỗi hoặc client ngắt kết nối trước khi bắt đầu đọc)
+            if agent_stream is not None:
+                await agent_stream.aclose()
+            if speculative is not None:
+                speculative.discard()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Tắt cache và buffering của proxy để sự kiện tới client ngay
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _add_products_and_bump_catalog(products: List[Dict[str, Any]]) -> None:
+    """
+    Ghi sản phẩm vào vector database rồi tăng phiên bản catalog lần nữa: câu trả lời tạo ra trong lúc
+    đang ghi có thể đã dùng kết quả tìm kiếm cũ
+    """
+    try:
+        await asyncio.to_thread(vector_store.add_products, products)
+    finally:
+        # Tăng phiên bản trên event loop (answer cache không dùng khóa)
+        answer_cache.bump_catalog_version("sync hoàn tất")
 
 @router.post("/sync", response_model=SyncResponse)
 async def sync_data(request: SyncRequest, background_tasks: BackgroundTasks):
@@ -156,8 +518,15 @@ async def sync_data(request: SyncRequest, background_tasks: BackgroundTasks):
     """
     try:
         if request.type == "products":
+            # Xóa cache của các sản phẩm được đồng bộ để không trả về dữ liệu cũ
+            spring_boot_client.invalidate_catalog_cache(
+                [product.get("id") for product in request.data if product.get("id") is not None]
+            )
+            
+            answer_cache.bump_catalog_version("sync")
+            
             # Thêm task đồng bộ vào background task
-            background_tasks.add_task(vector_store.add_products, request.data)
+            background_tasks.add_task(_add_products_and_bump_catalog, request.data)
             
             return SyncResponse(
                 status="success",
@@ -181,12 +550,27 @@ async def auto_sync_data(request: AutoSyncRequest, background_tasks: BackgroundT
     print(f"[AUTO-SYNC] Bắt đầu quá trình đồng bộ tự động loại: {request.type}, limit: {request.limit}")
     try:
         if request.type == "products":
-            # Lấy dữ liệu sản phẩm từ Spring Boot API
+            # Lấy dữ liệu sản phẩm từ Spring Boot API theo từng trang
+            page_size = request.page_size or settings.CATALOG_SYNC_PAGE_SIZE
             print(f"[AUTO-SYNC] Đang lấy dữ liệu từ Spring Boot API...")
-            print(f"[AUTO-SYNC] URL: {settings.SPRING_BOOT_API_URL}")
-            products = spring_boot_client.get_all_products(limit=request.limit)
+            print(f"[AUTO-SYNC] URL: {settings.SPRING_BOOT_API_URL}, page_size: {page_size}")
+            pages = spring_boot_client.iter_all_products(
+                page_size=page_size,
+                prefetch=settings.CATALOG_SYNC_PREFETCH_PAGES,
+                limit=request.limit
+            )
             
-            if not products:
+            # Lấy trang đầu tiên trước khi xóa dữ liệu cũ, nếu API lỗi thì giữ nguyên vector database
+            try:
+                first_page = await pages.__anext__()
+            except StopAsyncIteration:
+                first_page = []
+            except Exception as e:
+                print(f"[AUTO-SYNC] Lỗi khi lấy dữ liệu từ Spring Boot API: {str(e)}")
+                first_page = []
+            
+            if not first_page:
+                await pages.aclose()
                 print(f"[AUTO-SYNC] Không thể lấy dữ liệu sản phẩm từ Spring Boot API")
                 return SyncResponse(
                     status="error",
@@ -194,7 +578,9 @@ async def auto_sync_data(request: AutoSyncRequest, background_tasks: BackgroundT
                     message="Không thể lấy dữ liệu sản phẩm từ Spring Boot API"
                 )
             
-            print(f"[AUTO-SYNC] Lấy được {len(products)} sản phẩm từ API")
+            # Dữ liệu sản phẩm được làm mới toàn bộ nên xóa cache sản phẩm và các câu trả lời đã lưu
+            spring_boot_client.invalidate_catalog_cache()
+            answer_cache.bump_catalog_version("auto-sync")
             
             # Xóa dữ liệu cũ trước khi thêm dữ liệu mới
             print(f"[AUTO-SYNC] Tiến hành xóa toàn bộ dữ liệu cũ...")
@@ -206,27 +592,37 @@ async def auto_sync_data(request: AutoSyncRequest, background_tasks: BackgroundT
                 # Tiếp tục thêm dữ liệu mới ngay cả khi xóa dữ liệu cũ thất bại
             
             print(f"[AUTO-SYNC] Đang thêm dữ liệu mới vào vector database...")
+            # Hiển thị cấu hình Milvus
+            print(f"[AUTO-SYNC] Milvus config: uri={settings.MILVUS_URI}, collection={settings.MILVUS_COLLECTION_NAME}")
+            
+            async def all_pages():
+                yield first_page
+                async for page in pages:
+                    yield page
             
             try:
-                # Hiển thị cấu hình Milvus
-                print(f"[AUTO-SYNC] Milvus config: uri={settings.MILVUS_URI}, collection={settings.MILVUS_COLLECTION_NAME}")
-                
-                # Thêm dữ liệu mới
-                vector_store.add_products(products)
-                
-                print(f"[AUTO-SYNC] Hoàn thành quá trình thêm dữ liệu vào vector database")
+                # Ghi từng lô trong khi các trang tiếp theo vẫn đang được tải
+                count = await vector_store.add_products_streaming(
+                    all_pages(),
+                    chunk_size=settings.CATALOG_SYNC_CHUNK_SIZE
+                )
+                print(f"[AUTO-SYNC] Hoàn thành quá trình thêm {count} sản phẩm vào vector database")
             except Exception as e:
                 print(f"[AUTO-SYNC] Lỗi khi thêm dữ liệu vào vector database: {str(e)}")
                 return SyncResponse(
                     status="error",
                     count=0,
-                    message=f"Lỗi khi thêm dữ liệu vào vector database: {str(e)}"
+                    message=f"Lỗi khi đồng bộ dữ liệu vào vector database: {str(e)}"
                 )
+            finally:
+                await pages.aclose()
+                # Câu trả lời tạo ra trong lúc đang ghi có thể đã dùng dữ liệu cũ hoặc chưa đầy đủ
+                answer_cache.bump_catalog_version("auto-sync hoàn tất")
             
             return SyncResponse(
                 status="success",
-                count=len(products),
-                message=f"Đã ghi đè và đồng bộ {len(products)} sản phẩm vào vector database"
+                count=count,
+                message=f"Đã ghi đè và đồng bộ {count} sản phẩm vào vector database"
             )
         else:
             print(f"[AUTO-SYNC] Loại dữ liệu '{request.type}' không được hỗ trợ")
@@ -243,8 +639,60 @@ async def auto_sync_data(request: AutoSyncRequest, background_tasks: BackgroundT
 async def health_check():
     """
     Endpoint kiểm tra trạng thái hoạt động của service
+    
+    spring_boot.status = "degraded" khi có circuit breaker đang mở (đang từ chối request tới Spring Boot)
+    """
+    return {
+        "status": "ok",
+        "version": "1.0.0",
+        "agents": agent_registry.stats(),
+        "spring_boot": spring_boot_client.resilience_stats()
+    }
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Endpoint trả về các chỉ số vận hành (cache, ...) của service
+    """
+    return {
+        "catalog_cache": spring_boot_client.catalog_cache.stats(),
+        "request_coalescing": spring_boot_client.single_flight.stats(),
+        "conditional_get": {
+            **spring_boot_client.conditional_stats,
+            "validators": len(spring_boot_client.catalog_validators)
+        },
+        "routing": {
+            **rule_router.stats(),
+            "centroid": centroid_classifier.stats(),
+            "cache": routing_cache.stats(),
+            "latency_by_mode": routing_latency.stats(),
+            "faq": faq_engine.stats()
+        },
+        "speculative_retrieval": SpeculativeRetrieval.stats(),
+        "streaming_latency": streaming_latency.stats(),
+        "tool_memo": dict(memo_stats),
+        "answer_cache": answer_cache.stats(),
+        # Token theo agent, cached_ratio: tỉ lệ input token được provider lấy từ prompt cache
+        "agent_tokens": agent_token_usage.stats(),
+        "history_summary": conversation_summarizer.stats(),
+        # Số lượt đang chạy, độ dài hàng đợi, thời gian chờ và số lượt bị từ chối của từng agent
+        "bulkheads": agent_bulkheads.stats(),
+        "query_embedding_cache": embedding_provider.query_cache_stats()
+    }
+
+@router.get("/metrics/agents")
+async def get_agent_report():
+    """
+    Báo cáo độ trễ và chi phí theo agent để điều chỉnh model của từng agent: cấu hình đang dùng
+    (model, max_tokens, temperature, max_turns), thời gian xử lý p50/p95/p99, token, tỉ lệ input
+    token được cache và chi phí ước tính theo MODEL_PRICES
     """
-    return {"status": "ok", "version": "1.0.0"}
+    latency = agent_latency.stats()
+    usage = agent_token_usage.stats()
+    return {
+        name: {**profile, "latency": latency.get(name), "usage": usage.get(name)}
+        for name, profile in agent_profiles().items()
+    }
 
 @router.get("/conversations/{user_id}", response_model=List[Dict[str, Any]])
 async def get_user_conversations(user_id: str, session: Session = Depends(get_session)):
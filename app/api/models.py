@@ -57,4 +57,5 @@ class AutoSyncRequest(BaseModel):
     Request model cho API tự động đồng bộ dữ liệu từ Spring Boot
     """
     type: str = Field(..., description="Loại dữ liệu cần đồng bộ (products, categories)")
-    limit: Optional[int] = Field(100, description="Số lượng item tối đa cần đồng bộ") 
\ No newline at end of file
+    limit: Optional[int] = Field(None, description="Số lượng item tối đa cần đồng bộ (None = toàn bộ)")
+    page_size: Optional[int] = Field(None, description="Số item mỗi trang khi lấy từ Spring Boot API")
\ No newline at end of file
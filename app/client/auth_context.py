@@ -0,0 +1,39 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# Token xác thực của request hiện tại. Mỗi request FastAPI chạy trong một asyncio task
+# riêng nên giá trị không bị lẫn giữa các cuộc hội thoại chạy đồng thời.
+_current_auth_token: ContextVar[Optional[str]] = ContextVar("spring_boot_auth_token", default=None)
+
+
+def normalize_bearer(auth_token: Optional[str]) -> Optional[str]:
+    """Chuẩn hóa token về dạng 'Bearer <token>'"""
+    if not auth_token:
+        return None
+    return auth_token if auth_token.startswith("Bearer ") else f"Bearer {auth_token}"
+
+
+def get_auth_token() -> Optional[str]:
+    """Lấy token (đã chuẩn hóa) của request hiện tại"""
+    return _current_auth_token.get()
+
+
+def set_auth_token(auth_token: Optional[str]) -> None:
+    """Đặt token cho context hiện tại (request-scoped)"""
+    _current_auth_token.set(normalize_bearer(auth_token))
+
+
+@contextmanager
+def auth_context(auth_token: Optional[str]) -> Iterator[None]:
+    """
+    Gắn token xác thực vào context hiện tại trong phạm vi khối with
+
+    Args:
+        auth_token: Token JWT của người dùng (có hoặc không có tiền tố Bearer)
+    """
+    reset_token = _current_auth_token.set(normalize_bearer(auth_token))
+    try:
+        yield
+    finally:
+        _current_auth_token.reset(reset_token)
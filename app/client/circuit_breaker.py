@@ -0,0 +1,165 @@
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+import time
+
+
+# Tên thân thiện của từng nhóm endpoint, dùng trong thông báo gửi cho người dùng
+FAMILY_LABELS = {
+    "products": "Hệ thống sản phẩm",
+    "carts": "Hệ thống giỏ hàng",
+    "orders": "Hệ thống đơn hàng"
+}
+
+
+class CircuitOpenError(Exception):
+    """
+    Lỗi trả về ngay (không gọi Spring Boot API) khi circuit breaker của nhóm endpoint đang mở.
+
+    Nội dung lỗi là câu thông báo thân thiện để agent có thể chuyển thẳng cho người dùng.
+    """
+
+    def __init__(self, family: str, retry_after: float):
+        self.family = family
+        self.retry_after = max(retry_after, 0.0)
+        label = FAMILY_LABELS.get(family, "Hệ thống")
+        self.user_message = (
+            f"{label} đang tạm thời gián đoạn, vui lòng thử lại sau khoảng "
+            f"{max(int(round(self.retry_after)), 1)} giây. Không cần thử lại ngay."
+        )
+        super().__init__(self.user_message)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker cho một nhóm endpoint của Spring Boot API.
+
+    - closed: request đi bình thường, đếm số lỗi liên tiếp
+    - open: sau failure_threshold lỗi liên tiếp, mọi request bị từ chối ngay trong recovery_timeout giây
+    - half_open: hết thời gian chờ, cho tối đa half_open_max_calls request thử; thành công thì đóng lại,
+      lỗi thì mở lại
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._half_open_calls = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def before_call(self) -> None:
+        """Kiểm tra trước khi gửi request, ném CircuitOpenError nếu đang từ chối request"""
+        if self.state == self.OPEN:
+            remaining = self.opened_at + self.recovery_timeout - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, remaining)
+            self.state = self.HALF_OPEN
+            self._half_open_calls = 0
+            print(f"[CIRCUIT] {self.name}: chuyển sang half_open, cho phép request thử")
+
+        if self.state == self.HALF_OPEN:
+            if self._half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.recovery_timeout)
+            self._half_open_calls += 1
+
+    def record_success(self) -> None:
+        """Ghi nhận request thành công (backend phản hồi, kể cả lỗi 4xx)"""
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            print(f"[CIRCUIT] {self.name}: backend đã phục hồi, đóng circuit")
+            self.state = self.CLOSED
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        """Ghi nhận request lỗi (lỗi kết nối, timeout hoặc 5xx)"""
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def release(self) -> None:
+        """Trả lại lượt thử của half_open khi request bị hủy giữa chừng (không có kết quả)"""
+        if self.state == self.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def _open(self) -> None:
+        if self.state != self.OPEN:
+            self.times_opened += 1
+            print(f"[CIRCUIT] {self.name}: mở circuit sau {self.consecutive_failures} lỗi liên tiếp, "
+                  f"từ chối request trong {self.recovery_timeout} giây")
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        """Trạng thái hiện tại của circuit breaker"""
+        retry_after = None
+        if self.state == self.OPEN and self.opened_at is not None:
+            retry_after = round(max(self.opened_at + self.recovery_timeout - time.monotonic(), 0.0), 1)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_after": retry_after
+        }
+
+
+class RetryBudget:
+    """
+    Giới hạn tổng số lần retry trên toàn client trong một cửa sổ thời gian trượt.
+
+    Số retry được phép = min_retries + ratio * số request trong cửa sổ, nên khi backend lỗi hàng loạt
+    retry không nhân số request lên nhiều lần.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10, window: float = 10.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self.exhausted = 0
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window
+        while self._requests and self._requests[0] < cutoff:
+            self._requests.popleft()
+        while self._retries and self._retries[0] < cutoff:
+            self._retries.popleft()
+
+    def record_request(self) -> None:
+        """Ghi nhận một request gốc (không tính retry)"""
+        now = time.monotonic()
+        self._prune(now)
+        self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        """Xin một lượt retry, trả về False nếu đã hết ngân sách"""
+        now = time.monotonic()
+        self._prune(now)
+        if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+            self.exhausted += 1
+            return False
+        self._retries.append(now)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Thống kê ngân sách retry trong cửa sổ hiện tại"""
+        self._prune(time.monotonic())
+        return {
+            "window_seconds": self.window,
+            "requests": len(self._requests),
+            "retries": len(self._retries),
+            "allowed_retries": int(self.min_retries + self.ratio * len(self._requests)),
+            "exhausted": self.exhausted
+        }
@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Gộp các request giống nhau đang chạy đồng thời thành một request duy nhất.
+
+    Request đầu tiên với một key sẽ thực sự được gửi đi; các lời gọi đến sau với cùng key
+    chờ chung kết quả (hoặc lỗi) của request đó thay vì gửi thêm request tới backend.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Chạy factory() nếu chưa có request nào cùng key đang chạy, ngược lại chờ kết quả chung
+
+        Args:
+            key: Định danh request (URL, params, phạm vi xác thực)
+            factory: Hàm tạo coroutine thực hiện request
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+
+        # shield: một caller bị hủy không làm hủy request mà các caller khác đang chờ
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Đánh dấu exception đã được lấy để tránh cảnh báo khi không còn ai chờ
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Thống kê số request thực sự gửi đi và số request được gộp"""
+        total = self.executed + self.coalesced
+        return {
+            "inflight": len(self._inflight),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0
+        }
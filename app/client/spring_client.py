@@ -1,30 +1,302 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
 
-import requests
+import httpx
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 
+from ..core.cache import TTLCache
 from ..core.config import settings
+from .auth_context import get_auth_token, normalize_bearer, set_auth_token
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, RetryBudget
+from .single_flight import SingleFlight
+
+
+class _RetryableResponse(Exception):
+    """Response 5xx của GET, được ném ra để tenacity retry và trả lại response sau lần thử cuối"""
+
+    def __init__(self, response: httpx.Response):
+        self.response = response
+        super().__init__(f"HTTP {response.status_code}")
+
 
 class SpringBootClient:
     """
-    Client giao tiếp với Spring Boot API
+    Client bất đồng bộ giao tiếp với Spring Boot API (httpx, connection pool dùng chung)
     """
     def __init__(self, auth_token: str = None):
         self.base_url = settings.SPRING_BOOT_API_URL
         self.headers = {
             "Content-Type": "application/json"
         }
-        # Thêm token nếu được cung cấp
+        # Token mặc định của client, dùng khi request hiện tại không có token riêng
+        self.default_auth_token = normalize_bearer(auth_token)
+        # httpx.AsyncClient dùng chung, được tạo khi có request đầu tiên
+        self._http_client: Optional[httpx.AsyncClient] = None
+        # Cache đọc sản phẩm (LRU + TTL riêng cho từng loại endpoint)
+        self.catalog_cache = TTLCache(
+            maxsize=settings.CATALOG_CACHE_MAX_SIZE,
+            default_ttl=settings.CATALOG_CACHE_TTL_SEARCH,
+            name="catalog"
+        )
+        # Validator (ETag / Last-Modified) kèm nội dung đã parse, giữ lâu hơn TTL của cache sản phẩm
+        # để khi entry hết hạn chỉ cần gửi conditional GET thay vì tải lại toàn bộ
+        self.catalog_validators = TTLCache(
+            maxsize=settings.CATALOG_CACHE_MAX_SIZE,
+            default_ttl=settings.CATALOG_CACHE_VALIDATOR_TTL,
+            name="catalog_validators"
+        )
+        self.conditional_stats = {"requests": 0, "not_modified": 0, "modified": 0}
+        # Gộp các GET giống nhau (URL, params, token) đang chạy đồng thời
+        self.single_flight = SingleFlight()
+        self.catalog_cache_ttls = {
+            "product": settings.CATALOG_CACHE_TTL_PRODUCT,
+            "search": settings.CATALOG_CACHE_TTL_SEARCH,
+            "category": settings.CATALOG_CACHE_TTL_CATEGORY,
+            "price_range": settings.CATALOG_CACHE_TTL_PRICE_RANGE
+        }
+        # Circuit breaker riêng cho từng nhóm endpoint, backend lỗi ở nhóm này không chặn nhóm khác
+        self.breakers = {
+            family: CircuitBreaker(
+                family,
+                failure_threshold=settings.SPRING_BOOT_BREAKER_FAILURE_THRESHOLD,
+                recovery_timeout=settings.SPRING_BOOT_BREAKER_RECOVERY_TIMEOUT
+            )
+            for family in ("products", "carts", "orders")
+        }
+        # Ngân sách retry dùng chung cho toàn client
+        self.retry_budget = RetryBudget(
+            ratio=settings.SPRING_BOOT_RETRY_BUDGET_RATIO,
+            min_retries=settings.SPRING_BOOT_RETRY_BUDGET_MIN_RETRIES
+        )
+    
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """
+        Lấy httpx.AsyncClient dùng chung với connection pool và keep-alive
+        """
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.SPRING_BOOT_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.SPRING_BOOT_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.SPRING_BOOT_KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(
+                    settings.SPRING_BOOT_READ_TIMEOUT,
+                    connect=settings.SPRING_BOOT_CONNECT_TIMEOUT
+                )
+            )
+        return self._http_client
+    
+    async def aclose(self):
+        """Đóng connection pool (gọi khi ứng dụng tắt)"""
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self._http_client = None
+    
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Gửi request tới Spring Boot API qua connection pool dùng chung
+        
+        Các GET giống hệt nhau (cùng URL, params và token) đang chạy đồng thời được gộp
+        thành một request, kết quả được chia sẻ cho tất cả các lời gọi.
+        
+        Raises:
+            CircuitOpenError: Circuit breaker của nhóm endpoint đang mở (trả về ngay, không gọi API)
+        """
+        headers = self._build_headers()
+        headers.update(kwargs.pop("headers", None) or {})
+        
+        if method != "GET" or not settings.SPRING_BOOT_COALESCE_READS:
+            return await self._send(method, url, headers, **kwargs)
+        
+        params = kwargs.get("params") or {}
+        key = (
+            url,
+            tuple(sorted((k, str(v)) for k, v in params.items())),
+            headers.get("Authorization"),
+            headers.get("If-None-Match"),
+            headers.get("If-Modified-Since")
+        )
+        return await self.single_flight.do(
+            key,
+            lambda: self._send(method, url, headers, **kwargs)
+        )
+    
+    def _endpoint_family(self, url: str) -> str:
+        """Xác định nhóm endpoint (products, carts, orders) từ URL"""
+        path = url[len(self.base_url):] if url.startswith(self.base_url) else url
+        if path.startswith("/api/v1/carts"):
+            return "carts"
+        if path.startswith("/api/v1/orders") or path.startswith("/api/v1/payment"):
+            return "orders"
+        return "products"
+    
+    async def _send(self, method: str, url: str, headers: Dict[str, str], **kwargs) -> httpx.Response:
+        """
+        Gửi request qua circuit breaker của nhóm endpoint
+        
+        Chỉ GET (idempotent) được retry khi lỗi kết nối/timeout hoặc 5xx, với backoff có jitter,
+        số lần thử giới hạn và mỗi lần retry phải xin được lượt từ ngân sách retry chung.
+        """
+        breaker = self.breakers[self._endpoint_family(url)]
+        if method != "GET":
+            return await self._attempt(breaker, method, url, headers, **kwargs)
+        
+        self.retry_budget.record_request()
+        try:
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(settings.SPRING_BOOT_RETRY_ATTEMPTS) | self._retry_budget_exhausted,
+                wait=wait_exponential_jitter(initial=settings.SPRING_BOOT_RETRY_BACKOFF, max=2.0),
+                retry=retry_if_exception_type((httpx.TransportError, _RetryableResponse)),
+                reraise=True
+            ):
+                with attempt:
+                    return await self._attempt(breaker, method, url, headers, **kwargs)
+        except _RetryableResponse as e:
+            # Hết lượt thử: trả response lỗi như trước để nơi gọi tự xử lý status code
+            return e.response
+    
+    def _retry_budget_exhausted(self, retry_state) -> bool:
+        """Điều kiện dừng của tenacity: dừng khi ngân sách retry chung đã hết"""
+        if self.retry_budget.try_acquire():
+            return False
+        print("[CIRCUIT] Hết ngân sách retry, bỏ qua retry cho request hiện tại")
+        return True
+    
+    async def _attempt(self, breaker: CircuitBreaker, method: str, url: str,
+                       headers: Dict[str, str], **kwargs) -> httpx.Response:
+        """Một lần gửi request, ghi nhận kết quả vào circuit breaker"""
+        breaker.before_call()
+        try:
+            response = await self._get_http_client().request(method, url, headers=headers, **kwargs)
+        except httpx.TransportError:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        
+        if response.status_code >= 500:
+            breaker.record_failure()
+            if method == "GET":
+                raise _RetryableResponse(response)
+            return response
+        
+        breaker.record_success()
+        return response
+    
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Trạng thái circuit breaker từng nhóm endpoint và ngân sách retry"""
+        breakers = {family: breaker.stats() for family, breaker in self.breakers.items()}
+        return {
+            "status": "ok" if all(b["state"] == CircuitBreaker.CLOSED for b in breakers.values()) else "degraded",
+            "breakers": breakers,
+            "retry_budget": self.retry_budget.stats()
+        }
+    
+    def _build_headers(self) -> Dict[str, str]:
+        """
+        Tạo headers cho từng request, lấy token từ auth context của request hiện tại
+        """
+        headers = dict(self.headers)
+        auth_token = get_auth_token() or self.default_auth_token
         if auth_token:
-            self.headers["Authorization"] = auth_token if auth_token.startswith("Bearer ") else f"Bearer {auth_token}"
+            headers["Authorization"] = auth_token
+        return headers
     
     def update_auth_token(self, auth_token: str):
-        """Cập nhật token xác thực"""
-        if auth_token:
-            self.headers["Authorization"] = auth_token if auth_token.startswith("Bearer ") else f"Bearer {auth_token}"
-        elif "Authorization" in self.headers:
-            del self.headers["Authorization"]
+        """
+        Cập nhật token xác thực cho request hiện tại
+
+        Token được lưu trong context của request (contextvar), không thay đổi headers
+        dùng chung của singleton nên các cuộc hội thoại đồng thời không dùng nhầm token.
+        Nên dùng auth_context() để giới hạn phạm vi token.
+        """
+        set_auth_token(auth_token)
     
-    def get_all_products(self, limit: int = 140) -> List[Dict[str, Any]]:
+    async def _cached(
+        self,
+        namespace: str,
+        key: tuple,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        parse: Callable[[httpx.Response], Any]
+    ) -> Any:
+        """
+        Đọc qua cache sản phẩm, dùng conditional GET khi entry đã hết hạn
+        
+        Entry còn hạn được trả về ngay. Khi hết hạn nhưng còn validator (ETag / Last-Modified),
+        request gửi kèm If-None-Match / If-Modified-Since; nếu backend trả về 304 thì dùng lại
+        nội dung đã parse và gia hạn TTL, không cần tải và parse lại JSON.
+        
+        Args:
+            namespace: Loại endpoint (product, search, category, price_range) - quyết định TTL
+            key: Tham số của request
+            url: URL của GET
+            params: Query params
+            parse: Hàm chuyển response 200 thành giá trị trả về
+        """
+        if not settings.CATALOG_CACHE_ENABLED:
+            return parse(await self._request("GET", url, params=params))
+        
+        cache_key = (namespace,) + key
+        cached = self.catalog_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        stale = self.catalog_validators.get(cache_key)
+        conditional_headers = {}
+        if stale is not None:
+            _, etag, last_modified = stale
+            if etag:
+                conditional_headers["If-None-Match"] = etag
+            if last_modified:
+                conditional_headers["If-Modified-Since"] = last_modified
+            self.conditional_stats["requests"] += 1
+        
+        response = await self._request("GET", url, params=params, headers=conditional_headers)
+        
+        if response.status_code == 304 and stale is not None:
+            self.conditional_stats["not_modified"] += 1
+            value = stale[0]
+            # 304 có thể kèm validator mới, nếu không thì giữ validator cũ
+            etag = response.headers.get("ETag") or stale[1]
+            last_modified = response.headers.get("Last-Modified") or stale[2]
+        else:
+            if stale is not None:
+                self.conditional_stats["modified"] += 1
+            value = parse(response)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+        
+        # Không cache kết quả rỗng để không giữ lại lỗi tạm thời của backend
+        if value:
+            self.catalog_cache.set(cache_key, value, self.catalog_cache_ttls[namespace])
+            if etag or last_modified:
+                self.catalog_validators.set(cache_key, (value, etag, last_modified))
+            else:
+                self.catalog_validators.invalidate(cache_key)
+        return value
+    
+    def invalidate_catalog_cache(self, product_ids: Optional[List[Any]] = None) -> None:
+        """
+        Xóa cache sản phẩm (gọi khi dữ liệu sản phẩm được đồng bộ lại)
+        
+        Args:
+            product_ids: Chỉ xóa các sản phẩm này (cùng toàn bộ kết quả tìm kiếm). None = xóa hết
+        """
+        if product_ids is None:
+            self.catalog_cache.clear()
+            self.catalog_validators.clear()
+            return
+        
+        ids = {str(product_id) for product_id in product_ids}
+        # Kết quả tìm kiếm có thể chứa sản phẩm đã thay đổi nên luôn bị xóa
+        predicate = lambda key: key[0] != "product" or key[1] in ids
+        self.catalog_cache.invalidate_where(predicate)
+        self.catalog_validators.invalidate_where(predicate)
+    
+    async def get_all_products(self, limit: int = 140) -> List[Dict[str, Any]]:
         """
         Lấy tất cả sản phẩm từ Spring Boot API
         
@@ -36,7 +308,7 @@ class SpringBootClient:
         """
         url = f"{self.base_url}/api/v1/products"
         params = {"page": 1, "size": limit}
-        response = requests.get(url, params=params, headers=self.headers)
+        response = await self._request("GET", url, params=params)
         
         if response.status_code == 200:
             # Truy cập theo cấu trúc chính xác của API
@@ -48,13 +320,97 @@ class SpringBootClient:
                 return []
         return []
     
-    def get_product_by_id(self, product_id: str) -> Optional[Dict[str, Any]]:
+    async def _fetch_product_page(self, page: int, size: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Lấy một trang sản phẩm, trả về (danh sách sản phẩm, tổng số trang nếu API cho biết)
+        
+        Khác với search_products, lỗi HTTP được ném ra để quá trình đồng bộ không bị cắt cụt âm thầm
         """
-        Lấy thông tin sản phẩm theo ID
+        url = f"{self.base_url}/api/v1/products"
+        response = await self._request("GET", url, params={"page": page, "size": size})
+        response.raise_for_status()
+        
+        data = (response.json() or {}).get("data") or {}
+        if "result" not in data:
+            raise ValueError(f"Cấu trúc JSON không như mong đợi ở trang {page}: {data}")
+        meta = data.get("meta") or {}
+        return data["result"] or [], meta.get("pages")
+    
+    async def iter_all_products(
+        self,
+        page_size: int = 100,
+        prefetch: int = 2,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
         """
-        url = f"{self.base_url}/api/v1/products/{product_id}"
-        response = requests.get(url, headers=self.headers)
+        Duyệt toàn bộ sản phẩm theo từng trang (async generator)
         
+        Trong khi trang hiện tại được xử lý, tối đa `prefetch` trang tiếp theo được tải trước song song;
+        với `prefetch=0` trang tiếp theo chỉ được tải sau khi nơi gọi xử lý xong trang hiện tại.
+        
+        Args:
+            page_size: Số sản phẩm mỗi trang
+            prefetch: Số trang tải trước (0 = tải tuần tự)
+            limit: Số sản phẩm tối đa (None = toàn bộ catalog)
+            
+        Yields:
+            Danh sách sản phẩm của từng trang
+        """
+        first_page, total_pages = await self._fetch_product_page(1, page_size)
+        pending: Dict[int, asyncio.Task] = {}
+        next_page = 2
+        page = 1
+        items = first_page
+        yielded = 0
+        
+        try:
+            while True:
+                last_page = len(items) < page_size or (total_pages is not None and page >= total_pages)
+                if limit is not None and yielded + len(items) >= limit:
+                    last_page = True
+                
+                # Lên lịch tải trước các trang tiếp theo trước khi trả trang hiện tại cho nơi gọi
+                while not last_page and len(pending) < prefetch and (total_pages is None or next_page <= total_pages):
+                    pending[next_page] = asyncio.ensure_future(self._fetch_product_page(next_page, page_size))
+                    next_page += 1
+                
+                if limit is not None:
+                    items = items[:max(limit - yielded, 0)]
+                if items:
+                    yield items
+                    yielded += len(items)
+                
+                if last_page:
+                    return
+                
+                page += 1
+                task = pending.pop(page, None)
+                if task is None:
+                    # Không tải trước (prefetch=0): tải tuần tự
+                    if total_pages is not None and page > total_pages:
+                        return
+                    next_page = max(next_page, page + 1)
+                    items, pages = await self._fetch_product_page(page, page_size)
+                else:
+                    items, pages = await task
+                if pages is not None:
+                    total_pages = pages
+        finally:
+            for task in pending.values():
+                task.cancel()
+    
+    async def get_product_by_id(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Lấy thông tin sản phẩm theo ID (qua cache sản phẩm)
+        """
+        return await self._cached(
+            "product", (str(product_id),),
+            f"{self.base_url}/api/v1/products/{product_id}", None,
+            self._parse_product
+        )
+    
+    @staticmethod
+    def _parse_product(response: httpx.Response) -> Optional[Dict[str, Any]]:
         if response.status_code == 200:
             json_data = response.json()
             if json_data and "data" in json_data:
@@ -64,8 +420,90 @@ class SpringBootClient:
                 return None
         return None
     
-    def search_products(self, query: str, page: int = 1, size: int = 10) -> List[Dict[str, Any]]:
+    async def get_products_by_ids(self, product_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Lấy nhiều sản phẩm cùng lúc theo danh sách ID
+        
+        Thứ tự ưu tiên: cache sản phẩm -> một truy vấn Spring Filter "id in [...]" cho các ID số
+        -> gọi song song GET /products/{id} (giới hạn số request đồng thời) cho phần còn thiếu.
+        
+        Args:
+            product_ids: Danh sách ID sản phẩm
+            
+        Returns:
+            Danh sách theo đúng thứ tự đầu vào, mỗi phần tử {"id", "product", "error"}
+        """
+        ids = [str(product_id) for product_id in product_ids]
+        unique_ids = list(dict.fromkeys(ids))
+        found: Dict[str, Dict[str, Any]] = {}
+        errors: Dict[str, str] = {}
+        
+        # 1. Lấy từ cache sản phẩm
+        if settings.CATALOG_CACHE_ENABLED:
+            for product_id in unique_ids:
+                cached = self.catalog_cache.get(("product", product_id))
+                if cached is not None:
+                    found[product_id] = cached
+        
+        # 2. Một truy vấn filter duy nhất cho các ID dạng số
+        numeric_ids = [product_id for product_id in unique_ids if product_id not in found and product_id.isdigit()]
+        if len(numeric_ids) > 1:
+            filter_query = f"id in [{', '.join(numeric_ids)}]"
+            try:
+                products = await self._fetch_products(filter_query, 1, len(numeric_ids))
+            except (httpx.HTTPError, CircuitOpenError) as e:
+                # Lỗi thì lấy từng ID ở bước 3, ID lỗi được trả về kèm thông báo lỗi
+                print(f"Lỗi khi lấy sản phẩm theo danh sách ID: {str(e)}")
+                products = []
+            for product in products:
+                product_id = str(product.get("id"))
+                if product_id in numeric_ids:
+                    found[product_id] = product
+                    if settings.CATALOG_CACHE_ENABLED:
+                        self.catalog_cache.set(("product", product_id), product, self.catalog_cache_ttls["product"])
+        
+        # 3. Gọi song song cho các ID còn thiếu (filter không hỗ trợ hoặc ID không phải số)
+        semaphore = asyncio.Semaphore(settings.SPRING_BOOT_BULK_CONCURRENCY)
+        
+        async def fetch_one(product_id: str):
+            async with semaphore:
+                try:
+                    product = await self.get_product_by_id(product_id)
+                except Exception as e:
+                    errors[product_id] = f"Lỗi khi lấy sản phẩm: {str(e)}"
+                    return
+                if product:
+                    found[product_id] = product
+        
+        await asyncio.gather(*(fetch_one(product_id) for product_id in unique_ids if product_id not in found))
+        
+        return [
+            {
+                "id": product_id,
+                "product": found.get(product_id),
+                "error": None if product_id in found else errors.get(product_id, "Không tìm thấy sản phẩm")
+            }
+            for product_id in ids
+        ]
+    
+    async def search_products(self, query: str, page: int = 1, size: int = 10) -> List[Dict[str, Any]]:
+        """
+        Tìm kiếm sản phẩm bằng Spring Filter (qua cache sản phẩm)
+        """
+        return await self._cached(
+            "search", (query, page, size),
+            f"{self.base_url}/api/v1/products", self._product_list_params(query, page, size),
+            self._parse_product_list
+        )
+    
+    async def _fetch_products(self, query: str, page: int = 1, size: int = 10) -> List[Dict[str, Any]]:
         url = f"{self.base_url}/api/v1/products"
+        params = self._product_list_params(query, page, size)
+        response = await self._request("GET", url, params=params)
+        return self._parse_product_list(response)
+    
+    @staticmethod
+    def _product_list_params(query: Optional[str], page: int = 1, size: int = 10) -> Dict[str, Any]:
         params = {
             "page": page,
             "size": size
@@ -74,12 +512,10 @@ class SpringBootClient:
         # Thêm filter nếu có
         if query:
             params["filter"] = query
-            
-        print(f"URL: {url}")
-        print(f"Params: {params}")
-            
-        response = requests.get(url, params=params, headers=self.headers)
-        
+        return params
+    
+    @staticmethod
+    def _parse_product_list(response: httpx.Response) -> List[Dict[str, Any]]:
         if response.status_code == 200:
             json_data = response.json()
             if json_data and "data" in json_data and "result" in json_data["data"]:
@@ -89,7 +525,7 @@ class SpringBootClient:
                 return []
         return []
     
-    def get_products_by_category(self, category_id: str, page: int = 1, size: int = 10) -> List[Dict[str, Any]]:
+    async def get_products_by_category(self, category_id: str, page: int = 1, size: int = 10) -> List[Dict[str, Any]]:
         """
         Lấy sản phẩm theo danh mục sử dụng Spring Filter
         
@@ -103,9 +539,13 @@ class SpringBootClient:
         """
         # Sử dụng Spring Filter để lọc theo category
         filter_query = f"category.id:{category_id}"
-        return self.search_products(filter_query, page, size)
+        return await self._cached(
+            "category", (str(category_id), page, size),
+            f"{self.base_url}/api/v1/products", self._product_list_params(filter_query, page, size),
+            self._parse_product_list
+        )
     
-    def get_product_by_name(self, name: str) -> List[Dict[str, Any]]:
+    async def get_product_by_name(self, name: str) -> List[Dict[str, Any]]:
         """
         Tìm sản phẩm theo tên sử dụng Spring Filter
         
@@ -117,9 +557,9 @@ class SpringBootClient:
         """
         # Sử dụng toán tử ~ của Spring Filter để tìm kiếm tương đối
         filter_query = f"name~'{name}'"
-        return self.search_products(filter_query)
+        return await self.search_products(filter_query)
     
-    def get_products_by_price_range(self, min_price: float = None, max_price: float = None) -> List[Dict[str, Any]]:
+    async def get_products_by_price_range(self, min_price: float = None, max_price: float = None) -> List[Dict[str, Any]]:
         filters = []
         if min_price is not None:
             filters.append(f"sellPrice>{min_price}")
@@ -128,9 +568,13 @@ class SpringBootClient:
             
         filter_query = " and ".join(filters) if filters else None
         print(f"Filter query: {filter_query}")
-        return self.search_products(filter_query)
+        return await self._cached(
+            "price_range", (min_price, max_price),
+            f"{self.base_url}/api/v1/products", self._product_list_params(filter_query),
+            self._parse_product_list
+        )
     
-    def add_to_cart(self, product_id: str, quantity: int = 1) -> Dict[str, Any]:
+    async def add_to_cart(self, product_id: str, quantity: int = 1) -> Dict[str, Any]:
         """
         Thêm sản phẩm vào giỏ hàng
         
@@ -159,15 +603,23 @@ class SpringBootClient:
             }
             
             print(f"Gọi API thêm vào giỏ hàng: {url}")
-            print(f"Headers: {self.headers}")
             print(f"Payload: {payload}")
             
-            response = requests.post(url, json=payload, headers=self.headers)
+            response = await self._request("POST", url, json=payload)
             print(f"Status code: {response.status_code}")
             
             if response.status_code == 200:
                 result = response.json()
                 print(f"Kết quả API: {result}")
+                # Giữ lại giỏ hàng mới nếu backend trả về, tránh phải gọi lại GET /carts
+                cart = self._cart_from_response(response)
+                if cart is not None:
+                    result["cart"] = cart
+                else:
+                    # Không có cả giỏ hàng: giữ dòng giỏ hàng với số lượng backend đã xác nhận (nếu có)
+                    line = self.parse_cart_line(result)
+                    if line is not None:
+                        result["cart_line"] = line
                 return result
             else:
                 error_msg = f"Lỗi khi thêm vào giỏ hàng: HTTP {response.status_code}"
@@ -186,7 +638,7 @@ class SpringBootClient:
             print(error_msg)
             return {"success": False, "message": error_msg}
     
-    def update_cart_item(self, cart_detail_id: str, quantity: int) -> Dict[str, Any]:
+    async def update_cart_item(self, cart_detail_id: str, quantity: int) -> Dict[str, Any]:
         """
         Cập nhật số lượng sản phẩm trong giỏ hàng
         """
@@ -194,76 +646,146 @@ class SpringBootClient:
         payload = {
             "quantity": quantity
         }
-        response = requests.put(url, json=payload, headers=self.headers)
+        response = await self._request("PUT", url, json=payload)
         
         if response.status_code == 200:
-            return response.json()
+            result = response.json()
+            cart = self._cart_from_response(response)
+            if cart is not None:
+                result["cart"] = cart
+            return result
         return {"success": False, "message": "Không thể cập nhật giỏ hàng"}
     
-    def remove_from_cart(self, cart_detail_id: str) -> Dict[str, Any]:
+    async def remove_from_cart(self, cart_detail_id: str) -> Dict[str, Any]:
         """
         Xóa sản phẩm khỏi giỏ hàng
         """
         url = f"{self.base_url}/api/v1/carts/remove/{cart_detail_id}"
-        response = requests.delete(url, headers=self.headers)
+        response = await self._request("DELETE", url)
         
         if response.status_code == 200:
-            return {"success": True, "message": "Đã xóa sản phẩm khỏi giỏ hàng"}
+            result = {"success": True, "message": "Đã xóa sản phẩm khỏi giỏ hàng"}
+            cart = self._cart_from_response(response)
+            if cart is not None:
+                result["cart"] = cart
+            return result
         return {"success": False, "message": "Không thể xóa sản phẩm khỏi giỏ hàng"}
     
-    def get_cart(self, user_id: str = None) -> Dict[str, Any]:
+    async def get_cart(self, user_id: str = None) -> Dict[str, Any]:
         """
         Lấy thông tin giỏ hàng
         """
         url = f"{self.base_url}/api/v1/carts"
-        response = requests.get(url, headers=self.headers)
+        response = await self._request("GET", url)
         
         if response.status_code == 200:
             json_data = response.json()
             print(f"Response giỏ hàng: {json_data}")
             
             # Kiểm tra cấu trúc JSON và trích xuất dữ liệu
-            if json_data and "data" in json_data:
-                items = json_data["data"]
-                if isinstance(items, list) and len(items) > 0:
-                    # Định dạng lại dữ liệu để phù hợp với mong đợi của agent
-                    formatted_items = []
-                    total_price = 0
-                    
-                    for item in items:
-                        product = item.get("product", {})
-                        formatted_item = {
-                            "id": item.get("id"),
-                            "product_id": product.get("id"),
-                            "name": product.get("name"),
-                            "price": product.get("sellPrice", 0),
-                            "quantity": item.get("quantity", 0),
-                            "image": product.get("image")
-                        }
-                        formatted_items.append(formatted_item)
-                        total_price += (product.get("sellPrice", 0) * item.get("quantity", 0))
-                    
-                    return {
-                        "items": formatted_items,
-                        "total": total_price,
-                        "count": len(formatted_items)
-                    }
-                return {"items": [], "total": 0, "count": 0}
-            return {"items": [], "total": 0, "count": 0}
+            cart = self.parse_cart(json_data)
+            if cart is not None:
+                return cart
         return {"items": [], "total": 0, "count": 0}
     
-    def clear_cart(self) -> Dict[str, Any]:
+    @staticmethod
+    def parse_cart(json_data: Any) -> Optional[Dict[str, Any]]:
+        """
+        Chuyển response chứa danh sách chi tiết giỏ hàng thành định dạng giỏ hàng của agent
+        
+        Args:
+            json_data: Response dạng {"data": [{"id", "quantity", "product": {...}}, ...]}
+                (hoặc data là dict chứa danh sách đó trong "cartDetails"/"items")
+            
+        Returns:
+            Dict giỏ hàng {"items", "total", "count"}, None nếu response không chứa giỏ hàng
+        """
+        if not isinstance(json_data, dict):
+            return None
+        
+        items = json_data.get("data")
+        if isinstance(items, dict):
+            items = items.get("cartDetails", items.get("items"))
+        if not isinstance(items, list):
+            return None
+        
+        # Định dạng lại dữ liệu để phù hợp với mong đợi của agent
+        formatted_items = []
+        total_price = 0
+        
+        for item in items:
+            formatted_item = SpringBootClient._format_cart_item(item)
+            formatted_items.append(formatted_item)
+            total_price += (formatted_item["price"] * formatted_item["quantity"])
+        
+        return {
+            "items": formatted_items,
+            "total": total_price,
+            "count": len(formatted_items)
+        }
+    
+    @staticmethod
+    def _format_cart_item(item: Dict[str, Any]) -> Dict[str, Any]:
+        """Chuyển một chi tiết giỏ hàng của backend thành dòng giỏ hàng của agent"""
+        product = item.get("product") or {}
+        return {
+            "id": item.get("id"),
+            "product_id": product.get("id", item.get("productId")),
+            "name": product.get("name"),
+            "price": product.get("sellPrice", 0),
+            "quantity": item.get("quantity", 0),
+            "image": product.get("image")
+        }
+    
+    @staticmethod
+    def parse_cart_line(json_data: Any) -> Optional[Dict[str, Any]]:
+        """
+        Lấy dòng giỏ hàng mà API thêm sản phẩm trả về
+        
+        Args:
+            json_data: Response dạng {"data": {"id", "quantity", "product": {...}}}
+            
+        Returns:
+            Dict dòng giỏ hàng (số lượng là tổng sau khi thêm), None nếu response không xác nhận số lượng
+        """
+        data = json_data.get("data") if isinstance(json_data, dict) else None
+        if not isinstance(data, dict) or not isinstance(data.get("quantity"), int):
+            return None
+        line = SpringBootClient._format_cart_item(data)
+        if line["product_id"] is None:
+            return None
+        return line
+    
+    def _cart_from_response(self, response: httpx.Response) -> Optional[Dict[str, Any]]:
+        """
+        Lấy giỏ hàng từ response của API thay đổi giỏ hàng (nếu backend trả về giỏ hàng)
+        """
+        if not response.content:
+            return None
+        try:
+            json_data = response.json()
+        except ValueError:
+            return None
+        
+        # Chỉ coi là giỏ hàng khi mọi phần tử đều là chi tiết giỏ hàng có kèm sản phẩm
+        data = json_data.get("data") if isinstance(json_data, dict) else None
+        items = data.get("cartDetails", data.get("items")) if isinstance(data, dict) else data
+        if not isinstance(items, list) or any(not isinstance(item, dict) or "product" not in item for item in items):
+            return None
+        return self.parse_cart(json_data)
+    
+    async def clear_cart(self) -> Dict[str, Any]:
         """
         Xóa tất cả sản phẩm trong giỏ hàng
         """
         url = f"{self.base_url}/api/v1/carts/clear"
-        response = requests.delete(url, headers=self.headers)
+        response = await self._request("DELETE", url)
         
         if response.status_code == 200:
             return {"success": True, "message": "Đã xóa tất cả sản phẩm trong giỏ hàng"}
         return {"success": False, "message": "Không thể xóa giỏ hàng"}
     
-    def create_order(self, payment_method: str, phone: str, address: str) -> Dict[str, Any]:
+    async def create_order(self, payment_method: str, phone: str, address: str) -> Dict[str, Any]:
         """
         Tạo đơn hàng mới
         
@@ -280,10 +802,9 @@ class SpringBootClient:
         }
         
         print(f"Gọi API tạo đơn hàng: {url}")
-        print(f"Headers: {self.headers}")
         print(f"Payload: {payload}")
         
-        response = requests.post(url, json=payload, headers=self.headers)
+        response = await self._request("POST", url, json=payload)
         print(f"Status code: {response.status_code}")
         
         if response.status_code == 200 or response.status_code == 201:
@@ -330,34 +851,34 @@ class SpringBootClient:
             print(error_msg)
             return {"success": False, "message": error_msg}
             
-    def get_order_info(self, order_id: str) -> Dict[str, Any]:
+    async def get_order_info(self, order_id: str) -> Dict[str, Any]:
         """
         Lấy thông tin chi tiết đơn hàng
         """
         url = f"{self.base_url}/api/v1/orders/{order_id}"
-        response = requests.get(url, headers=self.headers)
+        response = await self._request("GET", url)
         
         if response.status_code == 200:
             return response.json()
         return {"success": False, "message": "Không thể lấy thông tin đơn hàng"}
     
-    def get_payment_info(self, order_id: str) -> Dict[str, Any]:
+    async def get_payment_info(self, order_id: str) -> Dict[str, Any]:
         """
         Lấy thông tin thanh toán của đơn hàng
         """
         url = f"{self.base_url}/api/v1/payment/payment-info/{order_id}"
-        response = requests.get(url, headers=self.headers)
+        response = await self._request("GET", url)
         
         if response.status_code == 200:
             return response.json()
         return {"success": False, "message": "Không thể lấy thông tin thanh toán"}
     
-    def get_my_orders(self) -> List[Dict[str, Any]]:
+    async def get_my_orders(self) -> List[Dict[str, Any]]:
         """
         Lấy danh sách đơn hàng của người dùng hiện tại
         """
         url = f"{self.base_url}/api/v1/orders/my-orders"
-        response = requests.get(url, headers=self.headers)
+        response = await self._request("GET", url)
         
         if response.status_code == 200:
             json_data = response.json()
@@ -0,0 +1,144 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .config import settings
+from .metrics import LatencyTracker
+
+# Câu trả lời cho khách khi agent đang quá tải
+OVERLOADED_MESSAGE = "Hệ thống đang có quá nhiều yêu cầu, bạn vui lòng thử lại sau ít phút nhé!"
+
+
+class BulkheadRejected(Exception):
+    """Lượt chạy bị từ chối: hàng đợi của agent đã đầy hoặc chờ quá thời gian cho phép"""
+
+    def __init__(self, name: str, reason: str):
+        super().__init__(f"Agent {name} đang quá tải ({reason})")
+        self.name = name
+        self.reason = reason
+
+
+class Bulkhead:
+    """
+    Giới hạn số lượt chạy LLM đồng thời của một agent: tối đa `limit` lượt chạy cùng lúc, tối đa
+    `max_queue` lượt chờ, mỗi lượt chờ tối đa `max_wait` giây. Vượt giới hạn thì từ chối ngay
+    (BulkheadRejected) thay vì để request treo tới khi timeout.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.wait = LatencyTracker()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Chờ tới lượt chạy (hoặc bị từ chối), giữ chỗ trong suốt khối lệnh"""
+        started_at = time.perf_counter()
+        # Còn người đang chờ thì xếp sau họ, kể cả khi vừa có chỗ trống (vào theo thứ tự đến)
+        if self._semaphore.locked() or self.waiting > 0:
+            if self.waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                print(f"[BULKHEAD] {self.name}: hàng đợi đầy ({self.waiting} lượt chờ), từ chối")
+                raise BulkheadRejected(self.name, "hàng đợi đầy")
+
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                self.wait.record("rejected_wait", time.perf_counter() - started_at)
+                print(f"[BULKHEAD] {self.name}: chờ quá {self.max_wait}s, từ chối")
+                raise BulkheadRejected(self.name, f"chờ quá {self.max_wait}s")
+            finally:
+                self.waiting -= 1
+        else:
+            # Còn chỗ: acquire trả về ngay, không xếp hàng
+            await self._semaphore.acquire()
+        self.wait.record("wait", time.perf_counter() - started_at)
+
+        self.admitted += 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Số lượt đang chạy, độ dài hàng đợi, số lượt bị từ chối và thời gian chờ"""
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "peak_queue_depth": self.peak_waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_seconds": self.wait.stats().get("wait"),
+            # Thời gian các lượt đã chờ trước khi bị từ chối vì quá max_wait
+            "rejected_wait_seconds": self.wait.stats().get("rejected_wait")
+        }
+
+
+class BulkheadRegistry:
+    """Mỗi agent một Bulkhead riêng để agent bị dồn tải (ví dụ product) không chiếm chỗ của agent khác (checkout)"""
+
+    def __init__(self, limits: Dict[str, int], default_limit: int, max_queue: int, max_wait: float,
+                 enabled: bool = True):
+        self.limits = limits
+        self.default_limit = default_limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self._bulkheads: Dict[str, Bulkhead] = {}
+
+    def get(self, name: str) -> Bulkhead:
+        bulkhead = self._bulkheads.get(name)
+        if bulkhead is None:
+            bulkhead = self._bulkheads[name] = Bulkhead(
+                name, self.limits.get(name, self.default_limit), self.max_queue, self.max_wait
+            )
+        return bulkhead
+
+    @asynccontextmanager
+    async def slot(self, name: str) -> AsyncIterator[None]:
+        """Giữ một chỗ chạy của agent `name` (không giới hạn nếu BULKHEAD_ENABLED tắt)"""
+        if not self.enabled:
+            yield
+            return
+        async with self.get(name).slot():
+            yield
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: bulkhead.stats() for name, bulkhead in self._bulkheads.items()}
+
+
+def _parse_limits(value: Optional[str]) -> Dict[str, int]:
+    """"product:10,checkout:5" -> {"product": 10, "checkout": 5}"""
+    limits = {}
+    for item in (value or "").split(","):
+        if ":" in item:
+            name, limit = item.split(":", 1)
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+# Singleton instance
+agent_bulkheads = BulkheadRegistry(
+    limits=_parse_limits(settings.BULKHEAD_LIMITS),
+    default_limit=settings.BULKHEAD_DEFAULT_LIMIT,
+    max_queue=settings.BULKHEAD_MAX_QUEUE,
+    max_wait=settings.BULKHEAD_MAX_QUEUE_TIME,
+    enabled=settings.BULKHEAD_ENABLED
+)
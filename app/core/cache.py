@@ -0,0 +1,80 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+import time
+
+
+class TTLCache:
+    """
+    Cache trong bộ nhớ có giới hạn kích thước (LRU) và thời gian sống (TTL) cho từng entry.
+
+    Cache chỉ dùng trong một event loop nên không cần khóa. Giá trị trả về được dùng chung
+    giữa các lần gọi, nơi sử dụng không được sửa trực tiếp.
+    """
+
+    def __init__(self, maxsize: int, default_ttl: float, name: str = "cache"):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self.name = name
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Lấy giá trị còn hạn theo key, đồng thời đánh dấu là vừa được sử dụng"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Lưu giá trị với TTL (giây), loại bỏ entry ít dùng nhất khi vượt kích thước"""
+        if self.maxsize <= 0:
+            return
+        ttl = self.default_ttl if ttl is None else ttl
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Xóa một entry"""
+        self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Xóa các entry có key thỏa điều kiện, trả về số entry đã xóa"""
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        """Xóa toàn bộ cache"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Thống kê hit/miss của cache"""
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
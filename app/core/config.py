@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 from pydantic import BaseModel, ConfigDict, Field
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Literal, Optional, Any
 from pydantic_settings import BaseSettings
 
 # Đảm bảo sử dụng đường dẫn tuyệt đối đến file .env
@@ -37,7 +37,40 @@ class Settings(BaseSettings):
     # Spring Boot API settings
     SPRING_BOOT_API_URL: str = Field(default="http://localhost:8081", validation_alias="SPRING_BOOT_API_URL")
     SPRING_BOOT_TOKEN: str = Field(default="", validation_alias="SPRING_BOOT_TOKEN")
-    
+
+    # Spring Boot HTTP connection pool (httpx.AsyncClient dùng chung)
+    SPRING_BOOT_MAX_CONNECTIONS: int = Field(default=100, validation_alias="SPRING_BOOT_MAX_CONNECTIONS")
+    SPRING_BOOT_MAX_KEEPALIVE_CONNECTIONS: int = Field(default=20, validation_alias="SPRING_BOOT_MAX_KEEPALIVE_CONNECTIONS")
+    SPRING_BOOT_KEEPALIVE_EXPIRY: float = Field(default=30.0, validation_alias="SPRING_BOOT_KEEPALIVE_EXPIRY")
+    SPRING_BOOT_CONNECT_TIMEOUT: float = Field(default=5.0, validation_alias="SPRING_BOOT_CONNECT_TIMEOUT")
+    SPRING_BOOT_READ_TIMEOUT: float = Field(default=15.0, validation_alias="SPRING_BOOT_READ_TIMEOUT")
+    SPRING_BOOT_COALESCE_READS: bool = Field(default=True, validation_alias="SPRING_BOOT_COALESCE_READS")
+    SPRING_BOOT_BULK_CONCURRENCY: int = Field(default=8, validation_alias="SPRING_BOOT_BULK_CONCURRENCY")
+
+    # Retry (chỉ GET) và circuit breaker cho Spring Boot API
+    SPRING_BOOT_RETRY_ATTEMPTS: int = Field(default=3, validation_alias="SPRING_BOOT_RETRY_ATTEMPTS")
+    SPRING_BOOT_RETRY_BACKOFF: float = Field(default=0.2, validation_alias="SPRING_BOOT_RETRY_BACKOFF")
+    SPRING_BOOT_RETRY_BUDGET_RATIO: float = Field(default=0.2, validation_alias="SPRING_BOOT_RETRY_BUDGET_RATIO")
+    SPRING_BOOT_RETRY_BUDGET_MIN_RETRIES: int = Field(default=10, validation_alias="SPRING_BOOT_RETRY_BUDGET_MIN_RETRIES")
+    SPRING_BOOT_BREAKER_FAILURE_THRESHOLD: int = Field(default=5, validation_alias="SPRING_BOOT_BREAKER_FAILURE_THRESHOLD")
+    SPRING_BOOT_BREAKER_RECOVERY_TIMEOUT: float = Field(default=30.0, validation_alias="SPRING_BOOT_BREAKER_RECOVERY_TIMEOUT")
+
+    # Cache đọc sản phẩm từ Spring Boot API (TTL tính bằng giây)
+    CATALOG_CACHE_ENABLED: bool = Field(default=True, validation_alias="CATALOG_CACHE_ENABLED")
+    CATALOG_CACHE_MAX_SIZE: int = Field(default=1000, validation_alias="CATALOG_CACHE_MAX_SIZE")
+    CATALOG_CACHE_TTL_PRODUCT: float = Field(default=300.0, validation_alias="CATALOG_CACHE_TTL_PRODUCT")
+    CATALOG_CACHE_TTL_SEARCH: float = Field(default=60.0, validation_alias="CATALOG_CACHE_TTL_SEARCH")
+    CATALOG_CACHE_TTL_CATEGORY: float = Field(default=300.0, validation_alias="CATALOG_CACHE_TTL_CATEGORY")
+    CATALOG_CACHE_TTL_PRICE_RANGE: float = Field(default=120.0, validation_alias="CATALOG_CACHE_TTL_PRICE_RANGE")
+    # Thời gian giữ ETag/Last-Modified sau khi entry hết hạn để revalidate bằng conditional GET
+    CATALOG_CACHE_VALIDATOR_TTL: float = Field(default=3600.0, validation_alias="CATALOG_CACHE_VALIDATOR_TTL")
+
+    # Đồng bộ toàn bộ catalog sang Vector DB theo từng trang
+    CATALOG_SYNC_PAGE_SIZE: int = Field(default=100, validation_alias="CATALOG_SYNC_PAGE_SIZE")
+    # Số trang tải trước trong lúc trang hiện tại được ghi (0 = tải tuần tự)
+    CATALOG_SYNC_PREFETCH_PAGES: int = Field(default=2, validation_alias="CATALOG_SYNC_PREFETCH_PAGES")
+    CATALOG_SYNC_CHUNK_SIZE: int = Field(default=200, validation_alias="CATALOG_SYNC_CHUNK_SIZE")
+
     # Vector DB settings
     VECTOR_DB_PATH: str = Field(default="./data/vector_db", validation_alias="VECTOR_DB_PATH")
     
@@ -47,6 +80,95 @@ class Settings(BaseSettings):
     # Chat settings
     MAX_TOKENS: int = Field(default=1024, validation_alias="MAX_TOKENS")
     TEMPERATURE: float = Field(default=0.7, validation_alias="TEMPERATURE")
+    # Cấu hình riêng từng agent (trống = dùng CHAT_MODEL, MAX_TOKENS, TEMPERATURE, AGENT_MAX_TURNS):
+    # Analyzer/Triage chỉ cần trả về một từ hoặc một lệnh handoff, Shop trả lời ngắn
+    AGENT_MAX_TURNS: int = Field(default=10, validation_alias="AGENT_MAX_TURNS")
+    ANALYZER_MODEL: Optional[str] = Field(default=None, validation_alias="ANALYZER_MODEL")
+    ANALYZER_MAX_TOKENS: Optional[int] = Field(default=16, validation_alias="ANALYZER_MAX_TOKENS")
+    ANALYZER_TEMPERATURE: Optional[float] = Field(default=0.0, validation_alias="ANALYZER_TEMPERATURE")
+    ANALYZER_MAX_TURNS: Optional[int] = Field(default=1, validation_alias="ANALYZER_MAX_TURNS")
+    MANAGER_MODEL: Optional[str] = Field(default=None, validation_alias="MANAGER_MODEL")
+    MANAGER_MAX_TOKENS: Optional[int] = Field(default=None, validation_alias="MANAGER_MAX_TOKENS")
+    MANAGER_TEMPERATURE: Optional[float] = Field(default=None, validation_alias="MANAGER_TEMPERATURE")
+    MANAGER_MAX_TURNS: Optional[int] = Field(default=None, validation_alias="MANAGER_MAX_TURNS")
+    TRIAGE_MODEL: Optional[str] = Field(default=None, validation_alias="TRIAGE_MODEL")
+    TRIAGE_MAX_TOKENS: Optional[int] = Field(default=64, validation_alias="TRIAGE_MAX_TOKENS")
+    TRIAGE_TEMPERATURE: Optional[float] = Field(default=0.0, validation_alias="TRIAGE_TEMPERATURE")
+    TRIAGE_MAX_TURNS: Optional[int] = Field(default=None, validation_alias="TRIAGE_MAX_TURNS")
+    PRODUCT_MODEL: Optional[str] = Field(default=None, validation_alias="PRODUCT_MODEL")
+    PRODUCT_MAX_TOKENS: Optional[int] = Field(default=None, validation_alias="PRODUCT_MAX_TOKENS")
+    PRODUCT_TEMPERATURE: Optional[float] = Field(default=None, validation_alias="PRODUCT_TEMPERATURE")
+    PRODUCT_MAX_TURNS: Optional[int] = Field(default=None, validation_alias="PRODUCT_MAX_TURNS")
+    CART_MODEL: Optional[str] = Field(default=None, validation_alias="CART_MODEL")
+    CART_MAX_TOKENS: Optional[int] = Field(default=None, validation_alias="CART_MAX_TOKENS")
+    CART_TEMPERATURE: Optional[float] = Field(default=None, validation_alias="CART_TEMPERATURE")
+    CART_MAX_TURNS: Optional[int] = Field(default=None, validation_alias="CART_MAX_TURNS")
+    SHOP_MODEL: Optional[str] = Field(default=None, validation_alias="SHOP_MODEL")
+    SHOP_MAX_TOKENS: Optional[int] = Field(default=400, validation_alias="SHOP_MAX_TOKENS")
+    SHOP_TEMPERATURE: Optional[float] = Field(default=None, validation_alias="SHOP_TEMPERATURE")
+    SHOP_MAX_TURNS: Optional[int] = Field(default=None, validation_alias="SHOP_MAX_TURNS")
+    CHECKOUT_MODEL: Optional[str] = Field(default=None, validation_alias="CHECKOUT_MODEL")
+    CHECKOUT_MAX_TOKENS: Optional[int] = Field(default=None, validation_alias="CHECKOUT_MAX_TOKENS")
+    CHECKOUT_TEMPERATURE: Optional[float] = Field(default=None, validation_alias="CHECKOUT_TEMPERATURE")
+    CHECKOUT_MAX_TURNS: Optional[int] = Field(default=None, validation_alias="CHECKOUT_MAX_TURNS")
+    SUMMARIZER_MODEL: Optional[str] = Field(default=None, validation_alias="SUMMARIZER_MODEL")
+    SUMMARIZER_MAX_TOKENS: Optional[int] = Field(default=400, validation_alias="SUMMARIZER_MAX_TOKENS")
+    SUMMARIZER_TEMPERATURE: Optional[float] = Field(default=0.2, validation_alias="SUMMARIZER_TEMPERATURE")
+    SUMMARIZER_MAX_TURNS: Optional[int] = Field(default=1, validation_alias="SUMMARIZER_MAX_TURNS")
+
+    # Giới hạn số lượt chạy đồng thời của từng agent ("agent:số lượt", agent không có trong danh sách dùng
+    # BULKHEAD_DEFAULT_LIMIT). Lượt chạy vượt giới hạn xếp hàng tối đa BULKHEAD_MAX_QUEUE lượt và
+    # BULKHEAD_MAX_QUEUE_TIME giây, sau đó bị từ chối ngay với thông báo hệ thống đang quá tải
+    BULKHEAD_ENABLED: bool = Field(default=True, validation_alias="BULKHEAD_ENABLED")
+    BULKHEAD_LIMITS: str = Field(
+        default="analyzer:20,manager:10,triage:20,product:10,cart:10,shop:10,checkout:10,summarizer:2",
+        validation_alias="BULKHEAD_LIMITS"
+    )
+    BULKHEAD_DEFAULT_LIMIT: int = Field(default=10, validation_alias="BULKHEAD_DEFAULT_LIMIT")
+    BULKHEAD_MAX_QUEUE: int = Field(default=50, validation_alias="BULKHEAD_MAX_QUEUE")
+    BULKHEAD_MAX_QUEUE_TIME: float = Field(default=5.0, validation_alias="BULKHEAD_MAX_QUEUE_TIME")
+
+    # Các agent chuyên biệt được bật (product, cart, shop, checkout), khởi tạo khi dùng lần đầu
+    ENABLED_AGENTS: str = Field(default="product,cart,shop,checkout", validation_alias="ENABLED_AGENTS")
+    # Khởi tạo sẵn các agent khi ứng dụng khởi động
+    AGENT_WARMUP: bool = Field(default=True, validation_alias="AGENT_WARMUP")
+    # Lịch sử hội thoại gửi cho agent: "items" (danh sách tin nhắn theo vai trò, tận dụng prompt caching)
+    # hoặc "text" (gộp thành một đoạn văn bản trong tin nhắn mới như trước)
+    HISTORY_MODE: Literal["items", "text"] = Field(default="items", validation_alias="HISTORY_MODE")
+    # Lịch sử gửi cho agent giới hạn theo số token; tin nhắn cũ hơn được gộp vào bản tóm tắt của cuộc trò chuyện
+    # (MAX_MESSAGES: số tin nhắn tối đa đọc từ database, KEEP_RATIO: phần ngân sách giữ nguyên văn sau mỗi lần gộp)
+    HISTORY_TOKEN_BUDGET: int = Field(default=1500, validation_alias="HISTORY_TOKEN_BUDGET")
+    HISTORY_MAX_MESSAGES: int = Field(default=40, validation_alias="HISTORY_MAX_MESSAGES")
+    HISTORY_SUMMARY_ENABLED: bool = Field(default=True, validation_alias="HISTORY_SUMMARY_ENABLED")
+    HISTORY_SUMMARY_KEEP_RATIO: float = Field(default=0.5, validation_alias="HISTORY_SUMMARY_KEEP_RATIO")
+
+    # Routing: "two_step" (Analyzer rồi agent chuyên biệt) hoặc "handoff" (Triage handoff trong một lần run)
+    ROUTING_MODE: Literal["two_step", "handoff"] = Field(default="two_step", validation_alias="ROUTING_MODE")
+    # Routing: phân loại tin nhắn bằng luật từ khóa trước khi gọi agent Analyzer
+    ROUTING_FAST_PATH_ENABLED: bool = Field(default=True, validation_alias="ROUTING_FAST_PATH_ENABLED")
+    # Tầng thứ hai: so embedding của tin nhắn với centroid từng intent (app/routing/intent_examples.json)
+    ROUTING_CENTROID_ENABLED: bool = Field(default=True, validation_alias="ROUTING_CENTROID_ENABLED")
+    ROUTING_CENTROID_THRESHOLD: float = Field(default=0.45, validation_alias="ROUTING_CENTROID_THRESHOLD")
+    ROUTING_CENTROID_MIN_MARGIN: float = Field(default=0.05, validation_alias="ROUTING_CENTROID_MIN_MARGIN")
+    ROUTING_CENTROIDS_CACHE_PATH: str = Field(default="./data/intent_centroids.json", validation_alias="ROUTING_CENTROIDS_CACHE_PATH")
+    # Cache quyết định routing theo tin nhắn đã chuẩn hóa (TTL tính bằng giây)
+    ROUTING_CACHE_ENABLED: bool = Field(default=True, validation_alias="ROUTING_CACHE_ENABLED")
+    ROUTING_CACHE_MAX_SIZE: int = Field(default=5000, validation_alias="ROUTING_CACHE_MAX_SIZE")
+    ROUTING_CACHE_TTL: float = Field(default=3600.0, validation_alias="ROUTING_CACHE_TTL")
+    # Trả lời trực tiếp câu hỏi thường gặp về cửa hàng bằng embedding (không gọi LLM)
+    FAQ_ENABLED: bool = Field(default=True, validation_alias="FAQ_ENABLED")
+    FAQ_THRESHOLD: float = Field(default=0.7, validation_alias="FAQ_THRESHOLD")
+    FAQ_MIN_MARGIN: float = Field(default=0.03, validation_alias="FAQ_MIN_MARGIN")
+    FAQ_EMBEDDINGS_CACHE_PATH: str = Field(default="./data/faq_embeddings.json", validation_alias="FAQ_EMBEDDINGS_CACHE_PATH")
+    # Tìm kiếm sản phẩm song song với routing (WAIT: số giây tối đa chờ kết quả khi route là product)
+    SPECULATIVE_RETRIEVAL_ENABLED: bool = Field(default=True, validation_alias="SPECULATIVE_RETRIEVAL_ENABLED")
+    SPECULATIVE_RETRIEVAL_LIMIT: int = Field(default=5, validation_alias="SPECULATIVE_RETRIEVAL_LIMIT")
+    SPECULATIVE_RETRIEVAL_WAIT: float = Field(default=2.0, validation_alias="SPECULATIVE_RETRIEVAL_WAIT")
+    # Cache câu trả lời của product agent theo độ tương đồng câu hỏi (bị xóa mỗi lần /sync, /auto-sync)
+    ANSWER_CACHE_ENABLED: bool = Field(default=True, validation_alias="ANSWER_CACHE_ENABLED")
+    ANSWER_CACHE_THRESHOLD: float = Field(default=0.92, validation_alias="ANSWER_CACHE_THRESHOLD")
+    ANSWER_CACHE_MAX_SIZE: int = Field(default=500, validation_alias="ANSWER_CACHE_MAX_SIZE")
+    ANSWER_CACHE_TTL: float = Field(default=1800.0, validation_alias="ANSWER_CACHE_TTL")
 
     # MySQL Database URL
     DB_HOST: str = Field(default="localhost", validation_alias="DB_HOST")
@@ -1,17 +1,33 @@
 from agents import AgentHooks, Agent, Tool, RunContextWrapper
+from collections import OrderedDict
 from typing import Any
+import time
+
+from .metrics import agent_latency, agent_token_usage
 
 class CustomAgentHooks(AgentHooks):
     def __init__(self, display_name: str):
         self.event_counter = 0
         self.display_name = display_name
+        # Thời điểm bắt đầu theo lần run (id của context), hooks được dùng chung giữa các request.
+        # Giới hạn kích thước vì run lỗi hoặc đã handoff sang agent khác không gọi on_end
+        self._started_at: "OrderedDict[int, float]" = OrderedDict()
 
     async def on_start(self, context: RunContextWrapper, agent: Agent) -> None:
         self.event_counter += 1
+        self._started_at[id(context)] = time.perf_counter()
+        if len(self._started_at) > 1000:
+            self._started_at.popitem(last=False)
         print(f"### ({self.display_name}) {self.event_counter}: Agent {agent.name} started")
 
     async def on_end(self, context: RunContextWrapper, agent: Agent, output: Any) -> None:
         self.event_counter += 1
+        # Usage của cả lần run (kể cả agent đã handoff sang agent này), tính cho agent trả lời cuối
+        label = self.display_name.lower()
+        agent_token_usage.record(label, getattr(context, "usage", None), agent.model if isinstance(agent.model, str) else None)
+        started_at = self._started_at.pop(id(context), None)
+        if started_at is not None:
+            agent_latency.record(label, time.perf_counter() - started_at)
         print(f"### ({self.display_name}) {self.event_counter}: Agent {agent.name} ended with output {output}")
 
     async def on_handoff(self, context: RunContextWrapper, agent: Agent, source: Agent) -> None:
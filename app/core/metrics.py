@@ -0,0 +1,131 @@
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+class LatencyTracker:
+    """
+    Ghi nhận thời gian xử lý theo nhãn (ví dụ chế độ routing, tên agent), giữ tối đa `window`
+    mẫu gần nhất của mỗi nhãn để tính percentile.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+
+    def record(self, label: str, seconds: float) -> None:
+        """Ghi nhận một mẫu thời gian (giây) cho nhãn"""
+        samples = self._samples.get(label)
+        if samples is None:
+            samples = self._samples[label] = deque(maxlen=self.window)
+        samples.append(seconds)
+        self._counts[label] = self._counts.get(label, 0) + 1
+
+    @staticmethod
+    def _percentile(ordered: list, percent: float) -> float:
+        index = min(int(round(percent / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+    def stats(self) -> Dict[str, Any]:
+        """Số mẫu, trung bình và p50/p95/p99 (giây) của từng nhãn"""
+        result = {}
+        for label, samples in self._samples.items():
+            ordered = sorted(samples)
+            result[label] = {
+                "count": self._counts[label],
+                "avg": round(sum(ordered) / len(ordered), 4),
+                "p50": round(self._percentile(ordered, 50), 4),
+                "p95": round(self._percentile(ordered, 95), 4),
+                "p99": round(self._percentile(ordered, 99), 4)
+            }
+        return result
+
+
+def run_total_tokens(result: Any) -> int:
+    """Tổng số token (input + output) của một lần run Agents SDK, 0 nếu không có thông tin usage"""
+    usage = getattr(getattr(result, "context_wrapper", None), "usage", None)
+    return getattr(usage, "total_tokens", 0) or 0
+
+
+# Giá model (USD / 1 triệu token): input, input lấy từ prompt cache, output. Model có tên bắt đầu
+# bằng khóa (ví dụ bản snapshot "gpt-4o-mini-2024-07-18") dùng giá của khóa dài nhất khớp
+MODEL_PRICES: Dict[str, Dict[str, float]] = {
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+    "gpt-4.1-nano": {"input": 0.10, "cached_input": 0.025, "output": 0.40},
+    "gpt-4.1-mini": {"input": 0.40, "cached_input": 0.10, "output": 1.60},
+    "gpt-4.1": {"input": 2.00, "cached_input": 0.50, "output": 8.00},
+    "o4-mini": {"input": 1.10, "cached_input": 0.275, "output": 4.40},
+    "gpt-3.5-turbo": {"input": 0.50, "cached_input": 0.50, "output": 1.50},
+}
+
+
+def model_price(model: Optional[str]) -> Optional[Dict[str, float]]:
+    """Giá của model theo MODEL_PRICES, None nếu không biết"""
+    matches = [key for key in MODEL_PRICES if model and model.startswith(key)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+def _cached_input_tokens(usage: Any) -> int:
+    details = getattr(usage, "input_tokens_details", None)
+    if isinstance(details, dict):
+        return details.get("cached_tokens", 0) or 0
+    return getattr(details, "cached_tokens", 0) or 0
+
+
+class TokenUsageTracker:
+    """
+    Cộng dồn token theo nhãn (tên agent): input, phần input được provider lấy từ prompt cache,
+    output. Tỉ lệ cached cho thấy hiệu quả của việc giữ nguyên phần đầu prompt giữa các lượt.
+    """
+
+    def __init__(self):
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self._models: Dict[str, str] = {}
+
+    def record(self, label: str, usage: Any, model: Optional[str] = None) -> None:
+        """Ghi nhận usage (agents.Usage) của một lần run và model đã dùng (để ước tính chi phí)"""
+        if usage is None:
+            return
+        totals = self._totals.setdefault(label, {
+            "runs": 0, "requests": 0, "input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0
+        })
+        if model:
+            self._models[label] = model
+        totals["runs"] += 1
+        totals["requests"] += getattr(usage, "requests", 0) or 0
+        totals["input_tokens"] += getattr(usage, "input_tokens", 0) or 0
+        totals["cached_input_tokens"] += _cached_input_tokens(usage)
+        totals["output_tokens"] += getattr(usage, "output_tokens", 0) or 0
+
+    def _cost(self, label: str, totals: Dict[str, int]) -> Optional[float]:
+        price = model_price(self._models.get(label))
+        if price is None:
+            return None
+        uncached = totals["input_tokens"] - totals["cached_input_tokens"]
+        return (
+            uncached * price["input"]
+            + totals["cached_input_tokens"] * price["cached_input"]
+            + totals["output_tokens"] * price["output"]
+        ) / 1_000_000
+
+    def stats(self) -> Dict[str, Any]:
+        """Tổng token, tỉ lệ input token được cache và chi phí ước tính (USD) của từng nhãn"""
+        result = {}
+        for label, totals in self._totals.items():
+            cost = self._cost(label, totals)
+            result[label] = {
+                **totals,
+                "model": self._models.get(label),
+                "cached_ratio": round(totals["cached_input_tokens"] / totals["input_tokens"], 4)
+                if totals["input_tokens"] else 0.0,
+                "cost_usd": round(cost, 6) if cost is not None else None,
+                "cost_per_run_usd": round(cost / totals["runs"], 6) if cost is not None and totals["runs"] else None
+            }
+        return result
+
+
+# Singleton instance
+agent_token_usage = TokenUsageTracker()
+# Thời gian xử lý của từng agent (từ khi agent bắt đầu tới khi trả lời, kể cả gọi tool)
+agent_latency = LatencyTracker()
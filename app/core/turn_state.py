@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional
+
+
+@dataclass
+class TurnState:
+    """
+    Trạng thái dùng chung trong một lượt xử lý của agent (một lần Runner.run).
+
+    Các tool của cùng một lượt chạy trong các task khác nhau nhưng cùng tham chiếu tới
+    một đối tượng TurnState, nên dữ liệu ghi ở tool này được tool sau nhìn thấy.
+    """
+    # Giỏ hàng mới nhất đã biết trong lượt (None = chưa có hoặc đã cũ)
+    cart: Optional[Dict[str, Any]] = None
+    # Kết quả (task) của các tool chỉ đọc đã gọi trong lượt, theo (tên tool, tham số)
+    memo: Dict[Any, Any] = field(default_factory=dict)
+
+
+_current_turn: ContextVar[Optional[TurnState]] = ContextVar("turn_state", default=None)
+
+
+def current_turn() -> Optional[TurnState]:
+    """Lấy trạng thái của lượt hiện tại (None nếu đang ở ngoài turn_scope)"""
+    return _current_turn.get()
+
+
+@contextmanager
+def turn_scope(**initial: Any) -> Iterator[TurnState]:
+    """
+    Mở một lượt xử lý mới, các tool chạy bên trong dùng chung TurnState trả về
+
+    Args:
+        **initial: Giá trị khởi tạo cho các trường của TurnState (ví dụ cart đã lấy trước)
+    """
+    state = TurnState(**initial)
+    reset_token = _current_turn.set(state)
+    try:
+        yield state
+    finally:
+        _current_turn.reset(reset_token)
@@ -1,3 +1,4 @@
+from sqlalchemy import inspect, text
 from sqlmodel import SQLModel, create_engine, Session
 from app.core.config import settings
 import logging
@@ -31,6 +32,84 @@ engine = create_engine(
 )
 
 
+# Cột được thêm sau khi bảng đã tồn tại (create_all không thêm cột vào bảng cũ): (bảng, cột, kiểu SQL)
+ADDED_COLUMNS = [
+    ("conversation", "summary", "TEXT"),
+    ("conversation", "summary_until_seq", "INTEGER"),
+    ("message", "token_count", "INTEGER"),
+    ("message", "seq", "INTEGER"),
+]
+
+
+def migrate_added_columns():
+    """Thêm các cột trong ADDED_COLUMNS còn thiếu vào bảng đã có"""
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table, column, column_type in ADDED_COLUMNS:
+            existing = {col["name"] for col in inspector.get_columns(table)}
+            if column not in existing:
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+                logger.info(f"Đã thêm cột {table}.{column}")
+
+
+def backfill_message_seq():
+    """Đánh số seq cho các tin nhắn lưu trước khi có cột seq (theo created_at, cùng giây thì theo id)"""
+    with engine.begin() as connection:
+        rows = connection.execute(text(
+            "SELECT id, conversation_id FROM message WHERE seq IS NULL ORDER BY conversation_id, created_at, id"
+        )).all()
+        next_seq = {}
+        for message_id, conversation_id in rows:
+            if conversation_id not in next_seq:
+                last = connection.execute(
+                    text("SELECT MAX(seq) FROM message WHERE conversation_id = :conversation_id"),
+                    {"conversation_id": conversation_id}
+                ).scalar()
+                next_seq[conversation_id] = (last or 0) + 1
+            connection.execute(
+                text("UPDATE message SET seq = :seq WHERE id = :id"),
+                {"seq": next_seq[conversation_id], "id": message_id}
+            )
+            next_seq[conversation_id] += 1
+        if rows:
+            logger.info(f"Đã đánh số seq cho {len(rows)} tin nhắn")
+
+
+MESSAGE_SEQ_INDEX = "uq_message_conversation_seq"
+
+
+def renumber_duplicate_message_seq():
+    """Đánh số lại các cuộc trò chuyện có seq trùng (ghi đồng thời trước khi có unique index), giữ nguyên thứ tự"""
+    with engine.begin() as connection:
+        conversation_ids = [row[0] for row in connection.execute(text(
+            "SELECT DISTINCT conversation_id FROM message WHERE seq IS NOT NULL "
+            "GROUP BY conversation_id, seq HAVING COUNT(*) > 1"
+        ))]
+        for conversation_id in conversation_ids:
+            message_ids = connection.execute(
+                text("SELECT id FROM message WHERE conversation_id = :conversation_id ORDER BY seq, created_at, id"),
+                {"conversation_id": conversation_id}
+            ).scalars().all()
+            for seq, message_id in enumerate(message_ids, start=1):
+                connection.execute(
+                    text("UPDATE message SET seq = :seq WHERE id = :id"),
+                    {"seq": seq, "id": message_id}
+                )
+        if conversation_ids:
+            logger.info(f"Đã đánh số lại seq cho {len(conversation_ids)} cuộc trò chuyện bị trùng")
+
+
+def create_message_seq_index():
+    """Tạo unique index (conversation_id, seq) cho bảng message đã có từ trước (create_all không thêm index vào bảng cũ)"""
+    inspector = inspect(engine)
+    existing = {index["name"] for index in inspector.get_indexes("message")}
+    if MESSAGE_SEQ_INDEX not in existing:
+        renumber_duplicate_message_seq()
+        with engine.begin() as connection:
+            connection.execute(text(f"CREATE UNIQUE INDEX {MESSAGE_SEQ_INDEX} ON message (conversation_id, seq)"))
+        logger.info(f"Đã tạo index {MESSAGE_SEQ_INDEX}")
+
+
 def create_db_and_tables():
     """Khởi tạo database và tạo bảng"""
     max_retries = 5
@@ -40,6 +119,9 @@ def create_db_and_tables():
         try:
             logger.info("Tạo các bảng SQL...")
             SQLModel.metadata.create_all(engine)
+            migrate_added_columns()
+            backfill_message_seq()
+            create_message_seq_index()
             logger.info("Các bảng đã được tạo thành công!")
             break
         except Exception as e:
@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 from typing import Optional
 from datetime import datetime
@@ -12,12 +13,24 @@ class Conversation(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
     meta_data: Optional[str] = Field(default="{}")  # JSON string
+    # Tóm tắt các tin nhắn cũ (seq đến hết summary_until_seq) thay cho chúng trong lịch sử gửi cho agent
+    summary: Optional[str] = None
+    summary_until_seq: Optional[int] = None
 
 
 class Message(SQLModel, table=True):
+    # seq là duy nhất trong một cuộc trò chuyện: hai request ghi cùng lúc không thể lấy trùng số
+    __table_args__ = (
+        Index("uq_message_conversation_seq", "conversation_id", "seq", unique=True),
+    )
+
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
     conversation_id: str = Field(foreign_key="conversation.id")
     role: str  # "user" or "assistant"
     content: str
     created_at: datetime = Field(default_factory=datetime.now)
-    meta_data: Optional[str] = Field(default="{}")  # JSON string để lưu thông tin về tools, actions, v.v. 
\ No newline at end of file
+    meta_data: Optional[str] = Field(default="{}")  # JSON string để lưu thông tin về tools, actions, v.v.
+    token_count: Optional[int] = None  # Số token của content, tính một lần khi lưu
+    # Thứ tự tin nhắn trong cuộc trò chuyện (1, 2, 3...): created_at chỉ chính xác tới giây trên MySQL
+    # nên tin nhắn cùng giây không phân biệt được trước/sau
+    seq: Optional[int] = None 
\ No newline at end of file
@@ -1,5 +1,7 @@
-from sqlmodel import Session, select
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, func, select
 from app.db.models import Conversation, Message
+from app.memory.tokens import count_tokens
 from typing import List, Optional, Dict, Any
 import logging
 import datetime
@@ -8,6 +10,9 @@ import uuid
 
 logger = logging.getLogger(__name__)
 
+# Số lần thử lại khi hai request cùng lấy một seq (unique index (conversation_id, seq) từ chối bản ghi sau)
+ADD_MESSAGE_MAX_ATTEMPTS = 5
+
 
 class ConversationService:
     """Service to handle conversations and messages."""
@@ -46,26 +51,47 @@ class ConversationService:
         content: str, 
         metadata: Optional[Dict[str, Any]] = None
     ) -> Message:
-        """Add a message to a conversation."""
-        conversation = self.get_conversation(conversation_id)
-        if not conversation:
-            logger.error(f"Conversation {conversation_id} not found")
-            raise ValueError(f"Conversation {conversation_id} not found")
-        
-        # Cập nhật thời gian cập nhật của cuộc trò chuyện
-        conversation.updated_at = datetime.datetime.now()
-        self.session.add(conversation)
-        
-        # Tạo message mới
-        message = Message(
-            conversation_id=conversation_id,
-            role=role,
-            content=content,
-            created_at=datetime.datetime.now(),
-            meta_data=json.dumps(metadata) if metadata else "{}"
-        )
-        self.session.add(message)
-        self.session.commit()
+        """Add a message to a conversation.
+
+        seq is allocated as max(seq) + 1; a concurrent insert that took the same
+        seq is rejected by the unique index, in which case we retry with a fresh one.
+        """
+        for attempt in range(1, ADD_MESSAGE_MAX_ATTEMPTS + 1):
+            conversation = self.get_conversation(conversation_id)
+            if not conversation:
+                logger.error(f"Conversation {conversation_id} not found")
+                raise ValueError(f"Conversation {conversation_id} not found")
+            
+            # Cập nhật thời gian cập nhật của cuộc trò chuyện
+            conversation.updated_at = datetime.datetime.now()
+            self.session.add(conversation)
+            
+            # Tạo message mới (seq tiếp theo của cuộc trò chuyện)
+            last_seq = self.session.exec(
+                select(func.max(Message.seq)).where(Message.conversation_id == conversation_id)
+            ).first()
+            seq = (last_seq or 0) + 1
+            message = Message(
+                seq=seq,
+                conversation_id=conversation_id,
+                role=role,
+                content=content,
+                created_at=datetime.datetime.now(),
+                meta_data=json.dumps(metadata) if metadata else "{}",
+                token_count=count_tokens(content)
+            )
+            self.session.add(message)
+            try:
+                self.session.commit()
+                break
+            except IntegrityError:
+                self.session.rollback()
+                if attempt == ADD_MESSAGE_MAX_ATTEMPTS:
+                    raise
+                logger.warning(
+                    f"seq {seq} of conversation {conversation_id} was taken concurrently, "
+                    f"retrying ({attempt}/{ADD_MESSAGE_MAX_ATTEMPTS})"
+                )
         self.session.refresh(message)
         logger.info(f"Added message {message.id} to conversation {conversation_id}")
         return message
@@ -82,7 +108,7 @@ class ConversationService:
         """Get the most recent message in a conversation."""
         query = select(Message) \
             .where(Message.conversation_id == conversation_id) \
-            .order_by(Message.created_at.desc()) \
+            .order_by(Message.seq.desc()) \
             .limit(1)
         return self.session.exec(query).first()
 
@@ -93,10 +119,49 @@ class ConversationService:
             .order_by(Message.created_at.asc())
         return self.session.exec(query).all()
 
+    def get_recent_messages(
+        self,
+        conversation_id: str,
+        limit: int = 10,
+        after_seq: Optional[int] = None
+    ) -> List[Message]:
+        """Get the latest `limit` messages (optionally only those with seq > `after_seq`), oldest first."""
+        query = select(Message).where(Message.conversation_id == conversation_id)
+        if after_seq is not None:
+            query = query.where(Message.seq > after_seq)
+        query = query.order_by(Message.seq.desc()).limit(limit)
+        return list(reversed(self.session.exec(query).all()))
+
+    def get_messages_after(self, conversation_id: str, after_seq: Optional[int]) -> List[Message]:
+        """Get all messages with seq > `after_seq` (all messages if None), oldest first."""
+        query = select(Message).where(Message.conversation_id == conversation_id)
+        if after_seq is not None:
+            query = query.where(Message.seq > after_seq)
+        return self.session.exec(query.order_by(Message.seq.asc())).all()
+
+    def ensure_token_counts(self, messages: List[Message]) -> None:
+        """Count and store tokens of messages saved before token_count existed."""
+        missing = [message for message in messages if message.token_count is None]
+        for message in missing:
+            message.token_count = count_tokens(message.content)
+            self.session.add(message)
+        if missing:
+            self.session.commit()
+
+    def update_summary(self, conversation_id: str, summary: str, summary_until_seq: int) -> None:
+        """Store the rolling summary of all messages up to and including seq `summary_until_seq`."""
+        conversation = self.get_conversation(conversation_id)
+        if not conversation:
+            raise ValueError(f"Conversation {conversation_id} not found")
+        conversation.summary = summary
+        conversation.summary_until_seq = summary_until_seq
+        self.session.add(conversation)
+        self.session.commit()
+
     def get_conversation_history(self, conversation_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get the chat history for a conversation in a format suitable for OpenAI."""
-        messages = self.get_messages(conversation_id, limit)
+        """Get the latest `limit` messages of a conversation in a format suitable for OpenAI."""
+        messages = self.get_recent_messages(conversation_id, limit)
         return [
             {"role": message.role, "content": message.content}
             for message in messages
-        ] 
\ No newline at end of file
+        ]
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from typing import Any, Callable, DefaultDict, Dict, List, Optional
+from typing import Any, Callable, DefaultDict, Dict, List, Optional, Union
 import hashlib
 
+from ..core.config import settings
+from .tokens import count_tokens
+
+# Prefix of the rolling summary item (role "system") placed before the conversation history
+SUMMARY_PREFIX = "Tóm tắt phần hội thoại trước đó: "
+
 
 class MemoryManager:
     """Utility class to manage conversation memory with deduplication and events."""
@@ -65,6 +71,50 @@ class MemoryManager:
         """Fetch recent conversation history."""
         return self.conversation_service.get_conversation_history(conversation_id, limit)
 
+    def get_budgeted_history(
+        self,
+        conversation_id: str,
+        token_budget: int,
+        max_messages: int = 40,
+    ) -> List[Dict[str, Any]]:
+        """Fetch history bounded by a token budget: the rolling summary, then recent turns verbatim.
+
+        Messages not folded into the conversation summary yet are kept verbatim, newest first,
+        while they fit in what the summary leaves of the budget (the newest message is always
+        kept) and number at most `max_messages`. If they do not all fit, a "history_over_budget"
+        event is emitted so the summary can be extended in the background.
+        """
+        service = self.conversation_service
+        conversation = service.get_conversation(conversation_id)
+        summary = conversation.summary if conversation else None
+        # One extra row tells whether older unsummarized messages fall outside the window
+        messages = service.get_recent_messages(
+            conversation_id, max_messages + 1, after_seq=conversation.summary_until_seq if conversation else None
+        )
+        overflow = len(messages) > max_messages
+        if overflow:
+            messages = messages[1:]
+        service.ensure_token_counts(messages)
+
+        budget = token_budget - (count_tokens(summary) if summary else 0)
+        kept: List[Any] = []
+        used = 0
+        for message in reversed(messages):
+            if kept and used + message.token_count > budget:
+                break
+            kept.append(message)
+            used += message.token_count
+        kept.reverse()
+
+        if overflow or len(kept) < len(messages):
+            self._emit(
+                "history_over_budget",
+                {"conversation_id": conversation_id, "dropped": len(messages) - len(kept), "overflow": overflow},
+            )
+
+        history = [{"role": "system", "content": f"{SUMMARY_PREFIX}{summary}"}] if summary else []
+        return history + [{"role": message.role, "content": message.content} for message in kept]
+
     @staticmethod
     def build_prompt(message: str, conversation_history: List[Dict[str, Any]]) -> str:
         """Combine message with recent history to create a prompt."""
@@ -72,8 +122,66 @@ class MemoryManager:
             return message
 
         history_text = ""
-        for msg in conversation_history[-5:]:
+        for msg in conversation_history:
+            if msg["role"] == "system":
+                history_text += f"{msg['content']}\n"
+                continue
             role = "Người dùng" if msg["role"] == "user" else "Trợ lý"
             history_text += f"{role}: {msg['content']}\n"
 
         return f"Lịch sử hội thoại gần đây:\n{history_text}\nNgười dùng hiện tại: {message}"
+
+    @staticmethod
+    def prior_history(
+        conversation_history: Optional[List[Dict[str, Any]]], raw_message: str
+    ) -> List[Dict[str, Any]]:
+        """History without the current user turn.
+
+        The current message is saved before history is loaded, so the last history item is
+        usually the raw message itself; agents may send an augmented version of it (prefetched
+        products, cart context), so the comparison uses the raw text.
+        """
+        history = [
+            {"role": msg["role"], "content": msg["content"]}
+            for msg in conversation_history or []
+            if msg.get("role") in ("system", "user", "assistant") and msg.get("content")
+        ]
+        if history and history[-1]["role"] == "user" and history[-1]["content"].strip() == raw_message.strip():
+            history.pop()
+        return history
+
+    @staticmethod
+    def build_input_items(
+        message: str,
+        conversation_history: List[Dict[str, Any]],
+        raw_message: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Build role-tagged input items: summary and prior turns (oldest first), then the new message.
+
+        Earlier turns keep the same items and order from turn to turn, so the prompt prefix
+        (instructions, tools, older history) stays identical and can be served from the
+        provider's prompt cache; only the newest items are uncached. `raw_message` is the
+        user's text as stored when `message` carries extra per-turn context.
+        """
+        history = MemoryManager.prior_history(conversation_history, raw_message or message)
+        return history + [{"role": "user", "content": message}]
+
+    @staticmethod
+    def build_input(
+        message: str,
+        conversation_history: Optional[List[Dict[str, Any]]],
+        mode: Optional[str] = None,
+        raw_message: Optional[str] = None,
+    ) -> Union[str, List[Dict[str, Any]]]:
+        """Agent input for the configured HISTORY_MODE ("items" or legacy "text" prompt).
+
+        Pass `raw_message` (the user's text as stored) when `message` is augmented with
+        per-turn context, so the stored copy of the current turn is not sent a second time.
+        """
+        if not conversation_history:
+            return message
+        if (mode or settings.HISTORY_MODE) == "items":
+            return MemoryManager.build_input_items(message, conversation_history, raw_message)
+        return MemoryManager.build_prompt(
+            message, MemoryManager.prior_history(conversation_history, raw_message or message)
+        )
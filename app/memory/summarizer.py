@@ -0,0 +1,139 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from agents import Agent
+from sqlmodel import Session
+
+from ..agents.profiles import agent_profile
+from ..agents.runner import run_agent
+from ..core.config import settings
+from ..core.hooks import CustomAgentHooks
+from ..db.database import engine
+from ..db.models import Message
+from ..db.services import ConversationService
+from ..prompts.summarizer import SUMMARIZER_PROMPT
+
+
+class ConversationSummarizer:
+    """
+    Gộp các tin nhắn cũ của cuộc trò chuyện vào bản tóm tắt lưu trên Conversation, chạy nền
+    khi lịch sử chưa tóm tắt vượt ngân sách token (sự kiện "history_over_budget" của MemoryManager).
+
+    Mỗi lần gộp, các tin nhắn cũ nhất được gộp tới khi phần còn lại không quá `keep_ratio` ngân sách
+    (cả số token lẫn số tin nhắn `max_messages`),
+    nên bản tóm tắt và phần đầu lịch sử giữ nguyên qua nhiều lượt sau đó (prompt caching vẫn hiệu quả)
+    thay vì thay đổi ở mỗi lượt. Hai tin nhắn gần nhất luôn được giữ nguyên văn.
+    """
+
+    def __init__(self, token_budget: int, max_messages: int = 40, keep_ratio: float = 0.5):
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.keep_ratio = keep_ratio
+        self._agent: Optional[Agent] = None
+        # Cuộc trò chuyện đang được tóm tắt (mỗi cuộc trò chuyện chỉ một task tại một thời điểm)
+        self._running: set = set()
+        self._tasks: set = set()
+        self.runs = 0
+        self.folded_messages = 0
+        self.failures = 0
+        self.seconds = 0.0
+
+    def _get_agent(self) -> Agent:
+        if self._agent is None:
+            profile = agent_profile("summarizer")
+            self._agent = Agent(
+                name="Summarizer",
+                instructions=SUMMARIZER_PROMPT,
+                model=profile.model,
+                model_settings=profile.model_settings(),
+                hooks=CustomAgentHooks("Summarizer")
+            )
+        return self._agent
+
+    def schedule(self, conversation_id: str) -> None:
+        """Tóm tắt trong task nền (bỏ qua nếu cuộc trò chuyện đang được tóm tắt)"""
+        if conversation_id in self._running:
+            return
+        self._running.add(conversation_id)
+        task = asyncio.create_task(self._summarize(conversation_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _messages_to_fold(self, messages: List[Message]) -> List[Message]:
+        """Các tin nhắn cũ nhất cần gộp để phần còn lại không quá keep_ratio ngân sách (token và số tin nhắn)"""
+        target = self.token_budget * self.keep_ratio
+        max_kept = max(int(self.max_messages * self.keep_ratio), 2)
+        remaining = sum(message.token_count for message in messages)
+        fold = []
+        for message in messages[:-2]:
+            if remaining <= target and len(messages) - len(fold) <= max_kept:
+                break
+            fold.append(message)
+            remaining -= message.token_count
+        return fold
+
+    async def _fold(self, summary: Optional[str], messages: List[Message]) -> str:
+        lines = "\n".join(
+            f"{'Người dùng' if message.role == 'user' else 'Trợ lý'}: {message.content}" for message in messages
+        )
+        prompt = (f"Bản tóm tắt hiện tại:\n{summary}\n\n" if summary else "") + f"Các tin nhắn tiếp theo:\n{lines}"
+        result = await run_agent(self._get_agent(), prompt, agent_profile("summarizer"))
+        return str(result.final_output).strip()
+
+    async def _summarize(self, conversation_id: str) -> None:
+        started_at = time.perf_counter()
+        try:
+            # Session riêng, đóng trước khi gọi LLM
+            with Session(engine) as session:
+                service = ConversationService(session)
+                conversation = service.get_conversation(conversation_id)
+                if conversation is None:
+                    return
+                summary, summary_until_seq = conversation.summary, conversation.summary_until_seq
+                messages = service.get_messages_after(conversation_id, summary_until_seq)
+                service.ensure_token_counts(messages)
+                fold = self._messages_to_fold(messages)
+                if not fold:
+                    return
+                fold_until_seq = fold[-1].seq
+
+            new_summary = await self._fold(summary, fold)
+
+            with Session(engine) as session:
+                service = ConversationService(session)
+                conversation = service.get_conversation(conversation_id)
+                # Một worker khác đã cập nhật bản tóm tắt trong lúc chờ LLM: giữ bản của worker đó
+                if conversation is None or conversation.summary_until_seq != summary_until_seq:
+                    return
+                service.update_summary(conversation_id, new_summary, fold_until_seq)
+
+            self.runs += 1
+            self.folded_messages += len(fold)
+            self.seconds += time.perf_counter() - started_at
+            print(f"[SUMMARY] Đã gộp {len(fold)} tin nhắn của cuộc trò chuyện {conversation_id} "
+                  f"({time.perf_counter() - started_at:.2f}s)")
+        except Exception as e:
+            self.failures += 1
+            print(f"[SUMMARY] Lỗi khi tóm tắt cuộc trò chuyện {conversation_id}: {str(e)}")
+        finally:
+            self._running.discard(conversation_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Số lần tóm tắt, số tin nhắn đã gộp và thời gian tóm tắt trung bình"""
+        return {
+            "token_budget": self.token_budget,
+            "runs": self.runs,
+            "running": len(self._running),
+            "folded_messages": self.folded_messages,
+            "failures": self.failures,
+            "avg_seconds": round(self.seconds / self.runs, 3) if self.runs else 0.0
+        }
+
+
+# Singleton instance
+conversation_summarizer = ConversationSummarizer(
+    token_budget=settings.HISTORY_TOKEN_BUDGET,
+    max_messages=settings.HISTORY_MAX_MESSAGES,
+    keep_ratio=settings.HISTORY_SUMMARY_KEEP_RATIO
+)
@@ -0,0 +1,37 @@
+from functools import lru_cache
+from typing import Any, Optional
+
+import tiktoken
+
+from ..core.config import settings
+
+# Token thêm cho mỗi tin nhắn (vai trò và định dạng của tin nhắn trong prompt)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Optional[Any]:
+    """Encoding của CHAT_MODEL (o200k_base nếu tiktoken chưa biết model), None nếu không tải được"""
+    try:
+        return tiktoken.encoding_for_model(settings.CHAT_MODEL)
+    except KeyError:
+        pass
+    except Exception as e:
+        print(f"[TOKENS] Không thể tải encoding của {settings.CHAT_MODEL}: {str(e)}")
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"[TOKENS] Không thể tải encoding o200k_base, ước lượng số token theo độ dài: {str(e)}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Số token của một tin nhắn (kể cả phần định dạng), ước lượng theo độ dài nếu không có encoding"""
+    if not text:
+        return MESSAGE_OVERHEAD_TOKENS
+    encoding = _encoding()
+    if encoding is None:
+        # Tiếng Việt có dấu trung bình khoảng 3 ký tự một token
+        return len(text) // 3 + 1 + MESSAGE_OVERHEAD_TOKENS
+    return len(encoding.encode(text, disallowed_special=())) + MESSAGE_OVERHEAD_TOKENS
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 
 
 class ChatRequest(BaseModel):
@@ -11,6 +11,8 @@ class ChatRequest(BaseModel):
     thread_title: Optional[str] = None
     user_id: Optional[str] = None
     auth_token: Optional[str] = None
+    # Ghi đè ROUTING_MODE cho request này (so sánh A/B): two_step hoặc handoff
+    routing_mode: Optional[Literal["two_step", "handoff"]] = None
 
 
 class ChatResponse(BaseModel):
@@ -84,4 +86,5 @@ class AutoSyncRequest(BaseModel):
     Request model for auto-synchronization API
     """
     type: str
-    limit: Optional[int] = 100 
\ No newline at end of file
+    limit: Optional[int] = None  # None = đồng bộ toàn bộ catalog
+    page_size: Optional[int] = None  # None = dùng CATALOG_SYNC_PAGE_SIZE
\ No newline at end of file
@@ -68,6 +68,7 @@ Bạn có nhiệm vụ sau:
 ### Khi khách yêu cầu thông tin chi tiết về một bánh cụ thể:
 - Sử dụng `get_product_by_id` nếu biết id của bánh
 - Hoặc dùng `rag_product_search` với tên chính xác của bánh
+- Khi cần thông tin của nhiều bánh đã biết id (ví dụ để so sánh), dùng `get_products_by_ids` một lần thay vì gọi `get_product_by_id` nhiều lần
 
 ## So sánh bánh
 
@@ -0,0 +1,217 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ..core.config import settings
+from ..routing.centroid_classifier import _dot, _normalize
+from ..routing.route_cache import normalize_message
+
+# Từ chỉ ngữ cảnh trước đó ("cái đó", "bánh này", "nó"...): câu trả lời phụ thuộc lịch sử nên không dùng lại được
+_CONTEXT_DEPENDENT = re.compile(r"\b(đó|này|kia|nó|ấy|vừa rồi|vừa nãy|ở trên|lúc nãy|cái đầu|cái thứ)\b")
+
+
+@dataclass
+class CachedAnswer:
+    """Một câu trả lời của product agent đã lưu"""
+    message: str
+    vector: List[float]
+    answer: str
+    source_documents: List[Dict[str, Any]]
+    catalog_version: int
+    created_at: float
+    # Thời gian xử lý (giây) và số token của lần trả lời gốc, dùng để tính phần tiết kiệm được
+    elapsed: float
+    total_tokens: int
+
+
+class SemanticAnswerCache:
+    """
+    Cache câu trả lời của product agent theo độ tương đồng embedding của câu hỏi.
+
+    Câu hỏi mới được trả lời bằng câu trả lời (kèm source_documents) của câu hỏi cũ gần nhất
+    nếu độ tương đồng đạt `threshold`. Mỗi entry gắn với phiên bản catalog tại thời điểm bắt đầu
+    trả lời; /sync và /auto-sync tăng phiên bản (xóa toàn bộ entry) nên giá/tồn kho cũ không
+    bao giờ được trả lại. Câu trả lời hoàn thành sau khi catalog đổi phiên bản cũng không được lưu.
+
+    Câu hỏi chỉ giống (không trùng khớp) còn phải nói về cùng sản phẩm: sản phẩm liên quan nhất
+    của câu hỏi mới (kết quả tìm kiếm) phải nằm trong source_documents của câu trả lời đã lưu, vì
+    "giá bánh tiramisu" và "giá bánh mousse" có embedding rất gần nhau.
+
+    Số entry bị giới hạn bởi `maxsize` (bỏ entry cũ nhất) vì mỗi lần tra cứu so sánh với mọi entry.
+    """
+
+    def __init__(self, maxsize: int = 500, ttl: float = 1800.0, threshold: float = 0.92):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.catalog_version = 1
+        # Key: tin nhắn đã chuẩn hóa (câu hỏi trùng khớp được trả lời không cần embedding)
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.entity_mismatches = 0
+        self.stores = 0
+        self.latency_saved = 0.0
+        self.tokens_saved = 0
+        # Task lưu câu trả lời đang chạy (giữ tham chiếu để task không bị thu hồi giữa chừng)
+        self._pending: set = set()
+
+    @staticmethod
+    def is_cacheable(message: str) -> bool:
+        """Câu hỏi tự đủ nghĩa (không nhắc tới sản phẩm/câu trả lời trước đó)"""
+        return not _CONTEXT_DEPENDENT.search(normalize_message(message))
+
+    def bump_catalog_version(self, reason: str = "") -> int:
+        """Đánh dấu catalog đã thay đổi: xóa mọi câu trả lời đã lưu, trả về phiên bản mới"""
+        self.catalog_version += 1
+        dropped = len(self._entries)
+        self._entries.clear()
+        print(f"[ANSWER-CACHE] Catalog version {self.catalog_version} ({reason}), đã xóa {dropped} câu trả lời")
+        return self.catalog_version
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl]:
+            del self._entries[key]
+
+    @staticmethod
+    def _same_entities(entry: CachedAnswer, query_product_ids: Optional[List[str]]) -> bool:
+        """Câu trả lời đã lưu nói về sản phẩm liên quan nhất của câu hỏi mới"""
+        if query_product_ids is None:
+            return False
+        answer_ids = {str(document["id"]) for document in entry.source_documents if document.get("id")}
+        if not query_product_ids:
+            return not answer_ids
+        return query_product_ids[0] in answer_ids
+
+    def _nearest(self, vector: List[float]) -> tuple:
+        best_key, best_score = None, -1.0
+        for key, entry in self._entries.items():
+            score = _dot(vector, entry.vector)
+            if score > best_score:
+                best_key, best_score = key, score
+        return best_key, best_score
+
+    async def lookup(
+        self,
+        message: str,
+        resolve_product_ids: Optional[Callable[[], Awaitable[Optional[List[str]]]]] = None
+    ) -> Optional[CachedAnswer]:
+        """
+        Câu trả lời đã lưu cho câu hỏi đủ giống `message` (cùng phiên bản catalog), ngược lại None
+
+        Args:
+            message: Câu hỏi của người dùng
+            resolve_product_ids: Trả về ID sản phẩm của câu hỏi theo thứ tự liên quan (None nếu chưa có),
+                chỉ được gọi khi câu hỏi đã lưu gần nhất không trùng khớp; không có thì chỉ dùng câu hỏi trùng khớp
+        """
+        started_at = time.perf_counter()
+        self._evict_expired()
+        key = normalize_message(message)
+        score = 1.0
+        exact = key in self._entries
+        if not exact and self._entries:
+            from .embeddings import embedding_provider
+
+            vector = _normalize(await asyncio.to_thread(embedding_provider.get_query_embedding, message))
+            nearest_key, score = self._nearest(vector)
+            if score >= self.threshold:
+                key = nearest_key
+
+        entry = self._entries.get(key)
+        if entry is None or entry.catalog_version != self.catalog_version:
+            self.misses += 1
+            return None
+
+        if not exact:
+            query_product_ids = await resolve_product_ids() if resolve_product_ids else None
+            if not self._same_entities(entry, query_product_ids):
+                self.misses += 1
+                self.entity_mismatches += 1
+                print(f"[ANSWER-CACHE] '{message[:50]}' ~ '{entry.message[:50]}' (score={score:.4f}) "
+                      f"nhưng khác sản phẩm, bỏ qua")
+                return None
+
+        self._entries.move_to_end(key)
+        lookup_seconds = time.perf_counter() - started_at
+        self.hits += 1
+        self.latency_saved += max(entry.elapsed - lookup_seconds, 0.0)
+        self.tokens_saved += entry.total_tokens
+        print(f"[ANSWER-CACHE] '{message[:50]}' -> '{entry.message[:50]}' (score={score:.4f}, "
+              f"{lookup_seconds * 1000:.0f}ms)")
+        return entry
+
+    async def store(
+        self,
+        message: str,
+        answer: str,
+        source_documents: List[Dict[str, Any]],
+        catalog_version: int,
+        elapsed: float,
+        total_tokens: int = 0
+    ) -> None:
+        """
+        Lưu câu trả lời; `catalog_version` là phiên bản lúc bắt đầu trả lời (bỏ qua nếu catalog đã đổi)
+        """
+        if not answer or catalog_version != self.catalog_version:
+            return
+        from .embeddings import embedding_provider
+
+        vector = _normalize(await asyncio.to_thread(embedding_provider.get_query_embedding, message))
+        if catalog_version != self.catalog_version:
+            return
+        key = normalize_message(message)
+        self._entries[key] = CachedAnswer(
+            message=message,
+            vector=vector,
+            answer=answer,
+            source_documents=source_documents,
+            catalog_version=catalog_version,
+            created_at=time.monotonic(),
+            elapsed=elapsed,
+            total_tokens=total_tokens
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        self.stores += 1
+
+    def store_in_background(self, *args: Any, **kwargs: Any) -> None:
+        """Lưu câu trả lời trong task nền để việc embedding câu hỏi không làm chậm response"""
+        task = asyncio.create_task(self._store_safely(*args, **kwargs))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _store_safely(self, *args: Any, **kwargs: Any) -> None:
+        try:
+            await self.store(*args, **kwargs)
+        except Exception as e:
+            print(f"[ANSWER-CACHE] Lỗi khi lưu câu trả lời: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Tỉ lệ hit, thời gian và token tiết kiệm được"""
+        total = self.hits + self.misses
+        return {
+            "catalog_version": self.catalog_version,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "entity_mismatches": self.entity_mismatches,
+            "stores": self.stores,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "latency_saved_seconds": round(self.latency_saved, 3),
+            "tokens_saved": self.tokens_saved,
+            "threshold": self.threshold
+        }
+
+
+# Singleton instance
+answer_cache = SemanticAnswerCache(
+    maxsize=settings.ANSWER_CACHE_MAX_SIZE,
+    ttl=settings.ANSWER_CACHE_TTL,
+    threshold=settings.ANSWER_CACHE_THRESHOLD
+)
@@ -1,8 +1,10 @@
 from langchain_openai import OpenAIEmbeddings
 from typing import List
+from ..core.cache import TTLCache
 from ..core.config import settings
 import logging
 import os
+import threading
 import traceback
 
 # Cấu hình logging
@@ -13,6 +15,10 @@ class EmbeddingProvider:
     Provider cho các embedding models - chỉ sử dụng OpenAI
     """
     def __init__(self):
+        # Embedding của các câu truy vấn gần đây: cùng một tin nhắn được FAQ, routing centroid
+        # và answer cache embed, chỉ gọi API một lần. Có lock vì được gọi qua asyncio.to_thread.
+        self._query_cache = TTLCache(maxsize=1024, default_ttl=600.0, name="query_embedding")
+        self._query_cache_lock = threading.Lock()
         self._init_model()
     
     def _init_model(self):
@@ -98,13 +104,25 @@ class EmbeddingProvider:
         """
         Lấy embedding vector cho một câu truy vấn
         """
+        with self._query_cache_lock:
+            cached = self._query_cache.get(text)
+        if cached is not None:
+            return cached
         try:
-            return self.model.embed_query(text)
+            embedding = self.model.embed_query(text)
+            with self._query_cache_lock:
+                self._query_cache.set(text, embedding)
+            return embedding
         except Exception as e:
             logger.error(f"Lỗi khi tạo query embedding: {str(e)}")
             print(f"[EMBEDDING] Lỗi khi tạo query embedding: {str(e)}")
             traceback.print_exc()
             raise
 
+    def query_cache_stats(self):
+        """Thống kê hit/miss của cache embedding câu truy vấn"""
+        with self._query_cache_lock:
+            return self._query_cache.stats()
+
 # Singleton instance
 embedding_provider = EmbeddingProvider() 
\ No newline at end of file
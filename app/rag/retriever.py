@@ -1,4 +1,5 @@
 from typing import List, Dict, Any
+import asyncio
 import logging
 from .vector_store import vector_store
 from ..client.spring_client import spring_boot_client
@@ -16,9 +17,14 @@ class ProductRetriever:
         logger.info(f"ProductRetriever khởi tạo với OpenAI model: {settings.OPENAI_EMBEDDING_MODEL}")
         print(f"[RETRIEVER] Khởi tạo với OpenAI embedding model: {settings.OPENAI_EMBEDDING_MODEL}")
     
-    def retrieve(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    async def retrieve(self, query: str, top_k: int = 5, api_fallback: bool = True) -> List[Dict[str, Any]]:
         """
         Truy xuất sản phẩm từ vector database và trả về kết quả
+
+        Args:
+            query: Câu truy vấn
+            top_k: Số sản phẩm tối đa
+            api_fallback: Vector database không có kết quả thì tìm theo tên sản phẩm qua Spring Boot API
         """
         # Làm phong phú query để cải thiện kết quả tìm kiếm
         enriched_query = self._enrich_query(query)
@@ -29,13 +35,18 @@ class ProductRetriever:
         print(f"[RETRIEVER] Query đã làm phong phú: '{enriched_query}'")
         
         # Tìm kiếm trong vector database với query đã làm phong phú
-        vector_results = self.vector_store.search(enriched_query, top_k)
+        # (embedding + Milvus là I/O đồng bộ nên chạy trong thread để không chặn event loop)
+        vector_results = await asyncio.to_thread(self.vector_store.search, enriched_query, top_k)
         
         # Nếu không có kết quả từ vector database, thử sử dụng Spring Boot API
         if not vector_results:
+            if not api_fallback:
+                return []
             logger.info("Không tìm thấy kết quả từ vector DB, sử dụng Spring Boot API")
             print(f"[RETRIEVER] Không tìm thấy kết quả từ vector DB, sử dụng Spring Boot API")
-            api_results = spring_boot_client.search_products(query, top_k)
+            # Spring Filter không nhận câu tự do: tìm theo tên sản phẩm
+            name = query.replace("'", " ").strip()
+            api_results = await spring_boot_client.search_products(f"name~'{name}'", page=1, size=top_k)
             return api_results
         
         logger.info(f"Tìm thấy {len(vector_results)} kết quả từ vector DB")
@@ -50,13 +61,13 @@ class ProductRetriever:
             return f"sản phẩm {query} thông tin chi tiết mô tả đặc điểm"
         return query
     
-    def get_product_by_id(self, product_id: str) -> Dict[str, Any]:
+    async def get_product_by_id(self, product_id: str) -> Dict[str, Any]:
         """
         Lấy thông tin chi tiết của sản phẩm theo ID
         """
         logger.info(f"Lấy thông tin sản phẩm ID: {product_id}")
         # Lấy thông tin từ Spring Boot API
-        return spring_boot_client.get_product_by_id(product_id)
+        return await spring_boot_client.get_product_by_id(product_id)
 
 # Singleton instance
 product_retriever = ProductRetriever()
\ No newline at end of file
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from .retriever import product_retriever
+
+
+class SpeculativeRetrieval:
+    """
+    Truy xuất sản phẩm chạy song song với bước routing.
+
+    Product agent hầu như luôn bắt đầu bằng rag_product_search, nên với tin nhắn có dấu hiệu là câu hỏi
+    sản phẩm (luật từ khóa, cache routing, centroid) việc tìm kiếm được bắt đầu ngay khi nhận tin nhắn,
+    chỉ trong vector database. Nếu route là product thì kết quả được đưa sẵn vào context của agent,
+    ngược lại task bị hủy.
+    """
+
+    started = 0
+    used = 0
+    discarded = 0
+    timed_out = 0
+
+    def __init__(self, query: str, top_k: int = 5):
+        # Chỉ tìm trong vector database: không gửi request tới Spring Boot cho một lượt có thể không cần
+        self.task = asyncio.create_task(product_retriever.retrieve(query, top_k, api_fallback=False))
+        self.settled = False
+        SpeculativeRetrieval.started += 1
+
+    async def result(self, timeout: float) -> List[Dict[str, Any]]:
+        """
+        Chờ kết quả tối đa `timeout` giây, trả về [] nếu quá hạn hoặc lỗi (agent sẽ tự gọi tool tìm kiếm)
+        """
+        self.settled = True
+        try:
+            products = await asyncio.wait_for(self.task, timeout)
+        except asyncio.TimeoutError:
+            SpeculativeRetrieval.timed_out += 1
+            print(f"[SPECULATIVE] Truy xuất sản phẩm chưa xong sau {timeout}s, bỏ qua")
+            return []
+        except Exception as e:
+            print(f"[SPECULATIVE] Lỗi khi truy xuất sản phẩm: {str(e)}")
+            return []
+        SpeculativeRetrieval.used += 1
+        return products or []
+
+    async def product_ids(self, timeout: float) -> Optional[List[str]]:
+        """
+        ID các sản phẩm tìm được (theo thứ tự liên quan), None nếu chưa xong sau `timeout` giây hoặc lỗi.
+        Không hủy task và không tính là đã dùng: kết quả vẫn có thể được đưa cho product agent sau đó
+        """
+        done, _ = await asyncio.wait({self.task}, timeout=timeout)
+        if not done or self.task.cancelled() or self.task.exception() is not None:
+            return None
+        return [str(product["id"]) for product in self.task.result() or [] if isinstance(product, dict) and product.get("id")]
+
+    def discard(self) -> None:
+        """Hủy truy xuất khi route không phải product (không làm gì nếu kết quả đã được dùng)"""
+        if self.settled:
+            return
+        self.settled = True
+        if not self.task.done():
+            self.task.cancel()
+        else:
+            # Lấy exception (nếu có) để tránh cảnh báo "exception was never retrieved"
+            if not self.task.cancelled():
+                self.task.exception()
+        SpeculativeRetrieval.discarded += 1
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """Số lần truy xuất trước được dùng/bỏ"""
+        return {
+            "started": cls.started,
+            "used": cls.used,
+            "discarded": cls.discarded,
+            "timed_out": cls.timed_out,
+            "used_rate": round(cls.used / cls.started, 4) if cls.started else 0.0
+        }
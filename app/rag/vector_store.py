@@ -1,6 +1,7 @@
 import os
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 from langchain_milvus import Milvus
 from langchain.schema import Document
 from .embeddings import embedding_provider
@@ -244,6 +245,43 @@ class VectorStore:
             traceback.print_exc()
             raise
     
+    async def add_products_streaming(
+        self,
+        product_pages: AsyncIterator[List[Dict[str, Any]]],
+        chunk_size: int = 200
+    ) -> int:
+        """
+        Thêm sản phẩm vào vector database từ một luồng các trang sản phẩm, theo từng chunk cố định
+        
+        Chỉ giữ tối đa một chunk trong bộ nhớ; việc embedding/ghi Milvus (đồng bộ) chạy trong thread
+        nên trang tiếp theo vẫn được tải trong lúc chunk hiện tại đang được ghi.
+        
+        Args:
+            product_pages: Async iterator trả về từng trang sản phẩm
+            chunk_size: Số sản phẩm mỗi lần ghi vào vector database
+            
+        Returns:
+            Tổng số sản phẩm đã ghi
+        """
+        buffer: List[Dict[str, Any]] = []
+        total = 0
+        
+        async for page in product_pages:
+            buffer.extend(page)
+            while len(buffer) >= chunk_size:
+                chunk, buffer = buffer[:chunk_size], buffer[chunk_size:]
+                await asyncio.to_thread(self.add_products, chunk)
+                total += len(chunk)
+                print(f"[MILVUS] Đã ghi {total} sản phẩm (streaming)")
+        
+        if buffer:
+            await asyncio.to_thread(self.add_products, buffer)
+            total += len(buffer)
+        
+        logger.info(f"Hoàn thành ghi streaming {total} sản phẩm vào collection '{self.collection_name}'")
+        print(f"[MILVUS] Hoàn thành ghi streaming {total} sản phẩm vào collection '{self.collection_name}'")
+        return total
+    
     def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """
         Tìm kiếm sản phẩm tương tự với query
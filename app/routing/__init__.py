@@ -0,0 +1 @@
+# python-chatbot-service/app/routing/__init__.py
\ No newline at end of file
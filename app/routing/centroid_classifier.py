@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from ..core.config import settings
+
+EXAMPLES_PATH = os.path.join(os.path.dirname(__file__), "intent_examples.json")
+
+
+@dataclass
+class IntentPrediction:
+    """Kết quả phân loại theo centroid"""
+    intent: str
+    confidence: float  # cosine similarity với centroid gần nhất
+    margin: float  # chênh lệch với centroid gần thứ hai
+    accepted: bool  # đủ tin cậy để không cần gọi LLM
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else vector
+
+
+def _dot(a: List[float], b: List[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+class CentroidClassifier:
+    """
+    Phân loại intent bằng embedding: so sánh embedding của tin nhắn với centroid của từng intent
+    (trung bình embedding các câu ví dụ đã gán nhãn).
+
+    Centroid được tính một lần (lần dùng đầu tiên hoặc lúc khởi động) và lưu ra file, chỉ tính lại khi
+    file ví dụ hoặc embedding model thay đổi. Mỗi lần phân loại chỉ tốn một lần embedding câu truy vấn
+    và bốn phép nhân vô hướng.
+    """
+
+    def __init__(self, examples_path: str = EXAMPLES_PATH, cache_path: Optional[str] = None,
+                 threshold: float = 0.5, min_margin: float = 0.05):
+        self.examples_path = examples_path
+        self.cache_path = cache_path
+        self.threshold = threshold
+        self.min_margin = min_margin
+        self.centroids: Dict[str, List[float]] = {}
+        self._build_lock = asyncio.Lock()
+        self.classified = 0
+        self.accepted = 0
+
+    def _load_examples(self) -> Dict[str, List[str]]:
+        with open(self.examples_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _fingerprint(self, examples: Dict[str, List[str]]) -> str:
+        payload = json.dumps({"model": settings.OPENAI_EMBEDDING_MODEL, "examples": examples},
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load_cached_centroids(self, fingerprint: str) -> Optional[Dict[str, List[float]]]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("fingerprint") != fingerprint:
+            return None
+        return cached.get("centroids")
+
+    def _save_centroids(self, fingerprint: str) -> None:
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": fingerprint, "centroids": self.centroids}, f)
+        except OSError as e:
+            print(f"[ROUTER] Không thể lưu centroid ra file {self.cache_path}: {str(e)}")
+
+    async def build(self) -> None:
+        """Tính (hoặc nạp từ file) centroid của từng intent, chỉ chạy một lần"""
+        if self.centroids:
+            return
+        async with self._build_lock:
+            if self.centroids:
+                return
+
+            examples = self._load_examples()
+            fingerprint = self._fingerprint(examples)
+            cached = self._load_cached_centroids(fingerprint)
+            if cached:
+                self.centroids = cached
+                print(f"[ROUTER] Đã nạp centroid của {len(cached)} intent từ {self.cache_path}")
+                return
+
+            from ..rag.embeddings import embedding_provider
+
+            labels = [intent for intent, texts in examples.items() for _ in texts]
+            texts = [text for intent_texts in examples.values() for text in intent_texts]
+            # Embed toàn bộ câu ví dụ trong một lần gọi, chạy trong thread để không chặn event loop
+            vectors = await asyncio.to_thread(embedding_provider.get_embeddings, texts)
+
+            sums: Dict[str, List[float]] = {}
+            for label, vector in zip(labels, vectors):
+                vector = _normalize(vector)
+                if label not in sums:
+                    sums[label] = list(vector)
+                else:
+                    sums[label] = [a + b for a, b in zip(sums[label], vector)]
+            self.centroids = {label: _normalize(total) for label, total in sums.items()}
+            print(f"[ROUTER] Đã tính centroid cho {len(self.centroids)} intent từ {len(texts)} câu ví dụ")
+            self._save_centroids(fingerprint)
+
+    async def classify(self, message: str) -> IntentPrediction:
+        """
+        Phân loại tin nhắn, accepted=False khi độ tương đồng thấp hoặc hai intent quá sát nhau
+        """
+        prediction = await self.peek(message)
+        self.classified += 1
+        if prediction.accepted:
+            self.accepted += 1
+        return prediction
+
+    async def peek(self, message: str) -> IntentPrediction:
+        """Giống classify nhưng không ghi nhận thống kê (dùng để quyết định sớm, trước khi routing)"""
+        await self.build()
+
+        from ..rag.embeddings import embedding_provider
+
+        query = _normalize(await asyncio.to_thread(embedding_provider.get_query_embedding, message))
+        scores = sorted(
+            ((_dot(query, centroid), intent) for intent, centroid in self.centroids.items()),
+            reverse=True
+        )
+        best_score, best_intent = scores[0]
+        margin = best_score - scores[1][0] if len(scores) > 1 else best_score
+        accepted = best_score >= self.threshold and margin >= self.min_margin
+        return IntentPrediction(
+            intent=best_intent,
+            confidence=round(best_score, 4),
+            margin=round(margin, 4),
+            accepted=accepted
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Số tin nhắn đã phân loại và tỉ lệ đủ tin cậy"""
+        return {
+            "ready": bool(self.centroids),
+            "classified": self.classified,
+            "accepted": self.accepted,
+            "accepted_rate": round(self.accepted / self.classified, 4) if self.classified else 0.0,
+            "threshold": self.threshold,
+            "min_margin": self.min_margin
+        }
+
+
+# Singleton instance
+centroid_classifier = CentroidClassifier(
+    cache_path=settings.ROUTING_CENTROIDS_CACHE_PATH,
+    threshold=settings.ROUTING_CENTROID_THRESHOLD,
+    min_margin=settings.ROUTING_CENTROID_MIN_MARGIN
+)
@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from ..core.config import settings
+from ..tools.shop_tools import CONTACT_INFO, RETURN_POLICY, SHIPPING_INFO, SHOP_INFO
+from .centroid_classifier import _dot, _normalize
+
+
+def _money(amount: int) -> str:
+    return f"{amount:,.0f}".replace(",", ".") + "đ"
+
+
+def _render_shop_info() -> str:
+    return (
+        f"{SHOP_INFO['name']} thành lập năm {SHOP_INFO['established']}. {SHOP_INFO['description']} "
+        f"Sản phẩm chính: {SHOP_INFO['specialty']}."
+    )
+
+
+def _render_shipping() -> str:
+    options = "\n".join(
+        f"- {option['name']}: {option['time']}, phí {_money(option['fee'])}"
+        for option in SHIPPING_INFO["delivery_options"]
+    )
+    return (
+        f"Cosmo có các hình thức giao bánh:\n{options}\n"
+        f"Miễn phí giao hàng: {SHIPPING_INFO['free_shipping']}. Khu vực giao: {SHIPPING_INFO['delivery_areas']}."
+    )
+
+
+def _render_free_shipping() -> str:
+    return (
+        f"Cosmo miễn phí giao hàng cho {SHIPPING_INFO['free_shipping'][0].lower()}{SHIPPING_INFO['free_shipping'][1:]}. "
+        f"Đơn thấp hơn có phí từ {_money(min(o['fee'] for o in SHIPPING_INFO['delivery_options']))}."
+    )
+
+
+def _render_delivery_areas() -> str:
+    return f"Cosmo hiện giao bánh tại: {SHIPPING_INFO['delivery_areas']}. {SHIPPING_INFO['note']}."
+
+
+def _render_return_policy() -> str:
+    conditions = "\n".join(f"- {condition}" for condition in RETURN_POLICY["conditions"])
+    return (
+        f"Chính sách đổi/trả bánh: {RETURN_POLICY['return_period'].lower()}, áp dụng khi:\n{conditions}\n"
+        f"{RETURN_POLICY['process']} (hotline {CONTACT_INFO['phone']}). Lưu ý: {RETURN_POLICY['exceptions'].lower()}."
+    )
+
+
+def _render_contact() -> str:
+    return (
+        f"Bạn có thể liên hệ Cosmo qua hotline {CONTACT_INFO['phone']}, email {CONTACT_INFO['email']}, "
+        f"website {CONTACT_INFO['website']}, Facebook {CONTACT_INFO['social_media']['facebook']} "
+        f"hoặc Instagram {CONTACT_INFO['social_media']['instagram']}."
+    )
+
+
+def _render_locations() -> str:
+    locations = "\n".join(
+        f"- {location['address']} (ĐT: {location['phone']}, mở cửa {location['hours']})"
+        for location in CONTACT_INFO["locations"]
+    )
+    return f"Cosmo có {len(CONTACT_INFO['locations'])} cửa hàng:\n{locations}"
+
+
+@dataclass
+class FAQEntry:
+    """Một câu hỏi thường gặp: các cách hỏi mẫu và câu trả lời dựng từ dữ liệu của tool cửa hàng"""
+    id: str
+    questions: List[str]
+    render: Callable[[], str]
+
+
+FAQ_ENTRIES = [
+    FAQEntry("shop_info", [
+        "Giới thiệu về cửa hàng",
+        "Cosmo là tiệm bánh gì",
+        "Cửa hàng bán những loại bánh gì",
+        "Tiệm mở từ năm nào"
+    ], _render_shop_info),
+    FAQEntry("shipping", [
+        "Phí ship bao nhiêu",
+        "Giao hàng mất bao lâu",
+        "Có những hình thức giao hàng nào",
+        "Phí giao bánh là bao nhiêu",
+        "Giao nhanh trong 1 giờ được không"
+    ], _render_shipping),
+    FAQEntry("free_shipping", [
+        "Đơn bao nhiêu thì được miễn phí vận chuyển",
+        "Có freeship không",
+        "Mua bao nhiêu thì được miễn phí giao hàng"
+    ], _render_free_shipping),
+    FAQEntry("delivery_areas", [
+        "Shop có giao ra ngoại thành không",
+        "Shop giao hàng ở khu vực nào",
+        "Có giao bánh ở Hà Nội không",
+        "Có ship tỉnh không"
+    ], _render_delivery_areas),
+    FAQEntry("return_policy", [
+        "Chính sách đổi trả thế nào",
+        "Bánh bị hỏng thì có được đổi không",
+        "Giao sai bánh thì làm sao",
+        "Có được trả lại bánh không",
+        "Bánh bị hỏng thì có được hoàn tiền không"
+    ], _render_return_policy),
+    FAQEntry("contact", [
+        "Số hotline của tiệm là gì",
+        "Làm sao để liên hệ với cửa hàng",
+        "Email của shop là gì",
+        "Fanpage của shop",
+        "Cho mình xin số điện thoại cửa hàng"
+    ], _render_contact),
+    FAQEntry("locations", [
+        "Cửa hàng ở đâu vậy",
+        "Địa chỉ tiệm bánh",
+        "Shop có mấy chi nhánh",
+        "Shop mở cửa lúc mấy giờ",
+        "Mấy giờ cửa hàng đóng cửa"
+    ], _render_locations)
+]
+
+
+@dataclass
+class FAQMatch:
+    """Câu trả lời FAQ cho một tin nhắn"""
+    entry_id: str
+    answer: str
+    score: float
+
+
+class FAQEngine:
+    """
+    Trả lời trực tiếp các câu hỏi thường gặp về cửa hàng (chính sách, vận chuyển, liên hệ, địa chỉ)
+    mà không cần Analyzer hay Shop Assistant.
+
+    Embedding của các câu hỏi mẫu được tính một lần (lưu ra file, chỉ tính lại khi câu hỏi hoặc
+    embedding model thay đổi). Tin nhắn chỉ được trả lời khi độ tương đồng với câu hỏi mẫu gần nhất
+    đạt `threshold` và cách câu hỏi mẫu gần nhất của FAQ khác ít nhất `min_margin`.
+    """
+
+    def __init__(self, entries: List[FAQEntry], cache_path: Optional[str] = None,
+                 threshold: float = 0.7, min_margin: float = 0.03):
+        self.entries = {entry.id: entry for entry in entries}
+        self.cache_path = cache_path
+        self.threshold = threshold
+        self.min_margin = min_margin
+        self.vectors: List[tuple] = []  # (entry_id, vector đã chuẩn hóa)
+        self._answers: Dict[str, str] = {}
+        self._build_lock = asyncio.Lock()
+        self.checked = 0
+        self.answered = 0
+
+    def _questions(self) -> List[tuple]:
+        return [(entry.id, question) for entry in self.entries.values() for question in entry.questions]
+
+    def _fingerprint(self, questions: List[tuple]) -> str:
+        payload = json.dumps({"model": settings.OPENAI_EMBEDDING_MODEL, "questions": questions},
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load_cached_vectors(self, fingerprint: str) -> Optional[List[List[float]]]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("fingerprint") != fingerprint:
+            return None
+        return cached.get("vectors")
+
+    def _save_vectors(self, fingerprint: str, vectors: List[List[float]]) -> None:
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": fingerprint, "vectors": vectors}, f)
+        except OSError as e:
+            print(f"[FAQ] Không thể lưu embedding FAQ ra file {self.cache_path}: {str(e)}")
+
+    async def build(self) -> None:
+        """Tính (hoặc nạp từ file) embedding các câu hỏi mẫu và dựng sẵn câu trả lời, chỉ chạy một lần"""
+        if self.vectors:
+            return
+        async with self._build_lock:
+            if self.vectors:
+                return
+
+            # Câu trả lời chỉ phụ thuộc dữ liệu tĩnh nên được dựng một lần
+            self._answers = {entry_id: entry.render() for entry_id, entry in self.entries.items()}
+
+            questions = self._questions()
+            fingerprint = self._fingerprint(questions)
+            vectors = self._load_cached_vectors(fingerprint)
+            if vectors:
+                print(f"[FAQ] Đã nạp embedding của {len(vectors)} câu hỏi mẫu từ {self.cache_path}")
+            else:
+                from ..rag.embeddings import embedding_provider
+
+                vectors = await asyncio.to_thread(embedding_provider.get_embeddings, [q for _, q in questions])
+                vectors = [_normalize(vector) for vector in vectors]
+                print(f"[FAQ] Đã tính embedding cho {len(vectors)} câu hỏi mẫu")
+                self._save_vectors(fingerprint, vectors)
+
+            self.vectors = [(entry_id, vector) for (entry_id, _), vector in zip(questions, vectors)]
+
+    async def answer(self, message: str) -> Optional[FAQMatch]:
+        """Câu trả lời FAQ nếu tin nhắn đủ giống một câu hỏi mẫu, ngược lại None"""
+        await self.build()
+
+        from ..rag.embeddings import embedding_provider
+
+        started_at = time.perf_counter()
+        query = _normalize(await asyncio.to_thread(embedding_provider.get_query_embedding, message))
+
+        # Điểm cao nhất của từng FAQ (qua các câu hỏi mẫu)
+        best: Dict[str, float] = {}
+        for entry_id, vector in self.vectors:
+            score = _dot(query, vector)
+            if score > best.get(entry_id, -1.0):
+                best[entry_id] = score
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        entry_id, score = ranked[0]
+        margin = score - ranked[1][1] if len(ranked) > 1 else score
+
+        self.checked += 1
+        matched = score >= self.threshold and margin >= self.min_margin
+        print(f"[FAQ] '{message[:50]}' -> {entry_id} (score={score:.4f}, margin={margin:.4f}, "
+              f"matched={matched}, {(time.perf_counter() - started_at) * 1000:.0f}ms)")
+        if not matched:
+            return None
+        self.answered += 1
+        return FAQMatch(entry_id=entry_id, answer=self._answers[entry_id], score=round(score, 4))
+
+    def stats(self) -> Dict[str, Any]:
+        """Số tin nhắn đã kiểm tra và tỉ lệ được FAQ trả lời"""
+        return {
+            "ready": bool(self.vectors),
+            "checked": self.checked,
+            "answered": self.answered,
+            "answered_rate": round(self.answered / self.checked, 4) if self.checked else 0.0,
+            "threshold": self.threshold,
+            "min_margin": self.min_margin
+        }
+
+
+# Singleton instance
+faq_engine = FAQEngine(
+    FAQ_ENTRIES,
+    cache_path=settings.FAQ_EMBEDDINGS_CACHE_PATH,
+    threshold=settings.FAQ_THRESHOLD,
+    min_margin=settings.FAQ_MIN_MARGIN
+)
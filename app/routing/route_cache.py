@@ -0,0 +1,25 @@
+import re
+import unicodedata
+
+from ..core.cache import TTLCache
+from ..core.config import settings
+
+
+def normalize_message(message: str) -> str:
+    """
+    Chuẩn hóa tin nhắn làm key cache: Unicode NFC (dấu tiếng Việt dựng sẵn hay tổ hợp đều như nhau),
+    chữ thường, gộp khoảng trắng, bỏ dấu câu ở hai đầu
+
+    Không bỏ dấu tiếng Việt vì "giỏ" và "giờ" sau khi bỏ dấu là một nhưng có thể khác intent.
+    """
+    text = unicodedata.normalize("NFC", message).lower()
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" .,!?…~")
+
+
+# Cache quyết định routing của các tầng tốn chi phí (centroid embedding, LLM Analyzer)
+routing_cache = TTLCache(
+    maxsize=settings.ROUTING_CACHE_MAX_SIZE,
+    default_ttl=settings.ROUTING_CACHE_TTL,
+    name="routing"
+)
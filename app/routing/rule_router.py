@@ -0,0 +1,155 @@
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+INTENTS = ("product", "cart", "shop", "checkout")
+
+# Quy tắc theo từ khóa, viết ở dạng đã bỏ dấu (xem fold_text) để khớp cả tin nhắn gõ không dấu.
+# Chỉ dùng các cụm từ ít nhập nhằng: "gio" đứng một mình có thể là "giỏ" hoặc "giờ" nên không dùng.
+INTENT_PATTERNS: Dict[str, List[str]] = {
+    "cart": [
+        r"gio hang",
+        r"(them|bo|cho|dua) .{0,40}vao gio",
+        r"(xoa|bo|lay) .{0,40}(ra )?khoi gio",
+        r"(cap nhat|sua|doi|tang|giam|bot) so luong",
+        r"\bcart\b"
+    ],
+    "checkout": [
+        r"thanh toan",
+        r"dat hang",
+        r"(tao|len|chot|huy) don",
+        r"chuyen khoan",
+        r"\bcod\b",
+        r"don hang (cua (toi|minh|em))",
+        r"(trang thai|tinh trang|lich su|kiem tra) don( hang)?",
+        r"\bcheckout\b"
+    ],
+    "shop": [
+        r"doi tra",
+        r"hoan tien",
+        # "giao hàng tới ..." khi đang đặt hàng thuộc checkout nên chỉ nhận các câu hỏi về giao hàng
+        r"(phi|gia|tien|thoi gian|hinh thuc|phuong thuc) (giao hang|giao banh|van chuyen|ship)",
+        r"\bfree ?ship\b",
+        r"(giao hang|van chuyen|ship) .{0,30}(bao lau|khong|the nao|nhu the nao|o dau|nhung dau|mien phi)",
+        r"(co|shop) (giao hang|ship)",
+        # Sự cố khi nhận hàng/đổi bánh: chính sách đổi trả, không phải hỏi về sản phẩm
+        r"giao (sai|nham|thieu|cham|tre)",
+        r"\b(bi )?(hong|moc|vo|dap|bep|hu)\b.{0,40}(doi|tra|hoan|lam sao|the nao)",
+        r"(duoc|cho) (doi|tra lai)",
+        r"dia chi (cua hang|tiem|shop)",
+        r"(gio|thoi gian) (mo|dong) cua",
+        r"mo cua",
+        r"hotline",
+        r"lien he",
+        r"so dien thoai (cua hang|shop|tiem)",
+        r"chinh sach",
+        r"chi nhanh"
+    ],
+    "product": [
+        # "bánh" xuất hiện cả trong câu hỏi chính sách/giao hàng; các câu đó khớp thêm luật shop
+        # và nhóm cụ thể luôn được ưu tiên hơn product (xem RuleRouter._decide)
+        r"\bbanh\b",
+        r"san pham",
+        r"bao nhieu tien",
+        # "giá" đi kèm sản phẩm hoặc câu hỏi giá ("giá ship" thuộc shop)
+        r"\bgia (ca|bao nhieu|banh|cua|tien|re|mem|hop ly|khoang|tu|duoi|tren)\b",
+        r"(re|dat) nhat",
+        r"so sanh",
+        r"goi y",
+        r"(tu van|de xuat)",
+        r"\bmenu\b",
+        r"huong vi",
+        r"sinh nhat",
+        # Lời chào/cảm ơn: analyzer cũng mặc định chuyển về product
+        r"^(xin )?chao\b",
+        r"^(hi|hello)\b",
+        r"\bcam on\b"
+    ]
+}
+
+# Khi khớp đúng các nhóm này cùng lúc thì vẫn chọn được một agent (theo thứ tự ưu tiên của prompt
+# manager: "thanh toán giỏ hàng" là yêu cầu thanh toán)
+COMBINED_INTENTS = {
+    frozenset({"cart", "checkout"}): "checkout"
+}
+
+
+def fold_text(text: str) -> str:
+    """
+    Chuẩn hóa tin nhắn để so khớp: chữ thường, bỏ dấu tiếng Việt (đ -> d), gộp khoảng trắng
+    """
+    text = text.lower().replace("đ", "d")
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    return text.strip()
+
+
+class RuleRouter:
+    """
+    Bộ phân loại tin nhắn theo luật (không gọi LLM) chạy trước agent Analyzer.
+
+    - Khớp đúng một nhóm ngoài product (cart, shop, checkout): chọn nhóm đó
+    - Chỉ khớp product: chọn product
+    - Không khớp hoặc khớp nhiều nhóm nhập nhằng: trả về None để fallback sang LLM
+    """
+
+    def __init__(self, patterns: Dict[str, List[str]] = None):
+        patterns = patterns or INTENT_PATTERNS
+        self.patterns = {
+            intent: [re.compile(pattern) for pattern in intent_patterns]
+            for intent, intent_patterns in patterns.items()
+        }
+        self.total = 0
+        self.fast_path = 0
+        self.by_intent: Dict[str, int] = {intent: 0 for intent in INTENTS}
+
+    def match(self, message: str) -> Dict[str, List[str]]:
+        """Các nhóm có luật khớp với tin nhắn, kèm các luật đã khớp"""
+        folded = fold_text(message)
+        matches: Dict[str, List[str]] = {}
+        for intent, patterns in self.patterns.items():
+            hits = [pattern.pattern for pattern in patterns if pattern.search(folded)]
+            if hits:
+                matches[intent] = hits
+        return matches
+
+    def classify(self, message: str) -> Optional[str]:
+        """
+        Phân loại tin nhắn, trả về product/cart/shop/checkout hoặc None nếu cần LLM quyết định
+        """
+        self.total += 1
+        intent = self._decide(self.match(message))
+        if intent is not None:
+            self.fast_path += 1
+            self.by_intent[intent] += 1
+        return intent
+
+    def peek(self, message: str) -> Optional[str]:
+        """Giống classify nhưng không ghi nhận thống kê (dùng để quyết định sớm, trước khi routing)"""
+        return self._decide(self.match(message))
+
+    @staticmethod
+    def _decide(matches: Dict[str, List[str]]) -> Optional[str]:
+        specific = frozenset(intent for intent in matches if intent != "product")
+        if len(specific) == 1:
+            return next(iter(specific))
+        if specific:
+            return COMBINED_INTENTS.get(specific)
+        if "product" in matches:
+            return "product"
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Tỉ lệ tin nhắn được phân loại bằng luật (không cần gọi LLM)"""
+        return {
+            "total": self.total,
+            "fast_path": self.fast_path,
+            "llm_fallback": self.total - self.fast_path,
+            "fast_path_rate": round(self.fast_path / self.total, 4) if self.total else 0.0,
+            "by_intent": dict(self.by_intent)
+        }
+
+
+# Singleton instance
+rule_router = RuleRouter()
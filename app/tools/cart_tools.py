@@ -1,9 +1,79 @@
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional
 from agents import function_tool
 from ..client.spring_client import spring_boot_client
+from .memo import invalidates_turn_memo, turn_memoized
+from ..core.turn_state import current_turn
+
+EMPTY_CART = {"items": [], "total": 0, "count": 0}
+
+def _remember_cart(cart: Dict[str, Any]) -> Dict[str, Any]:
+    """Lưu giỏ hàng mới nhất vào trạng thái của lượt hiện tại để các tool sau dùng lại"""
+    turn = current_turn()
+    if turn is not None:
+        turn.cart = cart
+    return cart
+
+def _summarize_cart(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Tính lại tổng tiền và số lượng dòng của giỏ hàng"""
+    return {
+        "items": items,
+        "total": sum((item.get("price") or 0) * (item.get("quantity") or 0) for item in items),
+        "count": len(items)
+    }
+
+def _patch_quantity(cart: Dict[str, Any], cart_detail_id: str, quantity: int) -> Optional[Dict[str, Any]]:
+    """Cập nhật số lượng của một dòng trong giỏ hàng đã biết, None nếu không tìm thấy dòng đó"""
+    if quantity <= 0:
+        return _patch_remove(cart, cart_detail_id)
+    items = [dict(item) for item in cart.get("items", [])]
+    for item in items:
+        if str(item.get("id")) == str(cart_detail_id):
+            item["quantity"] = quantity
+            return _summarize_cart(items)
+    return None
+
+def _patch_add(cart: Dict[str, Any], line: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Áp dụng dòng giỏ hàng mà API thêm sản phẩm xác nhận lên giỏ hàng đã biết, None nếu không áp dụng được.
+    Số lượng lấy theo backend chứ không tự cộng: giỏ hàng đã biết có thể cũ hơn giỏ hàng thật.
+    """
+    items = [dict(item) for item in cart.get("items", [])]
+    for item in items:
+        if str(item.get("product_id")) == str(line.get("product_id")):
+            item["quantity"] = line["quantity"]
+            return _summarize_cart(items)
+    # Sản phẩm mới: chỉ thêm dòng khi response có đủ thông tin sản phẩm
+    if line.get("id") is not None and line.get("name"):
+        return _summarize_cart(items + [dict(line)])
+    return None
+
+def _patch_remove(cart: Dict[str, Any], cart_detail_id: str) -> Optional[Dict[str, Any]]:
+    """Xóa một dòng khỏi giỏ hàng đã biết, None nếu không tìm thấy dòng đó"""
+    items = cart.get("items", [])
+    remaining = [item for item in items if str(item.get("id")) != str(cart_detail_id)]
+    if len(remaining) == len(items):
+        return None
+    return _summarize_cart(remaining)
+
+async def _cart_after_mutation(result: Dict[str, Any], patch: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Lấy giỏ hàng sau khi thay đổi với ít round trip nhất:
+    1. Giỏ hàng có sẵn trong response của API thay đổi
+    2. Áp dụng thay đổi lên giỏ hàng đã biết trong lượt hiện tại
+    3. Cuối cùng mới gọi lại GET /carts
+    """
+    cart = result.get("cart")
+    if cart is None and patch is not None:
+        turn = current_turn()
+        if turn is not None and turn.cart is not None:
+            cart = patch(turn.cart)
+    if cart is None:
+        cart = await spring_boot_client.get_cart()
+    return _remember_cart(cart)
 
 @function_tool("Thêm sản phẩm vào giỏ hàng")
-def add_to_cart(product_id: str, quantity: int) -> Dict[str, Any]:
+@invalidates_turn_memo
+async def add_to_cart(product_id: str, quantity: int) -> Dict[str, Any]:
     """
     Thêm sản phẩm vào giỏ hàng.
     
@@ -20,13 +90,16 @@ def add_to_cart(product_id: str, quantity: int) -> Dict[str, Any]:
             quantity = 1
             
         print(f"Thêm sản phẩm vào giỏ hàng: product_id={product_id}, quantity={quantity}")
-        result = spring_boot_client.add_to_cart(product_id=product_id, quantity=quantity)
+        result = await spring_boot_client.add_to_cart(product_id=product_id, quantity=quantity)
         
         if result.get("success", False):
             print("Thêm sản phẩm vào giỏ hàng thành công")
-            # Lấy thông tin giỏ hàng mới nhất
-            cart = spring_boot_client.get_cart()
-            return cart
+            # Lấy thông tin giỏ hàng mới nhất (ưu tiên giỏ hàng trong response)
+            # Chỉ sửa giỏ hàng đã biết khi backend xác nhận số lượng mới, nếu không thì gọi lại GET /carts
+            line = result.get("cart_line")
+            return await _cart_after_mutation(
+                result, (lambda cart: _patch_add(cart, line)) if line else None
+            )
         else:
             print(f"Lỗi khi thêm vào giỏ hàng: {result.get('message', 'Unknown error')}")
             return result
@@ -37,7 +110,8 @@ def add_to_cart(product_id: str, quantity: int) -> Dict[str, Any]:
         return {"success": False, "message": error_msg}
 
 @function_tool("Cập nhật số lượng sản phẩm trong giỏ hàng")
-def update_cart(cart_detail_id: str, quantity: int) -> Dict[str, Any]:
+@invalidates_turn_memo
+async def update_cart(cart_detail_id: str, quantity: int) -> Dict[str, Any]:
     """
     Cập nhật số lượng sản phẩm trong giỏ hàng.
     
@@ -49,10 +123,12 @@ def update_cart(cart_detail_id: str, quantity: int) -> Dict[str, Any]:
         Dict: Thông tin giỏ hàng sau khi cập nhật
     """
     try:
-        result = spring_boot_client.update_cart_item(cart_detail_id, quantity)
+        result = await spring_boot_client.update_cart_item(cart_detail_id, quantity)
         if result.get("success", False):
             # Lấy thông tin giỏ hàng mới nhất
-            return spring_boot_client.get_cart()
+            return await _cart_after_mutation(
+                result, lambda cart: _patch_quantity(cart, cart_detail_id, quantity)
+            )
         return result
     except Exception as e:
         error_msg = f"Lỗi khi cập nhật giỏ hàng: {str(e)}"
@@ -60,7 +136,8 @@ def update_cart(cart_detail_id: str, quantity: int) -> Dict[str, Any]:
         return {"success": False, "message": error_msg}
 
 @function_tool("Xóa sản phẩm khỏi giỏ hàng")
-def remove_from_cart(cart_detail_id: str) -> Dict[str, Any]:
+@invalidates_turn_memo
+async def remove_from_cart(cart_detail_id: str) -> Dict[str, Any]:
     """
     Xóa sản phẩm khỏi giỏ hàng.
     
@@ -71,10 +148,12 @@ def remove_from_cart(cart_detail_id: str) -> Dict[str, Any]:
         Dict: Thông tin giỏ hàng sau khi xóa sản phẩm
     """
     try:
-        result = spring_boot_client.remove_from_cart(cart_detail_id)
+        result = await spring_boot_client.remove_from_cart(cart_detail_id)
         if result.get("success", False):
             # Lấy thông tin giỏ hàng mới nhất
-            return spring_boot_client.get_cart()
+            return await _cart_after_mutation(
+                result, lambda cart: _patch_remove(cart, cart_detail_id)
+            )
         return result
     except Exception as e:
         error_msg = f"Lỗi khi xóa sản phẩm khỏi giỏ hàng: {str(e)}"
@@ -82,7 +161,7 @@ def remove_from_cart(cart_detail_id: str) -> Dict[str, Any]:
         return {"success": False, "message": error_msg}
 
 @function_tool("Lấy thông tin giỏ hàng hiện tại")
-def get_cart() -> Dict[str, Any]:
+async def get_cart() -> Dict[str, Any]:
     """
     Lấy thông tin giỏ hàng hiện tại của người dùng
     
@@ -90,16 +169,22 @@ def get_cart() -> Dict[str, Any]:
         Dict: Thông tin giỏ hàng bao gồm danh sách sản phẩm và tổng tiền
     """
     try:
-        cart = spring_boot_client.get_cart()
+        # Dùng lại giỏ hàng đã biết trong lượt hiện tại nếu có
+        turn = current_turn()
+        if turn is not None and turn.cart is not None:
+            return turn.cart
+        
+        cart = await spring_boot_client.get_cart()
         if not cart:
             return {"items": [], "total": 0}
-        return cart
+        return _remember_cart(cart)
     except Exception as e:
         print(f"Lỗi khi lấy thông tin giỏ hàng: {str(e)}")
         return {"items": [], "total": 0}
 
 @function_tool("Xóa toàn bộ giỏ hàng")
-def clear_cart() -> Dict[str, Any]:
+@invalidates_turn_memo
+async def clear_cart() -> Dict[str, Any]:
     """
     Xóa toàn bộ giỏ hàng.
     
@@ -107,8 +192,9 @@ def clear_cart() -> Dict[str, Any]:
         Dict: Xác nhận giỏ hàng đã được xóa
     """
     try:
-        result = spring_boot_client.clear_cart()
+        result = await spring_boot_client.clear_cart()
         if result.get("success", False):
+            _remember_cart(dict(EMPTY_CART))
             return {"success": True, "message": "Đã xóa toàn bộ giỏ hàng", "items": [], "total": 0}
         return result
     except Exception as e:
@@ -117,7 +203,8 @@ def clear_cart() -> Dict[str, Any]:
         return {"success": False, "message": error_msg}
 
 @function_tool("Tạo đơn hàng mới")
-def create_order(payment_method: str, phone: str, address: str) -> Dict[str, Any]:
+@invalidates_turn_memo
+async def create_order(payment_method: str, phone: str, address: str) -> Dict[str, Any]:
     """
     Tạo đơn hàng mới với thông tin thanh toán
     
@@ -141,12 +228,17 @@ def create_order(payment_method: str, phone: str, address: str) -> Dict[str, Any
             raise ValueError("Phương thức thanh toán không hợp lệ. Chỉ hỗ trợ COD hoặc TRANSFER")
             
         # Tạo đơn hàng
-        order = spring_boot_client.create_order(
+        order = await spring_boot_client.create_order(
             payment_method=payment_method,
             phone=phone,
             address=address
         )
         
+        # Giỏ hàng thay đổi sau khi đặt hàng, không dùng lại giỏ hàng đã biết trong lượt
+        turn = current_turn()
+        if turn is not None:
+            turn.cart = None
+        
         # Log thông tin đơn hàng
         print(f"Đã tạo đơn hàng: {order.get('order_id')} - {payment_method}")
         if payment_method == "TRANSFER" and order.get('payment_url'):
@@ -161,7 +253,8 @@ def create_order(payment_method: str, phone: str, address: str) -> Dict[str, Any
         }
 
 @function_tool("Lấy thông tin chi tiết đơn hàng")
-def get_order_info(order_id: str) -> Dict[str, Any]:
+@turn_memoized
+async def get_order_info(order_id: str) -> Dict[str, Any]:
     """
     Lấy thông tin chi tiết của một đơn hàng
     
@@ -179,7 +272,7 @@ def get_order_info(order_id: str) -> Dict[str, Any]:
         - created_at: Thời gian tạo
     """
     try:
-        order = spring_boot_client.get_order_info(order_id)
+        order = await spring_boot_client.get_order_info(order_id)
         
         # Log thông tin đơn hàng
         print(f"Thông tin đơn hàng {order_id}: {order.get('status')}")
@@ -193,7 +286,8 @@ def get_order_info(order_id: str) -> Dict[str, Any]:
         }
 
 @function_tool("Lấy thông tin thanh toán đơn hàng")
-def get_payment_info(order_id: str) -> Dict[str, Any]:
+@turn_memoized
+async def get_payment_info(order_id: str) -> Dict[str, Any]:
     """
     Lấy thông tin thanh toán của một đơn hàng
     
@@ -209,7 +303,7 @@ def get_payment_info(order_id: str) -> Dict[str, Any]:
         - paid_at: Thời gian thanh toán (nếu đã thanh toán)
     """
     try:
-        payment = spring_boot_client.get_payment_info(order_id)
+        payment = await spring_boot_client.get_payment_info(order_id)
         
         # Log trạng thái thanh toán
         print(f"Trạng thái thanh toán đơn {order_id}: {payment.get('status')}")
@@ -223,7 +317,8 @@ def get_payment_info(order_id: str) -> Dict[str, Any]:
         }
 
 @function_tool("Lấy danh sách đơn hàng của tôi")
-def get_my_orders() -> List[Dict[str, Any]]:
+@turn_memoized
+async def get_my_orders() -> List[Dict[str, Any]]:
     """
     Lấy danh sách đơn hàng của người dùng hiện tại
     
@@ -231,7 +326,7 @@ def get_my_orders() -> List[Dict[str, Any]]:
         List[Dict]: Danh sách các đơn hàng
     """
     try:
-        orders = spring_boot_client.get_my_orders()
+        orders = await spring_boot_client.get_my_orders()
         return orders
     except Exception as e:
         print(f"Lỗi khi lấy danh sách đơn hàng: {str(e)}")
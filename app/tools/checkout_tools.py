@@ -1,9 +1,11 @@
 from typing import Dict, Any, List
 from agents import function_tool
 from ..client.spring_client import spring_boot_client
+from .memo import invalidates_turn_memo
 
 @function_tool("Tạo phiên thanh toán mới cho người dùng")
-def create_checkout_session(user_id: str) -> Dict[str, Any]:
+@invalidates_turn_memo
+async def create_checkout_session(user_id: str) -> Dict[str, Any]:
     """
     Tạo phiên thanh toán mới cho người dùng.
     Args:
@@ -12,7 +14,7 @@ def create_checkout_session(user_id: str) -> Dict[str, Any]:
         Thông tin phiên thanh toán
     """
     # Gọi Spring Boot API để tạo phiên thanh toán
-    checkout_url = spring_boot_client.create_checkout_link(user_id)
+    checkout_url = await spring_boot_client.create_checkout_link(user_id)
     return {
         "success": bool(checkout_url),
         "checkoutUrl": checkout_url,
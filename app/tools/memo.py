@@ -0,0 +1,78 @@
+import asyncio
+import functools
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+from ..core.turn_state import current_turn
+
+# Thống kê memo trên toàn service
+memo_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _memo_key(name: str, args: tuple, kwargs: Dict[str, Any]) -> str:
+    return json.dumps([name, args, kwargs], ensure_ascii=False, sort_keys=True, default=str)
+
+
+def _is_error_result(result: Any) -> bool:
+    """Kết quả báo lỗi ({"error": ...} hoặc list chứa phần tử như vậy): có thể là lỗi tạm thời nên không memo"""
+    if isinstance(result, dict):
+        return bool(result.get("error"))
+    if isinstance(result, list):
+        return any(isinstance(item, dict) and item.get("error") for item in result)
+    return False
+
+
+def turn_memoized(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """
+    Memo kết quả của tool chỉ đọc trong một lượt (turn_scope): model gọi lại cùng tool với cùng
+    tham số trong cùng lần Runner.run sẽ nhận kết quả cũ mà không gọi backend.
+
+    Lưu task thay vì kết quả nên các lần gọi song song trùng nhau cũng chỉ chạy một lần.
+    Lần gọi lỗi (exception hoặc kết quả có "error", ví dụ lỗi tạm thời hay circuit breaker đang mở)
+    không được giữ lại để model gọi lại thì tool chạy lại. Ngoài turn_scope, tool chạy bình thường.
+
+    Đặt bên dưới @function_tool (functools.wraps giữ nguyên chữ ký và docstring cho schema).
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        turn = current_turn()
+        if turn is None:
+            return await func(*args, **kwargs)
+
+        key = _memo_key(func.__name__, args, kwargs)
+        task = turn.memo.get(key)
+        if task is not None:
+            memo_stats["hits"] += 1
+            print(f"[TOOL-MEMO] Dùng lại kết quả {func.__name__} trong lượt")
+        else:
+            memo_stats["misses"] += 1
+            task = turn.memo[key] = asyncio.ensure_future(func(*args, **kwargs))
+        try:
+            result = await asyncio.shield(task)
+        except Exception:
+            if turn.memo.get(key) is task:
+                del turn.memo[key]
+            raise
+        if _is_error_result(result) and turn.memo.get(key) is task:
+            del turn.memo[key]
+        return result
+
+    return wrapper
+
+
+def invalidates_turn_memo(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """
+    Dành cho tool thay đổi dữ liệu (giỏ hàng, đơn hàng): xóa memo của lượt sau khi tool chạy
+    để các lần đọc sau thấy dữ liệu mới
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            turn = current_turn()
+            if turn is not None and turn.memo:
+                turn.memo.clear()
+                memo_stats["invalidations"] += 1
+
+    return wrapper
@@ -1,9 +1,11 @@
 from typing import List, Dict, Any
 from agents import function_tool
 from ..client.spring_client import spring_boot_client
+from .memo import turn_memoized
 
 @function_tool("Tìm kiếm thông tin sản phẩm")
-def get_product_info(query: str) -> List[Dict]:
+@turn_memoized
+async def get_product_info(query: str) -> List[Dict]:
     """
     Tìm kiếm thông tin sản phẩm sử dụng Spring Filter
     
@@ -13,10 +15,11 @@ def get_product_info(query: str) -> List[Dict]:
     Returns:
         Danh sách sản phẩm phù hợp với filter
     """
-    return spring_boot_client.search_products(query)
+    return await spring_boot_client.search_products(query)
 
 @function_tool("Lấy thông tin sản phẩm theo ID")
-def get_product_by_id(product_id: str) -> Dict:
+@turn_memoized
+async def get_product_by_id(product_id: str) -> Dict:
     """
     Lấy thông tin sản phẩm theo ID
     
@@ -26,11 +29,33 @@ def get_product_by_id(product_id: str) -> Dict:
     Returns:
         Thông tin sản phẩm nếu tìm thấy, dict rỗng nếu không tìm thấy
     """
-    result = spring_boot_client.get_product_by_id(product_id)
+    result = await spring_boot_client.get_product_by_id(product_id)
     return result if result else {}
 
+@function_tool("Lấy thông tin nhiều sản phẩm cùng lúc theo danh sách ID")
+@turn_memoized
+async def get_products_by_ids(product_ids: List[str]) -> List[Dict]:
+    """
+    Lấy thông tin nhiều sản phẩm trong một lần gọi (so sánh bánh, kiểm tra giỏ hàng, ...)
+    
+    Args:
+        product_ids: Danh sách ID sản phẩm
+        
+    Returns:
+        Danh sách theo đúng thứ tự ID đầu vào. Sản phẩm tìm thấy có thêm "found": True,
+        ID không tìm thấy trả về {"id", "found": False, "error"}
+    """
+    results = await spring_boot_client.get_products_by_ids(product_ids)
+    return [
+        {**result["product"], "id": result["product"].get("id", result["id"]), "found": True}
+        if result["product"] else
+        {"id": result["id"], "found": False, "error": result["error"]}
+        for result in results
+    ]
+
 @function_tool("Tìm kiếm sản phẩm bằng RAG")
-def rag_product_search(query: str, limit: int) -> List[Dict]:
+@turn_memoized
+async def rag_product_search(query: str, limit: int) -> List[Dict]:
     """
     Tìm kiếm thông tin sản phẩm bằng RAG (Retrieval Augmented Generation) từ vector database
     
@@ -55,7 +80,7 @@ def rag_product_search(query: str, limit: int) -> List[Dict]:
     if enhanced_query != query:
         print(f"Query đã nâng cao: '{enhanced_query}'")
         
-    results = product_retriever.retrieve(enhanced_query, limit)
+    results = await product_retriever.retrieve(enhanced_query, limit)
     if results:
         print(f"Tìm thấy {len(results)} sản phẩm từ RAG")
         
@@ -67,8 +92,9 @@ def rag_product_search(query: str, limit: int) -> List[Dict]:
     return results
 
 @function_tool("Kiểm tra sản phẩm còn hàng")
-def check_product_availability(product_id: str) -> Dict:
-    product = spring_boot_client.get_product_by_id(product_id)
+@turn_memoized
+async def check_product_availability(product_id: str) -> Dict:
+    product = await spring_boot_client.get_product_by_id(product_id)
     if not product:
         return {"id": product_id, "available": False, "message": "Không tìm thấy sản phẩm"}
     
@@ -84,7 +110,8 @@ def check_product_availability(product_id: str) -> Dict:
     }
 
 @function_tool("Tìm kiếm sản phẩm theo khoảng giá từ API")
-def find_products_by_price_range(min_price: float, max_price: float) -> List[Dict]:
+@turn_memoized
+async def find_products_by_price_range(min_price: float, max_price: float) -> List[Dict]:
     """
     Tìm kiếm sản phẩm trong khoảng giá trực tiếp từ API backend
     
@@ -96,7 +123,7 @@ def find_products_by_price_range(min_price: float, max_price: float) -> List[Dic
         Danh sách sản phẩm trong khoảng giá
     """
     print(f"Tìm kiếm sản phẩm trong khoảng giá {min_price:,.0f} - {max_price:,.0f} VNĐ từ API")
-    results = spring_boot_client.get_products_by_price_range(min_price, max_price)
+    results = await spring_boot_client.get_products_by_price_range(min_price, max_price)
     
     # Thêm thông tin chi tiết để debug
     if results:
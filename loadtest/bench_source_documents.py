@@ -0,0 +1,151 @@
+"""
+So sánh tốc độ trích xuất source_documents: extractor dùng chung (app/agents/source_documents.py)
+với cách cũ (mỗi agent json.loads lại output của từng tool và tạo image_html cho mọi sản phẩm).
+
+    python -m loadtest.bench_source_documents --tools 30 --products 20 --runs 200
+
+Mỗi lần run giả lập gồm --tools lần gọi tool sản phẩm/giỏ hàng, mỗi lần trả về --products sản phẩm
+lấy từ một catalog có --catalog sản phẩm (nên có nhiều sản phẩm trùng giữa các tool, như khi model
+tìm kiếm rồi tra cứu lại cùng sản phẩm).
+"""
+import argparse
+import json
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from app.agents.source_documents import CART_TOOLS, PRODUCT_TOOLS, extract_source_documents
+
+PRODUCT_TOOL_NAMES = ["rag_product_search", "get_products_by_ids", "find_products_by_price_range", "get_product_by_id"]
+
+
+def _catalog(size: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": str(index),
+            "name": f"Bánh kem số {index}",
+            "price": 100000 + index * 1000,
+            "description": "Bánh kem tươi, cốt bông lan mềm, trang trí trái cây theo mùa. " * 3,
+            "image_url": f"https://cdn.example.com/products/{index}.jpg",
+            "category": "Bánh kem",
+            "status": "ACTIVE",
+            "quantity": index % 7,
+            "relevance_score": 0.8
+        }
+        for index in range(size)
+    ]
+
+
+def _tool_calls(catalog: List[Dict[str, Any]], tools: int, products: int) -> List[tuple]:
+    """Danh sách (tên tool, output) của một lần run"""
+    calls = []
+    for index in range(tools):
+        if index % 5 == 4:
+            items = [
+                {"id": f"cd{p['id']}", "product_id": p["id"], "name": p["name"], "price": p["price"],
+                 "quantity": 1, "image": p["image_url"]}
+                for p in random.sample(catalog, min(products, len(catalog)))
+            ]
+            calls.append(("get_cart", {"items": items, "total": 0, "count": len(items)}))
+        else:
+            calls.append((random.choice(PRODUCT_TOOL_NAMES), random.sample(catalog, min(products, len(catalog)))))
+    return calls
+
+
+def _new_style_result(calls: List[tuple]) -> Any:
+    """RunResult giả lập: new_items gồm tool_call_item rồi tool_call_output_item với output đã có kiểu"""
+    items = []
+    for index, (name, output) in enumerate(calls):
+        call_id = f"call_{index}"
+        items.append(SimpleNamespace(type="tool_call_item", raw_item=SimpleNamespace(name=name, call_id=call_id)))
+        items.append(SimpleNamespace(type="tool_call_output_item", raw_item={"call_id": call_id}, output=output))
+    return SimpleNamespace(new_items=items)
+
+
+def _legacy_result(calls: List[tuple]) -> Any:
+    """Kết quả dạng cũ: tool_results với output là chuỗi JSON"""
+    return SimpleNamespace(tool_results=[
+        SimpleNamespace(tool_name=name, output=json.dumps(output, ensure_ascii=False)) for name, output in calls
+    ])
+
+
+def _legacy_extract(result: Any) -> List[Dict[str, Any]]:
+    """Cách trích xuất cũ của CartAgentWrapper (bản đầy đủ nhất trong ba agent)"""
+    source_documents = []
+    for tool_result in result.tool_results:
+        if tool_result.tool_name in ['get_product_info', 'get_product_by_id', 'get_products_by_ids', 'rag_product_search',
+                                     'check_product_availability', 'find_products_by_price_range']:
+            try:
+                products = json.loads(tool_result.output)
+            except ValueError:
+                continue
+            if isinstance(products, dict):
+                products = [products]
+            for product in products:
+                if isinstance(product, dict):
+                    image_url = product.get("image_url", "")
+                    image_html = f'<img src="{image_url}" alt="{product.get("name", "Sản phẩm bánh")}" />' if image_url else ""
+                    source_documents.append({
+                        "id": product.get("id", ""),
+                        "name": product.get("name", ""),
+                        "price": product.get("price", 0),
+                        "description": product.get("description", ""),
+                        "image_url": image_url,
+                        "image_html": image_html,
+                        "category": product.get("category", ""),
+                        "status": product.get("status", ""),
+                        "quantity": product.get("quantity", 0),
+                        "available": product.get("available", None),
+                        "relevance_score": product.get("relevance_score", 0)
+                    })
+        if tool_result.tool_name in ['add_to_cart', 'get_cart', 'update_cart']:
+            cart_data = json.loads(tool_result.output)
+            for item in cart_data.get("items", []):
+                image_url = item.get("image", "")
+                image_html = f'<img src="{image_url}" alt="{item.get("name", "Sản phẩm bánh")}" />' if image_url else ""
+                source_documents.append({
+                    "id": item.get("product_id", ""),
+                    "name": item.get("name", ""),
+                    "price": item.get("price", 0),
+                    "quantity_in_cart": item.get("quantity", 0),
+                    "image_url": image_url,
+                    "image_html": image_html,
+                    "in_cart": True
+                })
+    return source_documents
+
+
+def _bench(label: str, func, results: List[Any]) -> float:
+    started_at = time.perf_counter()
+    documents = 0
+    for result in results:
+        documents += len(func(result))
+    elapsed = time.perf_counter() - started_at
+    print(f"{label:<10} {elapsed * 1000 / len(results):8.3f} ms/run   {documents / len(results):7.1f} documents/run")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trích xuất source_documents")
+    parser.add_argument("--tools", type=int, default=30, help="Số lần gọi tool trong một run")
+    parser.add_argument("--products", type=int, default=20, help="Số sản phẩm mỗi tool trả về")
+    parser.add_argument("--catalog", type=int, default=200, help="Số sản phẩm trong catalog giả lập")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    catalog = _catalog(args.catalog)
+    runs = [_tool_calls(catalog, args.tools, args.products) for _ in range(args.runs)]
+    legacy_results = [_legacy_result(calls) for calls in runs]
+    new_results = [_new_style_result(calls) for calls in runs]
+
+    print(f"{args.runs} run, {args.tools} tool/run, {args.products} sản phẩm/tool, catalog {args.catalog}")
+    legacy = _bench("legacy", _legacy_extract, legacy_results)
+    shared = _bench("shared", lambda result: extract_source_documents(result, PRODUCT_TOOLS | CART_TOOLS), new_results)
+    print(f"Nhanh hơn {legacy / shared:.1f} lần")
+
+
+if __name__ == "__main__":
+    main()
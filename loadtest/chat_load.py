@@ -0,0 +1,94 @@
+"""
+Đo throughput và tail latency của endpoint /chat.
+
+Chạy chatbot trỏ tới server giả lập (SPRING_BOOT_API_URL=http://localhost:8081), sau đó:
+    python -m loadtest.chat_load --url http://localhost:8000/api/v1/chat --users 20 --requests 200
+
+Mỗi người dùng ảo gửi tuần tự các tin nhắn lấy ngẫu nhiên từ --messages (file, mỗi dòng một tin nhắn)
+hoặc danh sách mặc định, với thread_id và auth_token riêng.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from typing import List
+
+import httpx
+
+DEFAULT_MESSAGES = [
+    "Shop có bánh kem socola không?",
+    "Cho mình xem các loại bánh mì",
+    "Bánh nào dưới 100 nghìn?",
+    "Thêm bánh kem dâu tây 6 vào giỏ hàng",
+    "Giỏ hàng của tôi có gì?",
+    "Shop mở cửa lúc mấy giờ?",
+    "Chính sách đổi trả thế nào?",
+    "So sánh bánh 1 và bánh 2"
+]
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(percent / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def _user(client: httpx.AsyncClient, url: str, messages: List[str], count: int,
+                latencies: List[float], errors: List[str]):
+    thread_id = str(uuid.uuid4())
+    payload_base = {"thread_id": thread_id, "user_id": thread_id, "auth_token": f"load-{thread_id}"}
+    for _ in range(count):
+        started = time.perf_counter()
+        try:
+            response = await client.post(url, json={**payload_base, "message": random.choice(messages)})
+            if response.status_code != 200:
+                errors.append(f"HTTP {response.status_code}")
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test cho endpoint /chat")
+    parser.add_argument("--url", default="http://localhost:8000/api/v1/chat")
+    parser.add_argument("--users", type=int, default=10, help="Số người dùng đồng thời")
+    parser.add_argument("--requests", type=int, default=100, help="Tổng số request")
+    parser.add_argument("--messages", help="File tin nhắn, mỗi dòng một tin nhắn")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    messages = DEFAULT_MESSAGES
+    if args.messages:
+        with open(args.messages, encoding="utf-8") as f:
+            messages = [line.strip() for line in f if line.strip()]
+
+    per_user = [args.requests // args.users + (1 if i < args.requests % args.users else 0) for i in range(args.users)]
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _user(client, args.url, messages, count, latencies, errors) for count in per_user if count
+        ))
+        elapsed = time.perf_counter() - started
+
+    print(f"Tổng request: {len(latencies) + len(errors)} trong {elapsed:.1f}s, lỗi: {len(errors)}")
+    print(f"Throughput: {len(latencies) / elapsed:.2f} req/s")
+    if latencies:
+        print(f"Latency (s): mean={statistics.mean(latencies):.3f} "
+              f"p50={_percentile(latencies, 50):.3f} p95={_percentile(latencies, 95):.3f} "
+              f"p99={_percentile(latencies, 99):.3f} max={max(latencies):.3f}")
+    if errors:
+        print(f"Lỗi: {dict((error, errors.count(error)) for error in set(errors))}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,378 @@
+"""
+Server giả lập Spring Boot API để chạy load test chatbot khi không có backend thật.
+
+Chỉ cài đặt các route và cấu trúc response mà SpringBootClient đang đọc:
+- GET    /api/v1/products                    -> {"data": {"meta": {...}, "result": [...]}} (hỗ trợ filter)
+- GET    /api/v1/products/{id}               -> {"data": {...}}
+- GET    /api/v1/carts                       -> {"data": [{"id", "quantity", "product": {...}}]}
+- POST   /api/v1/carts/add                   -> {"success": true, "data": <giỏ hàng>}
+- PUT    /api/v1/carts/update/{id}           -> {"success": true, "data": <giỏ hàng>}
+- DELETE /api/v1/carts/remove/{id}, /api/v1/carts/clear
+- POST   /api/v1/orders                      -> {"data": {"order": {...}, "paymentUrl": ...}}
+- GET    /api/v1/orders/my-orders            -> {"result": [...]}
+- GET    /api/v1/orders/{id}, /api/v1/payment/payment-info/{id}
+
+Chạy:
+    uvicorn loadtest.spring_stub:app --port 8081
+
+Cấu hình qua biến môi trường (đổi lúc đang chạy qua POST /__stub/config):
+- STUB_LATENCY_MS: Độ trễ cơ bản mỗi request (ms), mặc định 20
+- STUB_LATENCY_JITTER_MS: Độ trễ ngẫu nhiên cộng thêm tối đa (ms), mặc định 10
+- STUB_ERROR_RATE: Tỉ lệ request trả về 503 (0-1), mặc định 0
+- STUB_SLOW_RATE: Tỉ lệ request bị chậm thêm STUB_SLOW_MS (mô phỏng tail latency), mặc định 0
+- STUB_SLOW_MS: Độ trễ của request chậm (ms), mặc định 2000
+- STUB_PRODUCT_COUNT: Số sản phẩm sinh tự động, mặc định 200
+- STUB_PRODUCTS_FILE: File JSON danh sách sản phẩm (thay cho dữ liệu sinh tự động)
+- STUB_ETAG: Bật ETag/Last-Modified và trả 304 cho conditional GET sản phẩm, mặc định true
+- STUB_SEED: Seed cho dữ liệu và lỗi ngẫu nhiên, mặc định 42
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from email.utils import formatdate
+from typing import Any, Dict, List, Optional
+
+from fastapi import Body, FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes")
+
+
+config: Dict[str, Any] = {
+    "latency_ms": _env_float("STUB_LATENCY_MS", 20),
+    "latency_jitter_ms": _env_float("STUB_LATENCY_JITTER_MS", 10),
+    "error_rate": _env_float("STUB_ERROR_RATE", 0),
+    "slow_rate": _env_float("STUB_SLOW_RATE", 0),
+    "slow_ms": _env_float("STUB_SLOW_MS", 2000),
+    "etag": _env_bool("STUB_ETAG", True)
+}
+rng = random.Random(int(os.environ.get("STUB_SEED", 42)))
+
+CATEGORIES = [
+    {"id": 1, "name": "Bánh kem"},
+    {"id": 2, "name": "Bánh mì"},
+    {"id": 3, "name": "Bánh ngọt"},
+    {"id": 4, "name": "Bánh quy"},
+    {"id": 5, "name": "Bánh mousse"}
+]
+FLAVORS = ["Socola", "Dâu tây", "Chanh dây", "Matcha", "Vani", "Tiramisu", "Phô mai", "Xoài", "Cà phê", "Dừa"]
+
+
+def _generate_products(count: int) -> List[Dict[str, Any]]:
+    products = []
+    for product_id in range(1, count + 1):
+        category = CATEGORIES[(product_id - 1) % len(CATEGORIES)]
+        flavor = FLAVORS[(product_id - 1) // len(CATEGORIES) % len(FLAVORS)]
+        products.append({
+            "id": product_id,
+            "name": f"{category['name']} {flavor} {product_id}",
+            "description": f"{category['name']} vị {flavor.lower()}, làm mới mỗi ngày",
+            "sellPrice": rng.randrange(20, 600) * 1000,
+            "quantity": rng.randrange(0, 100),
+            "status": "AVAILABLE",
+            "image": f"https://example.com/images/{product_id}.jpg",
+            "category": dict(category),
+            "supplier": {"id": 1, "name": "Cosmo bakery"},
+            "createdAt": "2024-01-01T00:00:00Z",
+            "updatedAt": "2024-01-01T00:00:00Z"
+        })
+    return products
+
+
+def _load_products() -> List[Dict[str, Any]]:
+    path = os.environ.get("STUB_PRODUCTS_FILE")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        # Chấp nhận cả danh sách thuần lẫn response đã ghi lại từ Spring Boot
+        if isinstance(data, dict):
+            data = (data.get("data") or {}).get("result", [])
+        return data
+    return _generate_products(int(os.environ.get("STUB_PRODUCT_COUNT", 200)))
+
+
+products: List[Dict[str, Any]] = _load_products()
+products_by_id: Dict[str, Dict[str, Any]] = {str(p["id"]): p for p in products}
+# Giỏ hàng theo Authorization header (mỗi token là một người dùng)
+carts: Dict[str, List[Dict[str, Any]]] = {}
+orders: Dict[str, List[Dict[str, Any]]] = {}
+counters = {"cart_detail": 0, "order": 0}
+stats = {"requests": 0, "errors_injected": 0, "slow_injected": 0, "not_modified": 0}
+# Dữ liệu sản phẩm không đổi trong suốt phiên chạy
+LAST_MODIFIED = formatdate(time.time(), usegmt=True)
+
+app = FastAPI(title="Spring Boot stub")
+
+
+@app.middleware("http")
+async def inject_latency_and_errors(request: Request, call_next):
+    """Thêm độ trễ và lỗi giả lập cho mọi route của API (không áp dụng cho /__stub)"""
+    if request.url.path.startswith("/__stub"):
+        return await call_next(request)
+
+    stats["requests"] += 1
+    delay = config["latency_ms"] + rng.random() * config["latency_jitter_ms"]
+    if config["slow_rate"] and rng.random() < config["slow_rate"]:
+        stats["slow_injected"] += 1
+        delay += config["slow_ms"]
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+
+    if config["error_rate"] and rng.random() < config["error_rate"]:
+        stats["errors_injected"] += 1
+        return JSONResponse(status_code=503, content=_envelope(None, "Service Unavailable (stub)", 503))
+    return await call_next(request)
+
+
+def _envelope(data: Any, message: str = "OK", status_code: int = 200) -> Dict[str, Any]:
+    return {
+        "statusCode": status_code,
+        "success": status_code < 400,
+        "message": message,
+        "error": None if status_code < 400 else message,
+        "data": data
+    }
+
+
+def _json_with_validators(request: Request, content: Dict[str, Any]) -> Response:
+    """Trả JSON kèm ETag/Last-Modified, 304 nếu conditional GET khớp"""
+    if not config["etag"]:
+        return JSONResponse(content)
+
+    body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    headers = {"ETag": etag, "Last-Modified": LAST_MODIFIED}
+    if_none_match = request.headers.get("if-none-match")
+    if (if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]) or \
+            (not if_none_match and request.headers.get("if-modified-since") == LAST_MODIFIED):
+        stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# ---------- Spring Filter (chỉ các dạng SpringBootClient sử dụng) ----------
+
+def _matches(product: Dict[str, Any], condition: str) -> bool:
+    condition = condition.strip()
+    match = re.fullmatch(r"id\s+in\s+\[(.*)\]", condition)
+    if match:
+        ids = {value.strip().strip("'\"") for value in match.group(1).split(",")}
+        return str(product.get("id")) in ids
+    match = re.fullmatch(r"(\w+(?:\.\w+)?)\s*(~|:|>|<)\s*(.+)", condition)
+    if not match:
+        return True
+    field, operator, value = match.groups()
+    value = value.strip().strip("'\"").strip("*")
+
+    actual: Any = product
+    for part in field.split("."):
+        actual = actual.get(part) if isinstance(actual, dict) else None
+
+    if operator == "~":
+        return value.lower() in str(actual or "").lower()
+    if operator == ":":
+        return str(actual) == value
+    try:
+        if operator == ">":
+            return float(actual) > float(value)
+        return float(actual) < float(value)
+    except (TypeError, ValueError):
+        return False
+
+
+def _apply_filter(items: List[Dict[str, Any]], filter_query: Optional[str]) -> List[Dict[str, Any]]:
+    if not filter_query:
+        return items
+    conditions = re.split(r"\s+and\s+", filter_query, flags=re.IGNORECASE)
+    return [item for item in items if all(_matches(item, condition) for condition in conditions)]
+
+
+# ---------- Products ----------
+
+@app.get("/api/v1/products")
+async def list_products(request: Request, page: int = 1, size: int = 10, filter: Optional[str] = None):
+    matched = _apply_filter(products, filter)
+    page = max(page, 1)
+    start = (page - 1) * size
+    result = matched[start:start + size]
+    content = _envelope({
+        "meta": {
+            "page": page,
+            "pageSize": size,
+            "pages": (len(matched) + size - 1) // size if size else 0,
+            "total": len(matched)
+        },
+        "result": result
+    })
+    return _json_with_validators(request, content)
+
+
+@app.get("/api/v1/products/{product_id}")
+async def get_product(request: Request, product_id: str):
+    product = products_by_id.get(product_id)
+    if product is None:
+        return JSONResponse(status_code=404, content=_envelope(None, "Product not found", 404))
+    return _json_with_validators(request, _envelope(product))
+
+
+# ---------- Carts ----------
+
+def _user_key(request: Request) -> str:
+    return request.headers.get("authorization") or "anonymous"
+
+
+def _cart_details(request: Request) -> List[Dict[str, Any]]:
+    return carts.setdefault(_user_key(request), [])
+
+
+@app.get("/api/v1/carts")
+async def get_cart(request: Request):
+    return _envelope(_cart_details(request))
+
+
+@app.post("/api/v1/carts/add")
+async def add_to_cart(request: Request, payload: Dict[str, Any] = Body(...)):
+    product = products_by_id.get(str(payload.get("productId")))
+    if product is None:
+        return JSONResponse(status_code=404, content=_envelope(None, "Sản phẩm không tồn tại", 404))
+
+    quantity = int(payload.get("quantity") or 1)
+    details = _cart_details(request)
+    for detail in details:
+        if detail["product"]["id"] == product["id"]:
+            detail["quantity"] += quantity
+            break
+    else:
+        counters["cart_detail"] += 1
+        details.append({"id": counters["cart_detail"], "quantity": quantity, "product": product})
+    return _envelope(details, "Đã thêm vào giỏ hàng")
+
+
+@app.put("/api/v1/carts/update/{cart_detail_id}")
+async def update_cart_item(request: Request, cart_detail_id: int, payload: Dict[str, Any] = Body(...)):
+    details = _cart_details(request)
+    for detail in details:
+        if detail["id"] == cart_detail_id:
+            quantity = int(payload.get("quantity") or 0)
+            if quantity <= 0:
+                details.remove(detail)
+            else:
+                detail["quantity"] = quantity
+            return _envelope(details, "Đã cập nhật giỏ hàng")
+    return JSONResponse(status_code=404, content=_envelope(None, "Không tìm thấy sản phẩm trong giỏ hàng", 404))
+
+
+@app.delete("/api/v1/carts/remove/{cart_detail_id}")
+async def remove_from_cart(request: Request, cart_detail_id: int):
+    details = _cart_details(request)
+    details[:] = [detail for detail in details if detail["id"] != cart_detail_id]
+    return _envelope(details, "Đã xóa sản phẩm khỏi giỏ hàng")
+
+
+@app.delete("/api/v1/carts/clear")
+async def clear_cart(request: Request):
+    _cart_details(request).clear()
+    return _envelope([], "Đã xóa giỏ hàng")
+
+
+# ---------- Orders / payment ----------
+
+@app.post("/api/v1/orders")
+async def create_order(request: Request, payload: Dict[str, Any] = Body(...)):
+    details = _cart_details(request)
+    if not details:
+        return JSONResponse(status_code=400, content=_envelope(None, "Giỏ hàng trống", 400))
+
+    counters["order"] += 1
+    order_id = counters["order"]
+    payment_method = payload.get("paymentMethod", "COD")
+    order = {
+        "id": order_id,
+        "status": "PENDING",
+        "paymentMethod": payment_method,
+        "phone": payload.get("phone"),
+        "address": payload.get("address"),
+        "totalPrice": sum(detail["product"]["sellPrice"] * detail["quantity"] for detail in details),
+        "orderDetails": [dict(detail) for detail in details]
+    }
+    orders.setdefault(_user_key(request), []).append(order)
+    details.clear()
+
+    data: Dict[str, Any] = {"order": order}
+    if payment_method == "TRANSFER":
+        data["paymentUrl"] = f"https://example.com/pay/{order_id}"
+    return JSONResponse(status_code=201, content=_envelope(data, "Tạo đơn hàng thành công", 201))
+
+
+@app.get("/api/v1/orders/my-orders")
+async def my_orders(request: Request):
+    # SpringBootClient.get_my_orders đọc "result" ở cấp ngoài cùng
+    return {"statusCode": 200, "message": "OK", "result": orders.get(_user_key(request), [])}
+
+
+def _find_order(order_id: int) -> Optional[Dict[str, Any]]:
+    for user_orders in orders.values():
+        for order in user_orders:
+            if order["id"] == order_id:
+                return order
+    return None
+
+
+@app.get("/api/v1/orders/{order_id}")
+async def get_order(order_id: int):
+    order = _find_order(order_id)
+    if order is None:
+        return JSONResponse(status_code=404, content=_envelope(None, "Không tìm thấy đơn hàng", 404))
+    return _envelope(order)
+
+
+@app.get("/api/v1/payment/payment-info/{order_id}")
+async def get_payment_info(order_id: int):
+    order = _find_order(order_id)
+    if order is None:
+        return JSONResponse(status_code=404, content=_envelope(None, "Không tìm thấy đơn hàng", 404))
+    return _envelope({
+        "orderId": order_id,
+        "paymentMethod": order["paymentMethod"],
+        "amount": order["totalPrice"],
+        "status": "UNPAID"
+    })
+
+
+# ---------- Điều khiển stub ----------
+
+@app.get("/__stub/config")
+async def get_config():
+    return {"config": config, "stats": stats, "products": len(products)}
+
+
+@app.post("/__stub/config")
+async def update_config(payload: Dict[str, Any] = Body(...)):
+    """Đổi độ trễ / tỉ lệ lỗi khi đang chạy, ví dụ {"error_rate": 0.5}"""
+    for key, value in payload.items():
+        if key not in config:
+            continue
+        if isinstance(config[key], bool):
+            config[key] = value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes")
+        else:
+            config[key] = float(value)
+    return {"config": config}
+
+
+@app.post("/__stub/reset")
+async def reset():
+    carts.clear()
+    orders.clear()
+    for key in stats:
+        stats[key] = 0
+    return {"status": "ok"}
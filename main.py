@@ -32,10 +32,36 @@ async def lifespan(app: FastAPI):
     # This is a placeholder - actual implementation would depend on your setup
     logger.info("Initialized vector database")
     
+    # Khởi tạo sẵn các agent (mỗi agent một lần) để request đầu tiên không phải chờ
+    if settings.AGENT_WARMUP:
+        from app.agents.registry import agent_registry
+        agent_registry.warmup([*agent_registry.enabled, "manager", "triage"])
+        logger.info(f"Agents warmed up: {', '.join(agent_registry.stats()['built'])}")
+    
+    # Tính sẵn centroid cho bộ phân loại intent để request đầu tiên không phải chờ
+    if settings.ROUTING_CENTROID_ENABLED:
+        from app.routing.centroid_classifier import centroid_classifier
+        try:
+            await centroid_classifier.build()
+        except Exception as e:
+            logger.warning(f"Không thể tính centroid cho bộ phân loại intent: {str(e)}")
+    
+    # Tính sẵn embedding các câu hỏi FAQ của cửa hàng
+    if settings.FAQ_ENABLED:
+        from app.routing.faq import faq_engine
+        try:
+            await faq_engine.build()
+        except Exception as e:
+            logger.warning(f"Không thể tính embedding cho FAQ: {str(e)}")
+    
     yield
     
     # Shutdown event: cleanup resources
     logger.info("Application shutting down...")
+    
+    # Đóng connection pool tới Spring Boot API
+    from app.client.spring_client import spring_boot_client
+    await spring_boot_client.aclose()
 
 # Create FastAPI application
 app = FastAPI(
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app.core.bulkhead import Bulkhead, BulkheadRegistry, BulkheadRejected
+
+
+async def hold(bulkhead, seconds, order=None, label=None):
+    async with bulkhead.slot():
+        if order is not None:
+            order.append(label)
+        await asyncio.sleep(seconds)
+
+
+def test_rejects_when_queue_is_full():
+    async def scenario():
+        bulkhead = Bulkhead("product", limit=1, max_queue=1, max_wait=1.0)
+        running = asyncio.create_task(hold(bulkhead, 0.05))
+        queued = asyncio.create_task(hold(bulkhead, 0))
+        await asyncio.sleep(0)
+
+        with pytest.raises(BulkheadRejected):
+            async with bulkhead.slot():
+                pass
+        await asyncio.gather(running, queued)
+        return bulkhead.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected_queue_full"] == 1
+    assert stats["admitted"] == 2
+    assert stats["peak_queue_depth"] == 1
+
+
+def test_rejects_after_max_wait_and_records_the_wait():
+    async def scenario():
+        bulkhead = Bulkhead("product", limit=1, max_queue=5, max_wait=0.02)
+        running = asyncio.create_task(hold(bulkhead, 0.1))
+        await asyncio.sleep(0)
+
+        with pytest.raises(BulkheadRejected):
+            async with bulkhead.slot():
+                pass
+        await running
+        return bulkhead.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected_timeout"] == 1
+    assert stats["queue_depth"] == 0
+    assert stats["rejected_wait_seconds"]["count"] == 1
+    assert stats["rejected_wait_seconds"]["p50"] >= 0.02
+
+
+def test_admits_in_arrival_order():
+    async def scenario():
+        bulkhead = Bulkhead("product", limit=1, max_queue=5, max_wait=1.0)
+        order = []
+        tasks = [asyncio.create_task(hold(bulkhead, 0.02, order, 0))]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(hold(bulkhead, 0, order, label)) for label in (1, 2)]
+        # Đến đúng lúc chỗ vừa trống: vẫn phải xếp sau 1 và 2
+        await asyncio.sleep(0.02)
+        tasks.append(asyncio.create_task(hold(bulkhead, 0, order, 3)))
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == [0, 1, 2, 3]
+
+
+def test_agents_do_not_share_slots():
+    async def scenario():
+        registry = BulkheadRegistry({"product": 1}, default_limit=1, max_queue=0, max_wait=1.0)
+        async with registry.slot("product"):
+            with pytest.raises(BulkheadRejected):
+                async with registry.slot("product"):
+                    pass
+            # product đầy nhưng checkout vẫn còn chỗ
+            async with registry.slot("checkout"):
+                pass
+        return registry.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["product"]["rejected_queue_full"] == 1
+    assert stats["checkout"]["admitted"] == 1
+
+
+def test_disabled_registry_does_not_limit():
+    async def scenario():
+        registry = BulkheadRegistry({"product": 1}, default_limit=1, max_queue=0, max_wait=1.0, enabled=False)
+        async with registry.slot("product"):
+            async with registry.slot("product"):
+                pass
+        return registry.stats()
+
+    assert asyncio.run(scenario()) == {}
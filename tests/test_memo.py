@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from app.core.turn_state import turn_scope
+from app.tools.memo import invalidates_turn_memo, turn_memoized
+
+
+def make_tools(results=None):
+    """Tool đọc (memo) và tool ghi (xóa memo) đếm số lần thực sự chạy"""
+    calls = []
+
+    @turn_memoized
+    async def read(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return (results or {}).get(key, {"key": key})
+
+    @invalidates_turn_memo
+    async def write():
+        return {"success": True}
+
+    return read, write, calls
+
+
+def run_in_turn(coro_factory):
+    async def main():
+        with turn_scope():
+            return await coro_factory()
+    return asyncio.run(main())
+
+
+def test_repeated_call_in_turn_runs_once():
+    read, _, calls = make_tools()
+
+    async def scenario():
+        first = await read("a")
+        second = await read("a")
+        await read("b")
+        return first, second
+
+    first, second = run_in_turn(scenario)
+    assert first == second == {"key": "a"}
+    assert calls == ["a", "b"]
+
+
+def test_concurrent_identical_calls_share_one_run():
+    read, _, calls = make_tools()
+    run_in_turn(lambda: asyncio.gather(read("a"), read("a"), read("a")))
+    assert calls == ["a"]
+
+
+def test_no_memo_outside_turn():
+    read, _, calls = make_tools()
+
+    async def scenario():
+        await read("a")
+        await read("a")
+
+    asyncio.run(scenario())
+    assert calls == ["a", "a"]
+
+
+def test_memo_does_not_leak_between_turns():
+    read, _, calls = make_tools()
+    run_in_turn(lambda: read("a"))
+    run_in_turn(lambda: read("a"))
+    assert calls == ["a", "a"]
+
+
+def test_write_invalidates_memo():
+    read, write, calls = make_tools()
+
+    async def scenario():
+        await read("a")
+        await write()
+        await read("a")
+
+    run_in_turn(scenario)
+    assert calls == ["a", "a"]
+
+
+def test_error_result_is_not_memoized():
+    read, _, calls = make_tools({"a": {"error": "circuit open"}})
+
+    async def scenario():
+        await read("a")
+        await read("a")
+
+    run_in_turn(scenario)
+    assert calls == ["a", "a"]
+
+
+def test_exception_is_not_memoized():
+    calls = []
+
+    @turn_memoized
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("timeout")
+        return {"ok": True}
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await flaky()
+        return await flaky()
+
+    assert run_in_turn(scenario) == {"ok": True}
+    assert len(calls) == 2
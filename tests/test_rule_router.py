@@ -0,0 +1,61 @@
+import pytest
+
+from app.routing.rule_router import RuleRouter, fold_text
+
+
+@pytest.mark.parametrize("message, intent", [
+    # shop: giờ mở cửa, giao hàng, đổi trả
+    ("giờ mở cửa", "shop"),
+    ("GIỜ MỞ CỬA", "shop"),
+    ("Shop mở cửa lúc mấy giờ", "shop"),
+    ("Địa chỉ cửa hàng ở đâu", "shop"),
+    ("giá ship bao nhiêu", "shop"),
+    ("Có freeship không", "shop"),
+    ("Phí giao bánh là bao nhiêu", "shop"),
+    ("Giao sai bánh thì làm sao", "shop"),
+    # cart
+    ("Xem giỏ hàng của tôi", "cart"),
+    ("thêm 2 cái tiramisu vào giỏ", "cart"),
+    ("Xóa bánh khỏi giỏ hàng", "cart"),
+    # checkout (kể cả khi đi kèm giỏ hàng)
+    ("Đặt hàng", "checkout"),
+    ("thanh toán giỏ hàng", "checkout"),
+    ("Tôi muốn đặt hàng các bánh trong giỏ", "checkout"),
+    # product
+    ("Giá bánh tiramisu", "product"),
+    ("bánh nào rẻ nhất", "product"),
+    ("xin chào", "product"),
+    # Không dấu: so khớp trên text đã bỏ dấu nên cho cùng kết quả
+    ("gio mo cua", "shop"),
+    ("xem gio hang", "cart"),
+    ("thanh toan gio hang", "checkout"),
+    ("dat hang", "checkout"),
+    ("gia banh tiramisu", "product"),
+    # None: không khớp rule nào hoặc nhiều ý định không gộp được -> để LLM phân loại
+    ("", None),
+    ("   ", None),
+    ("ok", None),
+    ("bạn là ai", None),
+    ("hôm nay trời đẹp quá", None),
+    ("Xem giỏ hàng và giờ mở cửa", None),
+])
+def test_classify(message, intent):
+    assert RuleRouter().classify(message) == intent
+
+
+def test_fold_text_removes_diacritics():
+    assert fold_text("Thanh Toán Giỏ Hàng Đ") == "thanh toan gio hang d"
+
+
+def test_classify_records_stats_but_peek_does_not():
+    router = RuleRouter()
+    router.peek("giờ mở cửa")
+    assert router.stats()["total"] == 0
+
+    router.classify("giờ mở cửa")
+    router.classify("bạn là ai")
+    stats = router.stats()
+    assert stats["total"] == 2
+    assert stats["fast_path"] == 1
+    assert stats["llm_fallback"] == 1
+    assert stats["by_intent"]["shop"] == 1